@@ -0,0 +1,231 @@
+"""
+Admission control for uploads.
+
+Request bodies larger than MAX_UPLOAD_BYTES are refused with 413 while they
+stream in, before the multipart parser spools them. Admitted uploads are
+decoded, parsed and stored on a bounded pool of PARSE_CONCURRENCY threads
+(the parser itself runs in a subprocess per upload). At most
+PARSE_QUEUE_SIZE uploads wait for a thread, and the estimated peak memory of
+everything admitted (PARSE_COST_FACTOR times the upload size) stays under
+PARSE_MEMORY_BUDGET; beyond that, uploads are shed with 429 and a
+Retry-After estimated from the recent parse throughput.
+"""
+import asyncio
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .profiler import track
+from .telemetry import (
+    PARSE_PENDING_COST,
+    PARSE_QUEUE_DEPTH,
+    PARSE_RUNNING,
+    UPLOADS_REJECTED,
+    observe_stage,
+)
+
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+PARSE_CONCURRENCY = int(os.environ.get("PARSE_CONCURRENCY", "2"))
+PARSE_QUEUE_SIZE = int(os.environ.get("PARSE_QUEUE_SIZE", "8"))
+PARSE_MEMORY_BUDGET = int(
+    os.environ.get("PARSE_MEMORY_BUDGET", str(1024 * 1024 * 1024))
+)
+# Peak memory per uploaded byte: the bytes, the decoded text kept as raw_txt,
+# the parsed tree and its JSON encoding
+PARSE_COST_FACTOR = 12
+# Parse throughput (bytes/s) assumed until uploads have been timed
+DEFAULT_THROUGHPUT = 2 * 1024 * 1024
+MAX_RETRY_AFTER = 300
+
+
+class Overloaded(Exception):
+    """Raised when an upload is shed; retry_after is in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Parse queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def estimate_cost(size):
+    """Estimated peak memory in bytes for parsing an upload of size bytes."""
+    return max(size, 1) * PARSE_COST_FACTOR
+
+
+class ParsePool:
+    """A bounded thread pool with a bounded, cost-aware admission queue."""
+
+    def __init__(
+        self,
+        concurrency=PARSE_CONCURRENCY,
+        queue_size=PARSE_QUEUE_SIZE,
+        memory_budget=PARSE_MEMORY_BUDGET,
+    ):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.memory_budget = memory_budget
+        self.pending = 0  # admitted and not finished
+        self.running = 0
+        self.pending_cost = 0
+        self.pending_bytes = 0
+        self.throughput = DEFAULT_THROUGHPUT
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="gdv-parse"
+        )
+
+    def retry_after(self):
+        """Seconds until the work admitted so far should have drained."""
+        with self._lock:
+            backlog = self.pending_bytes / self.throughput / self.concurrency
+        return max(1, min(MAX_RETRY_AFTER, math.ceil(backlog)))
+
+    def _publish(self):
+        PARSE_QUEUE_DEPTH.set(self.pending - self.running)
+        PARSE_RUNNING.set(self.running)
+        PARSE_PENDING_COST.set(self.pending_cost)
+
+    def _admit(self, size, cost):
+        with self._lock:
+            if self.pending >= self.concurrency + self.queue_size:
+                reason = "queue_full"
+            elif self.pending and self.pending_cost + cost > self.memory_budget:
+                # A single oversized upload is still let through on an idle pool
+                reason = "memory"
+            else:
+                self.pending += 1
+                self.pending_cost += cost
+                self.pending_bytes += size
+                self._publish()
+                return
+        UPLOADS_REJECTED.inc(1, reason)
+        raise Overloaded(self.retry_after())
+
+    def _call(self, submitted, size, fn, *args):
+        observe_stage("queue", time.perf_counter() - submitted)
+        with self._lock:
+            self.running += 1
+            self._publish()
+        start = time.perf_counter()
+        try:
+            with track():
+                return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.running -= 1
+                if size and elapsed > 0:
+                    # Exponentially weighted, so a few slow uploads do not dominate
+                    self.throughput = 0.7 * self.throughput + 0.3 * (size / elapsed)
+                self._publish()
+
+    async def run(self, size, fn, *args):
+        """
+        Runs fn(*args) for an upload of size bytes on a parse thread, or
+        raises Overloaded without queueing it.
+        """
+        cost = estimate_cost(size)
+        self._admit(size, cost)
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        try:
+            return await loop.run_in_executor(
+                self._executor,
+                context.run,
+                self._call,
+                time.perf_counter(),
+                size,
+                fn,
+                *args,
+            )
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.pending_cost -= cost
+                self.pending_bytes -= size
+                self._publish()
+
+
+_pool = None
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ParsePool()
+    return _pool
+
+
+class _TooLarge(Exception):
+    pass
+
+
+class BodyLimitMiddleware:
+    """ASGI middleware answering 413 for request bodies over MAX_UPLOAD_BYTES."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = MAX_UPLOAD_BYTES
+        for name, value in scope.get("headers", ()):
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    break
+                if declared > limit:
+                    UPLOADS_REJECTED.inc(1, "too_large")
+                    await _send_too_large(send, limit)
+                    return
+                break
+
+        received = 0
+        responded = False
+
+        async def limited_receive():
+            nonlocal received, responded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit and not responded:
+                    # Chunked bodies are cut off as soon as they pass the limit
+                    responded = True
+                    UPLOADS_REJECTED.inc(1, "too_large")
+                    await _send_too_large(send, limit)
+                    raise _TooLarge()
+            return message
+
+        async def guarded_send(message):
+            # Whatever the app answers after the 413 is dropped
+            if not responded:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except _TooLarge:
+            pass
+        except Exception:
+            if not responded:
+                raise
+
+
+async def _send_too_large(send, limit):
+    body = json.dumps({"detail": f"Upload exceeds {limit} bytes."}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 413,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"connection", b"close"),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
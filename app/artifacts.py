@@ -0,0 +1,219 @@
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from . import fleet, graph_store, precompress, timeline
+from .telemetry import stage
+from .traverse import dumps, loads
+
+# Number of mapped stores kept open per process. Mappings are cheap: their pages
+# live in the OS page cache and are shared by every worker.
+STORE_CACHE_SIZE = int(os.environ.get("STORE_CACHE_SIZE", "32"))
+
+_store_cache = OrderedDict()
+_store_cache_lock = threading.Lock()
+# Overlays of the most recently compared file sets
+OVERLAY_CACHE_SIZE = 4
+_overlay_cache = OrderedDict()
+_timeline_executor = None
+_timeline_lock = threading.Lock()
+
+
+def load_dependency_data(path):
+    """Reads a stored dependency JSON file."""
+    with stage("load"):
+        with open(path, "r", encoding="utf-8") as f:
+            return loads(f.read())
+
+
+def build_store(path, dependency_data=None):
+    """(Re)builds the mapped store of a stored file, reusing already parsed data if given."""
+    with stage("store"):
+        fingerprint = graph_store.source_fingerprint(path)
+        if dependency_data is None:
+            with open(path, "r", encoding="utf-8") as f:
+                dependency_data = loads(f.read())
+        graph_store.write_store(
+            dependency_data, graph_store.store_path_for(path), fingerprint
+        )
+
+
+def write_dependency_data(path, dependency_data):
+    """
+    Writes a stored dependency JSON file. The file is replaced, never rewritten
+    in place, so stores keyed by its inode cannot go stale.
+    """
+    path = Path(path)
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(dumps(dependency_data, indent=2))
+        os.replace(temp_name, path)
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+
+
+def _copy_file(source, dest):
+    # Copy under a temporary name first so an existing dest is replaced atomically
+    fd, temp_name = tempfile.mkstemp(dir=dest.parent, prefix=f".{dest.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        shutil.copyfile(source, temp_name)
+        os.replace(temp_name, dest)
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+
+
+def copy_sample(sample_path, path):
+    """
+    Stores a copy of the sample file sample_path as path. The copy is a new
+    file with its own modification time, which orders it in the history, and
+    the sample's prebuilt store and compressed variants (scripts/prebuild.py)
+    are cloned for it, so nothing is parsed or recompressed. SAMPLE_DIR is only
+    read and may be read-only; without a current sample store the copy's store
+    is built from its contents.
+    """
+    sample_path = Path(sample_path)
+    path = Path(path)
+    with stage("store"):
+        _copy_file(sample_path, path)
+        if graph_store.clone_store(sample_path, path):
+            precompress.clone_variants(sample_path, path)
+            return
+    build_store(path)
+
+
+def open_store(path):
+    """
+    Returns the MappedStore of a stored file, building it first if it is
+    missing or older than the file.
+    """
+    key = str(path)
+    fingerprint = graph_store.source_fingerprint(path)
+    with _store_cache_lock:
+        cached = _store_cache.get(key)
+        if cached is not None and cached.fingerprint == fingerprint:
+            _store_cache.move_to_end(key)
+            return cached
+
+    with stage("load"):
+        store = _map(path, fingerprint)
+    if store is None:
+        build_store(path)
+        with stage("load"):
+            store = _map(path, fingerprint)
+        if store is None:
+            raise RuntimeError(f"Could not build the store for {path}")
+
+    with _store_cache_lock:
+        _store_cache[key] = store
+        _store_cache.move_to_end(key)
+        while len(_store_cache) > STORE_CACHE_SIZE:
+            _store_cache.popitem(last=False)
+    return store
+
+
+def open_overlay(paths):
+    """
+    Returns the convert_to_graph overlay merging the stored files at paths, in
+    that order, from their mapped stores. Cached until one of the files changes.
+    """
+    from .convert_to_graph import new_overlay, overlay_add_store
+
+    key = tuple((str(path), graph_store.source_fingerprint(path)) for path in paths)
+    with _store_cache_lock:
+        overlay = _overlay_cache.get(key)
+        if overlay is not None:
+            _overlay_cache.move_to_end(key)
+            return overlay
+
+    overlay = new_overlay()
+    for path in paths:
+        store = open_store(path)
+        with stage("graph"):
+            overlay_add_store(overlay, Path(path).name, store)
+
+    with _store_cache_lock:
+        _overlay_cache[key] = overlay
+        while len(_overlay_cache) > OVERLAY_CACHE_SIZE:
+            _overlay_cache.popitem(last=False)
+    return overlay
+
+
+def _map(path, fingerprint):
+    store_path = graph_store.store_path_for(path)
+    try:
+        store = graph_store.MappedStore(store_path)
+    except (FileNotFoundError, ValueError):
+        return None
+    if store.fingerprint != fingerprint:
+        return None
+    return store
+
+
+def write_variants(path):
+    """Writes the precompressed variants served for a stored file."""
+    with stage("store"):
+        precompress.write_variants(path)
+
+
+def index_file(path):
+    """Adds a stored file to the fleet-wide index."""
+    with stage("store"):
+        fleet.add_file(path, open_store(path))
+
+
+def _get_timeline_executor():
+    global _timeline_executor
+    with _timeline_lock:
+        if _timeline_executor is None:
+            # One thread, so snapshots are recorded in the order files were stored
+            _timeline_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gdv-timeline")
+        return _timeline_executor
+
+
+def _record_timeline(data_dir, store, source, at):
+    try:
+        timeline.record(data_dir, store, source, at)
+    except Exception as e:
+        # The timeline is history only; it never fails storing a file
+        print(f"Could not record {source} in the timeline: {e}")
+
+
+def record_timeline(path):
+    """
+    Queues a stored file to be recorded as the latest snapshot in its
+    project's timeline, off the request. Returns the future of the recording.
+    """
+    path = Path(path)
+    at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    try:
+        # Mapped now, so the snapshot is taken even if the file is removed meanwhile
+        store = open_store(path)
+    except Exception as e:
+        print(f"Could not record {path.name} in the timeline: {e}")
+        return None
+    return _get_timeline_executor().submit(_record_timeline, path.parent, store, path.name, at)
+
+
+def wait_for_timeline():
+    """Blocks until every snapshot queued so far is recorded."""
+    with _timeline_lock:
+        executor = _timeline_executor
+    if executor is not None:
+        executor.submit(lambda: None).result()
+
+
+def invalidate(path):
+    """Drops cached state, derived artifacts and fleet index entries for path."""
+    with _store_cache_lock:
+        _store_cache.pop(str(path), None)
+    graph_store.remove_derived(path)
+    fleet.remove_file(path)
@@ -1,21 +1,36 @@
 import json
 import argparse
+import sys
 from collections import defaultdict, deque
+from contextlib import nullcontext
 try:
+    from .dominators import dominator_report, graph_dominators
+    from .export import GRAPH_WRITERS, write_stream
+    from .memprof import format_report, profiling, stage
+    from .traverse import iter_preorder, loads
     from .utils import get_root_key_and_nodes
 except ImportError:
+    from dominators import dominator_report, graph_dominators
+    from export import GRAPH_WRITERS, write_stream
+    from memprof import format_report, profiling, stage
+    from traverse import iter_preorder, loads
     from utils import get_root_key_and_nodes
 
 def traverse_tree(nodes, parent_id=None, graph_nodes=None, edges=None):
     """
-    Recursively traverse the dependency tree and build graph representation.
+    Traverse the dependency tree in pre-order and build graph representation.
     """
     if graph_nodes is None:
         graph_nodes = {}
     if edges is None:
         edges = defaultdict(set)
     
-    for node in nodes:
+    # path[d] is the node ID of the current node's ancestor at depth d
+    path = []
+    for node, depth in iter_preorder(nodes):
+        del path[depth:]
+        parent = path[-1] if path else parent_id
+
         # Create unique node ID from module and version
         module = node.get('module', '')
         version = node.get('version', '')
@@ -34,14 +49,12 @@ def traverse_tree(nodes, parent_id=None, graph_nodes=None, edges=None):
             }
         
         # Add parent relationship if this node has a parent
-        if parent_id:
-            graph_nodes[node_id]['parents'].add(parent_id)
-            graph_nodes[parent_id]['children'].add(node_id)
-            edges[parent_id].add(node_id)
+        if parent:
+            graph_nodes[node_id]['parents'].add(parent)
+            graph_nodes[parent]['children'].add(node_id)
+            edges[parent].add(node_id)
         
-        # Recursively process children
-        if 'children' in node and node['children']:
-            traverse_tree(node['children'], node_id, graph_nodes, edges)
+        path.append(node_id)
     
     return graph_nodes, edges
 
@@ -170,14 +183,115 @@ def filter_graph_by_distance(graph_nodes, edges, max_distance):
     
     return filtered_nodes, filtered_edges
 
-def process_data(dependency_data, distance=None, exclude=None):
+def compute_levels(graph_nodes, root_id="root:"):
     """
-    Process dependency tree data into graph format with optional filtering.
+    Compute the BFS distance from the root for every reachable node.
+    """
+    if root_id not in graph_nodes:
+        return {}
+
+    levels = {root_id: 0}
+    queue = deque([root_id])
+    while queue:
+        current_node = queue.popleft()
+        next_level = levels[current_node] + 1
+        for child in graph_nodes[current_node]['children']:
+            if child not in levels:
+                levels[child] = next_level
+                queue.append(child)
+    return levels
+
+def select_nodes(graph_nodes, levels, distance=None, exclude=None, root_id="root:"):
+    """
+    Select the node IDs kept by the distance and exclude options using precomputed levels.
+    """
+    if distance is None:
+        if not exclude:
+            return None
+        return {node_id for node_id in graph_nodes if exclude not in node_id}
+
+    if not exclude:
+        if root_id not in graph_nodes:
+            print("Warning: Root node not found in graph.")
+            return None
+        return {node_id for node_id, level in levels.items() if level <= distance}
+
+    # Excluded nodes can lengthen paths, so the precomputed levels do not apply:
+    # walk the graph again without them, stopping at the depth limit.
+    if root_id not in graph_nodes or exclude in root_id:
+        print("Warning: Root node not found in graph.")
+        return {node_id for node_id in graph_nodes if exclude not in node_id}
+    distances = {root_id: 0}
+    queue = deque([root_id])
+    while queue:
+        current_node = queue.popleft()
+        current_distance = distances[current_node]
+        if current_distance >= distance:
+            continue
+        for child in graph_nodes[current_node]['children']:
+            if child not in distances and exclude not in child:
+                distances[child] = current_distance + 1
+                queue.append(child)
+    return set(distances)
+
+def iter_graph_nodes(graph_nodes, kept=None):
+    """
+    Yield nodes in the final format, optionally restricted to the kept node IDs.
+    """
+    for node_id, node_data in graph_nodes.items():
+        if kept is None or node_id in kept:
+            yield {
+                'id': node_data['id'],
+                'module': node_data['module'],
+                'version': node_data['version'],
+                'resolution': node_data['resolution'],
+                'full': node_data['full']
+            }
+
+def iter_graph_edges(edges, kept=None):
+    """
+    Yield (source, target) pairs, optionally restricted to the kept node IDs.
+    """
+    for parent, children in edges.items():
+        if kept is None or parent in kept:
+            for child in children:
+                if kept is None or child in kept:
+                    yield parent, child
+
+def prune_graph(graph_nodes, edges, levels, distance=None, exclude=None):
+    """
+    Convert a prebuilt graph to the final format, keeping only the selected nodes.
+    Equivalent to filter_graph_by_exclude followed by filter_graph_by_distance,
+    without copying node data.
+    """
+    kept = select_nodes(graph_nodes, levels, distance, exclude)
+    if kept is None:
+        return convert_to_graph_format(graph_nodes, edges)
+
+    nodes_list = list(iter_graph_nodes(graph_nodes, kept))
+    edges_list = [
+        {'source': parent, 'target': child}
+        for parent, child in iter_graph_edges(edges, kept)
+    ]
+
+    return {
+        'nodes': nodes_list,
+        'edges': edges_list,
+        'metadata': {
+            'total_nodes': len(nodes_list),
+            'total_edges': len(edges_list)
+        }
+    }
+
+def build_graph(dependency_data):
+    """
+    Build the internal graph representation, anchored on a synthetic root node.
+    Returns (graph_nodes, edges), or (None, None) if there are no root nodes.
     """
     # Extract root nodes
     _, root_nodes = get_root_key_and_nodes(dependency_data)
     if not root_nodes:
-        return None
+        return None, None
     
     # Build graph representation
     graph_nodes, edges = traverse_tree(root_nodes)
@@ -204,17 +318,171 @@ def process_data(dependency_data, distance=None, exclude=None):
         graph_nodes[root_id]['children'].add(node_id)
         graph_nodes[node_id]['parents'].add(root_id)
         edges[root_id].add(node_id)
-    
-    # Apply exclude filtering
-    if exclude:
-        graph_nodes, edges = filter_graph_by_exclude(graph_nodes, edges, exclude)
-    
-    # Apply distance filtering
-    if distance is not None:
-        graph_nodes, edges = filter_graph_by_distance(graph_nodes, edges, distance)
-    
-    # Convert to final format
-    return convert_to_graph_format(graph_nodes, edges)
+
+    return graph_nodes, edges
+
+def process_data(dependency_data, distance=None, exclude=None):
+    """
+    Process dependency tree data into graph format with optional filtering.
+    """
+    graph_nodes, edges = build_graph(dependency_data)
+    if graph_nodes is None:
+        return None
+
+    levels = compute_levels(graph_nodes) if distance is not None else {}
+    return prune_graph(graph_nodes, edges, levels, distance, exclude)
+
+# Snapshots per overlay; masks stay within the range of JavaScript's 32-bit bitwise operators
+MAX_OVERLAY_SNAPSHOTS = 31
+
+def new_overlay():
+    """
+    Create an empty overlay graph: several snapshots merged over one shared node table.
+    Node i is nodes[i] = (id, module, version, resolution, full) and masks[i] has
+    bit k set when snapshot k contains it; edges maps source << 32 | target to
+    the mask of the snapshots containing the edge.
+    """
+    return {'snapshots': [], 'index': {}, 'nodes': [], 'masks': [], 'edges': {}}
+
+def _overlay_snapshot(overlay, name):
+    if len(overlay['snapshots']) >= MAX_OVERLAY_SNAPSHOTS:
+        raise ValueError(f"An overlay holds at most {MAX_OVERLAY_SNAPSHOTS} snapshots")
+    overlay['snapshots'].append(name)
+    bit = 1 << (len(overlay['snapshots']) - 1)
+    index = overlay['index']
+    nodes = overlay['nodes']
+    masks = overlay['masks']
+
+    def intern(node_id, module, version, resolution, full):
+        i = index.get(node_id)
+        if i is None:
+            i = index[node_id] = len(nodes)
+            nodes.append((node_id, module, version, resolution, full))
+            masks.append(0)
+        masks[i] |= bit
+        return i
+
+    return bit, intern
+
+def overlay_add_tree(overlay, name, dependency_data):
+    """
+    Add a parsed dependency file to an overlay as its next snapshot, with the
+    same nodes and edges as build_graph.
+    """
+    bit, intern = _overlay_snapshot(overlay, name)
+    _, root_nodes = get_root_key_and_nodes(dependency_data)
+    if not root_nodes:
+        return
+    edges = overlay['edges']
+    seen = set()
+    has_parent = set()
+    path = []
+    for node, depth in iter_preorder(root_nodes):
+        del path[depth:]
+        module = node.get('module', '')
+        version = node.get('version', '')
+        node_id = f"{module}:{version}" if version else module
+        i = intern(node_id, module, version, node.get('resolution', ''), node.get('full', ''))
+        seen.add(i)
+        # An empty parent ID never links, as in traverse_tree
+        if path and overlay['nodes'][path[-1]][0]:
+            key = path[-1] << 32 | i
+            edges[key] = edges.get(key, 0) | bit
+            has_parent.add(i)
+        path.append(i)
+
+    root = intern("root:", 'root', '', '', 'root')
+    for i in seen - has_parent:
+        if i != root:
+            key = root << 32 | i
+            edges[key] = edges.get(key, 0) | bit
+
+def overlay_add_store(overlay, name, store):
+    """
+    Add a stored file to an overlay as its next snapshot, reading the node
+    table and adjacency of its graph_store.MappedStore.
+    """
+    bit, intern = _overlay_snapshot(overlay, name)
+    ids = []
+    for index in range(store.node_count):
+        i = overlay['index'].get(store.string(store.node_id[index]))
+        if i is None:
+            # Only nodes new to the overlay have their fields decoded
+            node = store.graph_node(index)
+            i = intern(node['id'], node['module'], node['version'], node['resolution'], node['full'])
+        else:
+            overlay['masks'][i] |= bit
+        ids.append(i)
+    edges = overlay['edges']
+    for index, source in enumerate(ids):
+        for child in store.children_of(index):
+            key = source << 32 | ids[child]
+            edges[key] = edges.get(key, 0) | bit
+
+def overlay_format(overlay, subset=None, match='any'):
+    """
+    Convert an overlay to the final JSON format, nodes and edges carrying their
+    membership mask. With subset (snapshot positions), only what is in any
+    (or, with match='all', every one) of those snapshots is kept.
+    """
+    if subset is None:
+        selected = (1 << len(overlay['snapshots'])) - 1
+    else:
+        selected = 0
+        for position in subset:
+            if not 0 <= position < len(overlay['snapshots']):
+                raise ValueError(f"No snapshot {position} in the overlay")
+            selected |= 1 << position
+    if match == 'all':
+        keep = lambda mask: mask & selected == selected
+    elif match == 'any':
+        keep = lambda mask: mask & selected
+    else:
+        raise ValueError(f"Unknown match: {match}")
+
+    nodes = overlay['nodes']
+    masks = overlay['masks']
+    nodes_list = [
+        {
+            'id': node_id, 'module': module, 'version': version,
+            'resolution': resolution, 'full': full, 'mask': masks[i],
+        }
+        for i, (node_id, module, version, resolution, full) in enumerate(nodes)
+        if keep(masks[i])
+    ]
+    edges_list = [
+        {'source': nodes[key >> 32][0], 'target': nodes[key & 0xFFFFFFFF][0], 'mask': mask}
+        for key, mask in overlay['edges'].items()
+        if keep(mask)
+    ]
+    return {
+        'snapshots': list(overlay['snapshots']),
+        'nodes': nodes_list,
+        'edges': edges_list,
+        'metadata': {
+            'total_nodes': len(nodes_list),
+            'total_edges': len(edges_list),
+            'total_snapshots': len(overlay['snapshots']),
+        }
+    }
+
+def write_dominator_report(graph_nodes, output_path, top=10):
+    """
+    Write the dominator report of a graph and print the nodes owning the most.
+    """
+    node_ids, dominators = graph_dominators(graph_nodes)
+    report = dominator_report(node_ids, dominators)
+    try:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    except Exception as e:
+        print(f"Error writing to {output_path}: {e}")
+        return
+
+    print(f"Nodes reachable only through each dependency (top {top}):")
+    for node in report['nodes'][:top]:
+        print(f"  {node['exclusive']:6d}  {node['id']}")
+    print(f"  - Output written to: {output_path}")
 
 def main():
     """Main function to convert dependency tree to graph representation."""
@@ -223,44 +491,109 @@ def main():
     parser.add_argument('-o', '--output', help='Output graph JSON file path (default: input_file_graph.json)')
     parser.add_argument('-d', '--distance', type=int, help='Maximum distance from root to include nodes (default: no limit)')
     parser.add_argument('-e', '--exclude', help='Exclude nodes whose ID contains this keyword')
+    parser.add_argument('-f', '--format', choices=sorted(GRAPH_WRITERS), default='json', help='Output format (default: json)')
+    parser.add_argument('--dominators', action='store_true', help='Write the dominator report (what disappears if a node is dropped) instead of the graph')
+    parser.add_argument('--overlay', nargs='+', metavar='FILE', help='Merge these files with input_file into one overlay graph with snapshot membership masks')
+    parser.add_argument('--profile-memory', action='store_true', help='Report peak and retained memory per stage on stderr')
     args = parser.parse_args()
-    
+    if args.overlay and (args.distance is not None or args.exclude or args.dominators or args.format != 'json'):
+        parser.error('--overlay only writes the JSON overlay graph')
+
+    with profiling() if args.profile_memory else nullcontext() as profile:
+        if args.overlay:
+            overlay_files(args)
+        else:
+            convert_file(args)
+    if profile is not None:
+        print(format_report(profile), file=sys.stderr)
+
+def convert_file(args):
+    """Converts args.input_file as requested on the command line."""
     # Determine output file path
     if args.output:
         output_path = args.output
+    elif args.dominators:
+        base_name = args.input_file.rsplit('.', 1)[0]
+        output_path = f"{base_name}_dominators.json"
     else:
         base_name = args.input_file.rsplit('.', 1)[0]
-        output_path = f"{base_name}_graph.json"
+        output_path = f"{base_name}_graph.{args.format}"
     
     # Read input JSON file
     try:
-        with open(args.input_file, 'r', encoding='utf-8') as f:
-            dependency_data = json.load(f)
+        with stage("load"), open(args.input_file, 'r', encoding='utf-8') as f:
+            dependency_data = loads(f.read())
     except Exception as e:
         print(f"Error reading {args.input_file}: {e}")
         return
     
     print(f"Converting dependency tree to graph representation...")
     
-    graph_data = process_data(dependency_data, distance=args.distance, exclude=args.exclude)
+    with stage("graph"):
+        graph_nodes, edges = build_graph(dependency_data)
     
-    if not graph_data:
+    if graph_nodes is None:
         print("Warning: No graph data generated.")
         return
-    
-    # Write output file
+
+    if args.dominators:
+        with stage("dominators"):
+            write_dominator_report(graph_nodes, output_path)
+        return
+
+    levels = compute_levels(graph_nodes) if args.distance is not None else {}
+    kept = select_nodes(graph_nodes, levels, args.distance, args.exclude)
+    counts = {'nodes': 0, 'edges': 0}
+
+    def counted(items, key):
+        for item in items:
+            counts[key] += 1
+            yield item
+
+    # Write output file, streaming so the document is never held in memory as a whole
     try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(graph_data, f, indent=2)
+        with stage("write"), open(output_path, 'w', encoding='utf-8') as f:
+            write_stream(GRAPH_WRITERS[args.format](
+                counted(iter_graph_nodes(graph_nodes, kept), 'nodes'),
+                counted(iter_graph_edges(edges, kept), 'edges'),
+            ), f)
         
         print(f"Successfully converted to graph representation:")
-        print(f"  - Total unique nodes: {graph_data['metadata']['total_nodes']}")
-        print(f"  - Total edges: {graph_data['metadata']['total_edges']}")
+        print(f"  - Total unique nodes: {counts['nodes']}")
+        print(f"  - Total edges: {counts['edges']}")
         print(f"  - Output written to: {output_path}")
         
     except Exception as e:
         print(f"Error writing to {output_path}: {e}")
         return
 
+def overlay_files(args):
+    """Merges args.input_file and the args.overlay files into one overlay graph."""
+    paths = [args.input_file, *args.overlay]
+    output_path = args.output or f"{args.input_file.rsplit('.', 1)[0]}_overlay.json"
+    overlay = new_overlay()
+    for path in paths:
+        try:
+            with stage("load"), open(path, 'r', encoding='utf-8') as f:
+                dependency_data = loads(f.read())
+        except Exception as e:
+            print(f"Error reading {path}: {e}")
+            return
+        with stage("graph"):
+            overlay_add_tree(overlay, path, dependency_data)
+        del dependency_data
+
+    try:
+        with stage("write"), open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(overlay_format(overlay), f)
+    except Exception as e:
+        print(f"Error writing to {output_path}: {e}")
+        return
+
+    print(f"Successfully merged {len(paths)} snapshots:")
+    print(f"  - Total unique nodes: {len(overlay['nodes'])}")
+    print(f"  - Total edges: {len(overlay['edges'])}")
+    print(f"  - Output written to: {output_path}")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
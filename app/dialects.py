@@ -0,0 +1,187 @@
+"""
+Input dialects of the dependency tree parser.
+
+A dialect knows how one build tool prints its dependency tree: which lines
+start a tree (header detection), how a tree line splits into a node and its
+depth (the tokenizer), and where the project name is. parse.parse_dependencies
+feeds the (node, level) pairs of any dialect into the same stack-based tree
+builder, so every dialect produces the same parsed JSON, storage and viewers.
+
+    gradle    `gradle dependencies`: '+--- ' / '\\--- ' markers, 5-character indent
+    maven     `mvn dependency:tree`: '+- ' / '\\- ' markers, 3-character indent,
+              optionally behind '[INFO] ' log prefixes
+
+New dialects subclass Dialect, implement its abstract methods and are added
+with register().
+"""
+import re
+from abc import ABC, abstractmethod
+
+try:
+    from .utils import parse_dependency_line
+except ImportError:
+    from utils import parse_dependency_line
+
+# Lines looked at when guessing the dialect of a dump
+DETECT_LINES = 2000
+
+DIALECTS = {}
+
+
+class Dialect(ABC):
+    """How one build tool prints a dependency tree."""
+
+    name = None
+
+    @abstractmethod
+    def starts_tree(self, line):
+        """True for a line after which tree lines follow."""
+
+    @abstractmethod
+    def parse_line(self, line):
+        """Returns (node, level) of a tree line, or (None, -1) for any other line."""
+
+    @abstractmethod
+    def is_tree_line(self, line):
+        """Cheap check used by detect() to count the lines this dialect understands."""
+
+    @abstractmethod
+    def project_name(self, lines):
+        """The project named in a dump, "root" when there is none."""
+
+
+def register(dialect):
+    """Adds a dialect instance under its name; a dialect missing a method cannot be instantiated."""
+    if not isinstance(dialect, Dialect):
+        raise TypeError(f"Not a Dialect instance: {dialect!r}")
+    if not dialect.name:
+        raise TypeError(f"{type(dialect).__name__} has no name")
+    DIALECTS[dialect.name] = dialect
+    return dialect
+
+
+def get_dialect(name):
+    """Returns a registered dialect by name; dialect objects are passed through."""
+    if isinstance(name, Dialect):
+        return name
+    try:
+        return DIALECTS[name]
+    except KeyError:
+        raise ValueError(f"Unsupported dialect: {name}") from None
+
+
+def detect(lines):
+    """Guesses the dialect of a dump from its first lines; Gradle when nothing matches."""
+    counts = dict.fromkeys(DIALECTS, 0)
+    for i, line in enumerate(lines):
+        if i >= DETECT_LINES:
+            break
+        for name, dialect in DIALECTS.items():
+            if dialect.is_tree_line(line):
+                counts[name] += 1
+    best = max(counts, key=lambda name: counts[name])
+    return DIALECTS[best] if counts[best] else DIALECTS["gradle"]
+
+
+class GradleDialect(Dialect):
+    name = "gradle"
+    _header = re.compile(r"^\w+(Runtime|Compile)Classpath")
+    _tree_line = re.compile(r"^[ |]*[+\\]--- ")
+    _project = re.compile(r"^Project ':([^']+)'")
+
+    def starts_tree(self, line):
+        return self._header.match(line) is not None
+
+    def parse_line(self, line):
+        if "---" not in line:
+            return None, -1
+        return parse_dependency_line(line)
+
+    def is_tree_line(self, line):
+        return self._tree_line.match(line) is not None
+
+    def project_name(self, lines):
+        for line in lines:
+            match = self._project.match(line.strip())
+            if match:
+                return match.group(1)
+        return "root"
+
+
+class MavenDialect(Dialect):
+    """
+    Every tree starts at the project's own artifact line (group:artifact:packaging:version),
+    which is the project and not a node; its dependencies are the root nodes.
+    """
+
+    name = "maven"
+    indentation_width = 3
+    _prefix = re.compile(r"^\[(?:INFO|DEBUG)\] ?")
+    _tree_line = re.compile(r"^((?:[| ]  )*)[+\\]- (.*)$")
+    _artifact = re.compile(r"^[\w.\-]+:[\w.\-]+(?::[\w.\-]+){2,4}$")
+    _plugin_header = re.compile(r"maven-dependency-plugin:[^:]+:tree .*@ (\S+) ---")
+    _omitted = re.compile(r" - omitted for (?:duplicate|conflict with ([^)\s]+))")
+    _scopes = {"compile", "provided", "runtime", "test", "system", "import"}
+
+    def _strip(self, line):
+        return self._prefix.sub("", line.rstrip(), count=1)
+
+    def starts_tree(self, line):
+        return self._artifact.match(self._strip(line)) is not None
+
+    def parse_line(self, line):
+        match = self._tree_line.match(self._strip(line))
+        if not match:
+            return None, -1
+        level = len(match.group(1)) // self.indentation_width + 1
+        text = match.group(2).strip()
+
+        resolution = ""
+        # Verbose trees print omitted nodes in parentheses with the reason
+        if text.startswith("(") and text.endswith(")"):
+            text = text[1:-1]
+            resolution = "*"
+        full = text
+        omitted = self._omitted.search(text)
+        winner = None
+        if omitted:
+            resolution = "*"
+            winner = omitted.group(1)
+            text = text[:omitted.start()]
+
+        coordinates = text.split(" ", 1)[0]
+        parts = coordinates.split(":")
+        if len(parts) < 4:
+            return {
+                "module": coordinates, "version": "", "resolution": resolution,
+                "full": full, "children": [],
+            }, level
+        # group:artifact:type[:classifier]:version[:scope]
+        if len(parts) >= 6 or (len(parts) == 5 and parts[4] not in self._scopes):
+            version = parts[4]
+        else:
+            version = parts[3]
+        return {
+            "module": f"{parts[0]}:{parts[1]}",
+            "version": winner or version,
+            "resolution": resolution,
+            "full": full,
+            "children": [],
+        }, level
+
+    def is_tree_line(self, line):
+        return self._tree_line.match(self._strip(line)) is not None
+
+    def project_name(self, lines):
+        for line in lines:
+            stripped = self._strip(line)
+            match = self._plugin_header.search(stripped)
+            if match:
+                return match.group(1)
+            if self._artifact.match(stripped):
+                return stripped.split(":")[1]
+        return "root"
+
+
+register(GradleDialect())
+register(MavenDialect())
@@ -0,0 +1,181 @@
+"""
+Dominator tree of the root-anchored dependency graph.
+
+A node d dominates n when every path from the synthetic root to n goes
+through d, so the nodes d dominates are exactly the artifacts that disappear
+when d is dropped. Immediate dominators are computed with the
+Cooper-Harvey-Kennedy iterative algorithm over a CSR adjacency: a handful of
+passes in reverse postorder, each linear in the number of edges.
+"""
+from array import array
+
+try:
+    from .graph_store import ROOT_ID
+except ImportError:
+    from graph_store import ROOT_ID
+
+
+def _reverse_postorder(root, succ_off, succ_tgt, node_count):
+    # Iterative DFS; returns the nodes reachable from root in reverse postorder
+    visited = bytearray(node_count)
+    visited[root] = 1
+    postorder = []
+    work = [[root, succ_off[root]]]
+    while work:
+        frame = work[-1]
+        node, edge = frame
+        if edge < succ_off[node + 1]:
+            frame[1] = edge + 1
+            target = succ_tgt[edge]
+            if not visited[target]:
+                visited[target] = 1
+                work.append([target, succ_off[target]])
+        else:
+            work.pop()
+            postorder.append(node)
+    postorder.reverse()
+    return postorder
+
+
+def immediate_dominators(node_count, succ_off, succ_tgt, pred_off, pred_tgt, root):
+    """
+    Returns (idom, order): the immediate dominator of every node (the root is
+    its own, -1 for nodes unreachable from the root) and the reachable nodes
+    in reverse postorder.
+    """
+    order = _reverse_postorder(root, succ_off, succ_tgt, node_count)
+    # Postorder number of each reachable node; the root has the highest
+    rank = array("i", [-1]) * node_count
+    for position, node in enumerate(order):
+        rank[node] = len(order) - 1 - position
+
+    idom = array("i", [-1]) * node_count
+    idom[root] = root
+    changed = True
+    while changed:
+        changed = False
+        for node in order[1:]:
+            new_idom = -1
+            for edge in range(pred_off[node], pred_off[node + 1]):
+                pred = pred_tgt[edge]
+                if idom[pred] < 0:
+                    continue
+                if new_idom < 0:
+                    new_idom = pred
+                    continue
+                # Walk both fingers up the current tree to their common ancestor
+                a, b = pred, new_idom
+                while a != b:
+                    while rank[a] < rank[b]:
+                        a = idom[a]
+                    while rank[b] < rank[a]:
+                        b = idom[b]
+                new_idom = a
+            if idom[node] != new_idom:
+                idom[node] = new_idom
+                changed = True
+    return idom, order
+
+
+class Dominators:
+    """Dominator tree with the exclusively owned subtree size of every node."""
+
+    def __init__(self, node_count, succ_off, succ_tgt, pred_off, pred_tgt, root):
+        self.root = root
+        self.idom, self.order = immediate_dominators(
+            node_count, succ_off, succ_tgt, pred_off, pred_tgt, root
+        )
+        # Dominators precede the nodes they dominate in reverse postorder
+        sizes = array("I", [0]) * node_count
+        for node in reversed(self.order):
+            sizes[node] += 1
+            if node != root:
+                sizes[self.idom[node]] += sizes[node]
+        # Nodes that are only reachable through a node, itself excluded
+        self.exclusive = array("I", (size - 1 if size else 0 for size in sizes))
+        self._children = None
+
+    def dominated(self, node):
+        """Returns the nodes dominated by node (itself excluded) in dominator tree pre-order."""
+        if self._children is None:
+            children = {}
+            for other in self.order[1:]:
+                children.setdefault(self.idom[other], []).append(other)
+            self._children = children
+        result = []
+        stack = list(reversed(self._children.get(node, ())))
+        while stack:
+            current = stack.pop()
+            result.append(current)
+            stack.extend(reversed(self._children.get(current, ())))
+        return result
+
+
+def graph_dominators(graph_nodes, root_id=ROOT_ID):
+    """
+    Dominators of a convert_to_graph.build_graph graph.
+    Returns (node_ids, Dominators), or None without a root node.
+    """
+    if root_id not in graph_nodes:
+        return None
+    node_ids = list(graph_nodes)
+    index = {node_id: i for i, node_id in enumerate(node_ids)}
+    columns = []
+    for key in ("children", "parents"):
+        offsets = array("I", [0])
+        targets = array("I")
+        for node_id in node_ids:
+            targets.extend(index[other] for other in graph_nodes[node_id][key])
+            offsets.append(len(targets))
+        columns += [offsets, targets]
+    return node_ids, Dominators(len(node_ids), *columns, index[root_id])
+
+
+def store_dominators(store):
+    """Returns the Dominators of a mapped store, computing them once per store."""
+    return store.cached(
+        "dominators",
+        lambda s: Dominators(
+            s.node_count, s.child_off, s.child_tgt, s.parent_off, s.parent_tgt, s.root_node
+        ),
+    )
+
+
+def dominator_report(node_ids, dominators, limit=None, node=None):
+    """
+    Lists nodes by exclusively owned subtree size (descending), leaving out
+    the root. With node (an ID), reports what disappears when that node is
+    dropped instead. Returns None for an unknown node.
+    """
+    if node is not None:
+        try:
+            index = node_ids.index(node)
+        except ValueError:
+            return None
+        idom = dominators.idom[index]
+        dominated = dominators.dominated(index) if idom >= 0 else []
+        return {
+            "id": node,
+            "idom": node_ids[idom] if idom >= 0 and index != dominators.root else None,
+            "exclusive": len(dominated),
+            "dominated": [node_ids[i] for i in dominated],
+        }
+
+    nodes = [i for i in dominators.order if i != dominators.root]
+    nodes.sort(key=lambda i: -dominators.exclusive[i])
+    if limit is not None:
+        nodes = nodes[:limit]
+    return {
+        "nodes": [
+            {
+                "id": node_ids[i],
+                "idom": node_ids[dominators.idom[i]],
+                "exclusive": dominators.exclusive[i],
+            }
+            for i in nodes
+        ],
+        "metadata": {
+            "total_nodes": len(node_ids) - 1,
+            "reachable_nodes": len(dominators.order) - 1,
+        },
+    }
@@ -0,0 +1,92 @@
+"""
+k-hop neighbourhoods ("ego graphs") around one node of a stored graph.
+
+A BFS over the store's CSR adjacency collects the nodes within `hops` edges
+of the centre, following children ("down", what the node depends on),
+parents ("up", what depends on it) or both. The result is the induced
+subgraph in the convert_to_graph output format, each node carrying its hop
+distance and full parent and child counts so the viewer knows what is left
+to expand. Only the visited neighbourhood is touched, never the whole graph.
+"""
+
+DIRECTIONS = ("up", "down", "both")
+# Nodes returned at most; the BFS stops there and the result is marked truncated
+MAX_NODES = 2000
+
+
+def node_lookup(store):
+    """Cached dict from graph node ID to node index."""
+    return store.cached("node_index", lambda s: s.node_index())
+
+
+def neighborhood(store, center, hops, direction="both", max_nodes=MAX_NODES):
+    """
+    Returns ({node index: hop distance}, truncated) for the nodes within hops
+    of the centre index, in BFS order.
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError(f"Unsupported direction: {direction}")
+    down = direction in ("down", "both")
+    up = direction in ("up", "both")
+    distances = {center: 0}
+    frontier = [center]
+    for distance in range(1, hops + 1):
+        next_frontier = []
+        for index in frontier:
+            neighbours = []
+            if down:
+                neighbours.append(store.children_of(index))
+            if up:
+                neighbours.append(store.parents_of(index))
+            for targets in neighbours:
+                for target in targets:
+                    if target in distances:
+                        continue
+                    if len(distances) >= max_nodes:
+                        return distances, True
+                    distances[target] = distance
+                    next_frontier.append(target)
+        if not next_frontier:
+            break
+        frontier = next_frontier
+    return distances, False
+
+
+def ego_graph(store, node_id, hops=1, direction="both", max_nodes=MAX_NODES):
+    """
+    Returns the k-hop subgraph around node_id in the convert_to_graph format,
+    or None when the node is not in the graph.
+    """
+    center = node_lookup(store).get(node_id)
+    if center is None:
+        return None
+    distances, truncated = neighborhood(store, center, hops, direction, max_nodes)
+
+    ids = {}
+    nodes = []
+    for index, distance in distances.items():
+        node = store.graph_node(index)
+        node["distance"] = distance
+        node["parent_count"] = len(store.parents_of(index))
+        node["child_count"] = len(store.children_of(index))
+        ids[index] = node["id"]
+        nodes.append(node)
+
+    edges = [
+        {"source": ids[index], "target": ids[child]}
+        for index in distances
+        for child in store.children_of(index)
+        if child in ids
+    ]
+    return {
+        "center": node_id,
+        "nodes": nodes,
+        "edges": edges,
+        "metadata": {
+            "total_nodes": len(nodes),
+            "total_edges": len(edges),
+            "hops": hops,
+            "direction": direction,
+            "truncated": truncated,
+        },
+    }
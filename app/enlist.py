@@ -1,27 +1,24 @@
 import json
-import yaml
 import argparse
 import os
 try:
+    from .export import ENLIST_WRITERS, write_stream
+    from .traverse import iter_preorder, loads
     from .utils import get_root_key_and_nodes
 except ImportError:
+    from export import ENLIST_WRITERS, write_stream
+    from traverse import iter_preorder, loads
     from utils import get_root_key_and_nodes
 
+SET_OPERATIONS = ('union', 'intersection', 'difference')
+
 def collect_dependencies(node, dependencies_set):
-    """Recursively collect all dependencies from the JSON structure."""
-    if not isinstance(node, dict):
-        return
-    
-    # If this node has module and version, add it to the set
-    if 'module' in node and 'version' in node and node['version']:
-        # Concatenate module and version to create unique dependency identifier
-        dependency = f"{node['module']}:{node['version']}"
-        dependencies_set.add(dependency)
-    
-    # Recursively process children
-    if 'children' in node and isinstance(node['children'], list):
-        for child in node['children']:
-            collect_dependencies(child, dependencies_set)
+    """Collect all dependencies below node (inclusive) from the JSON structure."""
+    for current, _ in iter_preorder([node]):
+        # If this node has module and version, add it to the set
+        if 'module' in current and 'version' in current and current['version']:
+            # Concatenate module and version to create unique dependency identifier
+            dependencies_set.add(f"{current['module']}:{current['version']}")
 
 def extract_dependencies_from_json(json_data):
     """Extract all unique dependencies from the JSON structure."""
@@ -34,47 +31,67 @@ def extract_dependencies_from_json(json_data):
     
     return sorted(list(dependencies_set))
 
+def combine_dependencies(dependency_lists, operation='union'):
+    """
+    Combine the dependency lists of several files with a set operation.
+    'difference' keeps the dependencies of the first file that are in none of the others.
+    """
+    if operation not in SET_OPERATIONS:
+        raise ValueError(f"Unknown operation: {operation}")
+    if not dependency_lists:
+        return []
+
+    combined = set(dependency_lists[0])
+    for dependencies in dependency_lists[1:]:
+        if operation == 'union':
+            combined.update(dependencies)
+        elif operation == 'intersection':
+            combined.intersection_update(dependencies)
+        else:
+            combined.difference_update(dependencies)
+    return sorted(combined)
+
 def main():
     """Main function to read JSON and output YAML."""
     parser = argparse.ArgumentParser(description='Extract dependencies from JSON and output to YAML')
-    parser.add_argument('json_file', help='Path to the input JSON file')
-    parser.add_argument('-o', '--output', help='Output YAML file path (default: dependencies.yaml)', 
-                       default='dependencies.yaml')
+    parser.add_argument('json_files', nargs='+', help='Path to the input JSON file(s)')
+    parser.add_argument('-o', '--output', help='Output file path (default: dependencies.<format>)')
+    parser.add_argument('-f', '--format', choices=sorted(ENLIST_WRITERS), default='yaml', help='Output format (default: yaml)')
+    parser.add_argument('--op', choices=SET_OPERATIONS, default='union', help='How to combine several input files (default: union)')
     args = parser.parse_args()
+    output_path = args.output or f"dependencies.{args.format}"
     
-    # Read JSON file
-    try:
-        with open(args.json_file, 'r', encoding='utf-8') as f:
-            json_data = json.load(f)
-    except FileNotFoundError:
-        print(f"Error: {args.json_file} not found.")
-        return
-    except json.JSONDecodeError as e:
-        print(f"Error parsing JSON: {e}")
-        return
-    except Exception as e:
-        print(f"Error reading {args.json_file}: {e}")
-        return
-    
-    # Extract dependencies
-    dependencies = extract_dependencies_from_json(json_data)
+    dependency_lists = []
+    for json_file in args.json_files:
+        # Read JSON file
+        try:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                json_data = loads(f.read())
+        except FileNotFoundError:
+            print(f"Error: {json_file} not found.")
+            return
+        except json.JSONDecodeError as e:
+            print(f"Error parsing JSON: {e}")
+            return
+        except Exception as e:
+            print(f"Error reading {json_file}: {e}")
+            return
     
-    # Create YAML structure
-    yaml_data = {
-        'dependencies': dependencies,
-        'total_count': len(dependencies)
-    }
+        # Extract dependencies
+        dependency_lists.append(extract_dependencies_from_json(json_data))
+
+    dependencies = combine_dependencies(dependency_lists, args.op)
     
-    # Write to YAML file
+    # Write the output file
     try:
-        with open(args.output, 'w', encoding='utf-8') as f:
-            yaml.dump(yaml_data, f, default_flow_style=False, sort_keys=False)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            write_stream(ENLIST_WRITERS[args.format](dependencies), f)
         
         print(f"Successfully extracted {len(dependencies)} unique dependencies")
-        print(f"Output written to: {args.output}")
+        print(f"Output written to: {output_path}")
         
     except Exception as e:
-        print(f"Error writing to {args.output}: {e}")
+        print(f"Error writing to {output_path}: {e}")
         return
 
 if __name__ == "__main__":
@@ -0,0 +1,171 @@
+import csv
+import io
+import json
+import re
+from xml.sax.saxutils import escape, quoteattr
+
+# Chunk size for streamed output; small enough for a fast first byte, large
+# enough to keep the number of writes low.
+CHUNK_SIZE = 64 * 1024
+
+# Scalars of this shape are emitted by PyYAML as plain (unquoted) strings
+_YAML_PLAIN = re.compile(r"^[A-Za-z][A-Za-z0-9_.\-+@]*(?::[A-Za-z0-9_.\-+@]+)+$")
+
+ENLIST_FORMATS = {
+    "yaml": "application/x-yaml",
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+GRAPH_FORMATS = {
+    "json": "application/json",
+    "jsonl": "application/x-ndjson",
+    "graphml": "application/xml",
+    "dot": "text/vnd.graphviz",
+}
+
+
+def chunked(pieces, size=CHUNK_SIZE):
+    """Joins small string pieces into chunks of roughly size characters."""
+    buffer = []
+    length = 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield "".join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def _yaml_scalar(value):
+    if _YAML_PLAIN.match(value):
+        return value
+    import yaml
+
+    # Let PyYAML decide on quoting for anything unusual
+    return yaml.dump([value], default_flow_style=False)[2:-1]
+
+
+def iter_enlist_yaml(dependencies):
+    """
+    Streams the enlist YAML document. The output matches
+    yaml.dump({'dependencies': [...], 'total_count': n}, sort_keys=False).
+    """
+    count = 0
+    for dependency in dependencies:
+        if count == 0:
+            yield "dependencies:\n"
+        yield f"- {_yaml_scalar(dependency)}\n"
+        count += 1
+    if count == 0:
+        yield "dependencies: []\n"
+    yield f"total_count: {count}\n"
+
+
+def _split_dependency(dependency):
+    module, _, version = dependency.rpartition(":")
+    return module, version
+
+
+def iter_enlist_csv(dependencies):
+    """Streams dependencies as CSV rows of module and version."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(["module", "version"])
+    for dependency in dependencies:
+        writer.writerow(_split_dependency(dependency))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_enlist_jsonl(dependencies):
+    """Streams dependencies as JSON Lines records."""
+    for dependency in dependencies:
+        module, version = _split_dependency(dependency)
+        yield json.dumps({"module": module, "version": version}) + "\n"
+
+
+ENLIST_WRITERS = {
+    "yaml": iter_enlist_yaml,
+    "csv": iter_enlist_csv,
+    "jsonl": iter_enlist_jsonl,
+}
+
+
+def iter_graph_json(nodes, edges):
+    """Streams a graph as the JSON document produced by convert_to_graph.process_data."""
+    node_count = 0
+    edge_count = 0
+    yield '{\n  "nodes": ['
+    for node in nodes:
+        yield ("\n    " if node_count == 0 else ",\n    ") + json.dumps(node)
+        node_count += 1
+    yield '\n  ],\n  "edges": ['
+    for source, target in edges:
+        edge = {"source": source, "target": target}
+        yield ("\n    " if edge_count == 0 else ",\n    ") + json.dumps(edge)
+        edge_count += 1
+    metadata = {"total_nodes": node_count, "total_edges": edge_count}
+    yield f'\n  ],\n  "metadata": {json.dumps(metadata)}\n}}\n'
+
+
+def iter_graph_jsonl(nodes, edges):
+    """Streams a graph as JSON Lines, one node or edge record per line."""
+    for node in nodes:
+        yield json.dumps({"type": "node", **node}) + "\n"
+    for source, target in edges:
+        yield json.dumps({"type": "edge", "source": source, "target": target}) + "\n"
+
+
+_GRAPHML_KEYS = ("module", "version", "resolution", "full")
+
+
+def iter_graph_graphml(nodes, edges):
+    """Streams a graph as GraphML."""
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+    for key in _GRAPHML_KEYS:
+        yield f'  <key id="{key}" for="node" attr.name="{key}" attr.type="string"/>\n'
+    yield '  <graph id="dependencies" edgedefault="directed">\n'
+    for node in nodes:
+        data = "".join(
+            f'<data key="{key}">{escape(node.get(key, ""))}</data>'
+            for key in _GRAPHML_KEYS
+        )
+        yield f"    <node id={quoteattr(node['id'])}>{data}</node>\n"
+    for source, target in edges:
+        yield f"    <edge source={quoteattr(source)} target={quoteattr(target)}/>\n"
+    yield "  </graph>\n</graphml>\n"
+
+
+def _dot_id(value):
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def iter_graph_dot(nodes, edges):
+    """Streams a graph in Graphviz DOT format."""
+    yield "digraph dependencies {\n"
+    for node in nodes:
+        yield f"  {_dot_id(node['id'])} [label={_dot_id(node['module'])}];\n"
+    for source, target in edges:
+        yield f"  {_dot_id(source)} -> {_dot_id(target)};\n"
+    yield "}\n"
+
+
+GRAPH_WRITERS = {
+    "json": iter_graph_json,
+    "jsonl": iter_graph_jsonl,
+    "graphml": iter_graph_graphml,
+    "dot": iter_graph_dot,
+}
+
+
+def write_stream(pieces, f):
+    """Writes streamed output to an open text file."""
+    for chunk in chunked(pieces):
+        f.write(chunk)
@@ -1,78 +1,89 @@
-import copy
-import json
 import argparse
 import sys
+from contextlib import nullcontext
 try:
+    from .memprof import format_report, profiling, stage
+    from .query import QueryError, compile_query
+    from .traverse import dumps, iter_preorder, loads, prune
     from .utils import get_root_key_and_nodes
 except ImportError:
+    from memprof import format_report, profiling, stage
+    from query import QueryError, compile_query
+    from traverse import dumps, iter_preorder, loads, prune
     from utils import get_root_key_and_nodes
 
-def find_matches_and_relatives(nodes, keywords, kept_nodes, ancestors):
+def find_matches_and_relatives(nodes, keywords, kept_nodes, ancestors, matches=None):
     """
-    Recursively traverses the tree to find nodes that match the keyword,
+    Traverses the tree to find nodes that match the keyword,
     and adds them, their ancestors, and their direct children to the kept_nodes set.
+    A matches(node) predicate, e.g. from a compiled query, replaces the keyword test.
     """
-    for node in nodes:
-        current_path = ancestors + [node]
-        if any(keyword.lower() in node.get('module', '').lower() for keyword in keywords):
-            for n in current_path:
-                kept_nodes.add(n['full'])
+    if matches is None:
+        lowered = [keyword.lower() for keyword in keywords]
+        matches = lambda node: any(keyword in node.get('module', '').lower() for keyword in lowered)
+    # path[d] is the 'full' identifier of the current node's ancestor at depth d
+    base = len(ancestors)
+    path = [n['full'] for n in ancestors]
+    for node, depth in iter_preorder(nodes):
+        del path[base + depth:]
+        path.append(node['full'])
+        if matches(node):
+            kept_nodes.update(path)
             for child in node.get('children', []):
                 kept_nodes.add(child['full'])
-        
-        find_matches_and_relatives(node.get('children', []), keywords, kept_nodes, current_path)
 
 def rebuild_tree(nodes, kept_nodes):
     """
-    Recursively rebuilds the tree, only including nodes whose 'full' identifier
+    Rebuilds the tree, only including nodes whose 'full' identifier
     is in the kept_nodes set.
     """
-    new_tree = []
-    for node in nodes:
-        if node['full'] in kept_nodes:
-            new_node = copy.deepcopy(node)
-            new_node['children'] = rebuild_tree(node.get('children', []), kept_nodes)
-            new_tree.append(new_node)
-    return new_tree
+    return prune(nodes, lambda node: node['full'] in kept_nodes)
 
 def filter_dependencies(root_nodes, keywords):
     """
-    Filters the dependency tree based on a list of keywords.
+    Filters the dependency tree based on a list of keywords or a query string
+    (see query.py). Raises query.QueryError for a query that does not parse.
     """
     kept_nodes = set()
-    find_matches_and_relatives(root_nodes, keywords, kept_nodes, [])
+    if isinstance(keywords, str):
+        find_matches_and_relatives(
+            root_nodes, None, kept_nodes, [], compile_query(keywords).node_matcher()
+        )
+    else:
+        find_matches_and_relatives(root_nodes, keywords, kept_nodes, [])
     return rebuild_tree(root_nodes, kept_nodes)
 
 def filter_project_only(nodes):
     """
     Filters the dependency tree to only include project dependencies.
     Project dependencies start with 'project'.
-    Recursively removes all external dependencies from children.
+    Removes all external dependencies from children at every level.
     """
-    project_nodes = []
-    for node in nodes:
-        if node.get('module', '').startswith('project '):
-            # Create a deep copy and recursively filter children
-            project_node = copy.deepcopy(node)
-            project_node['children'] = filter_project_only(node.get('children', []))
-            project_nodes.append(project_node)
-    return project_nodes
+    return prune(nodes, lambda node: node.get('module', '').startswith('project '))
 
 def main():
     """Main function to read, filter, and write dependencies."""
     parser = argparse.ArgumentParser(description='Filter a dependency JSON file.')
     parser.add_argument('--file', type=str, required=True, help='The path to the dependency JSON file.')
-    parser.add_argument('--filter', type=str, help='A comma-separated list of keywords to filter the dependency tree.')
+    parser.add_argument('--filter', type=str, help='A filter query, e.g. "okhttp, retrofit" or "group:androidx.* AND version<2.0".')
     parser.add_argument('--project-only', '-p', action='store_true', help='Filter to show only project dependencies.')
     parser.add_argument('--output', '-o', type=str, help='The path to the output JSON file. If not provided, prints to stdout.')
+    parser.add_argument('--profile-memory', action='store_true', help='Report peak and retained memory per stage on stderr')
     args = parser.parse_args()
     
     if not args.filter and not args.project_only:
         parser.error('Either --filter or --project-only must be specified.')
 
+    with profiling() if args.profile_memory else nullcontext() as profile:
+        filter_file(args, parser)
+    if profile is not None:
+        print(format_report(profile), file=sys.stderr)
+
+def filter_file(args, parser):
+    """Filters args.file as requested on the command line."""
     try:
-        with open(args.file, 'r', encoding='utf-8') as f:
-            dependency_graph = json.load(f)
+        with stage("load"), open(args.file, 'r', encoding='utf-8') as f:
+            dependency_graph = loads(f.read())
     except FileNotFoundError:
         print(f"Error: {args.file} not found.", file=sys.stderr)
         return
@@ -85,22 +96,26 @@ def main():
         print(f"Error: Could not find root nodes in {args.file}", file=sys.stderr)
         return
     
-    if args.project_only:
-        print("Filtering dependencies to show only project dependencies", file=sys.stderr)
-        filtered_nodes = filter_project_only(root_nodes)
-    else:
-        keywords = [k.strip() for k in args.filter.split(',')]
-        print(f"Filtering dependencies with keywords: {keywords}", file=sys.stderr)
-        filtered_nodes = filter_dependencies(root_nodes, keywords)
+    with stage("filter"):
+        if args.project_only:
+            print("Filtering dependencies to show only project dependencies", file=sys.stderr)
+            filtered_nodes = filter_project_only(root_nodes)
+        else:
+            print(f"Filtering dependencies with query: {args.filter}", file=sys.stderr)
+            try:
+                filtered_nodes = filter_dependencies(root_nodes, args.filter)
+            except QueryError as e:
+                parser.error(f'Invalid --filter: {e}')
     
     dependency_graph[root_key] = filtered_nodes
 
-    if args.output:
-        with open(args.output, 'w', encoding='utf-8') as f:
-            json.dump(dependency_graph, f, indent=2)
-        print(f"Successfully created filtered file: {args.output}", file=sys.stderr)
-    else:
-        print(json.dumps(dependency_graph, indent=2))
+    with stage("write"):
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(dumps(dependency_graph, indent=2))
+            print(f"Successfully created filtered file: {args.output}", file=sys.stderr)
+        else:
+            print(dumps(dependency_graph, indent=2))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
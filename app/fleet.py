@@ -0,0 +1,228 @@
+"""
+Fleet-wide inverted index over every stored file: which snapshots contain a
+given group:artifact at which versions, and how often.
+
+The index lives in DATA_DIR/.derived/fleet.json as
+    {"files": {filename: fingerprint},
+     "postings": {module: {version: {filename: occurrences}}},
+     "keys": {filename: [[module, version], ...]}}
+"keys" lists the postings of each file, so removing one touches only those.
+It is updated incrementally when files are stored or removed, and reconciled
+against the directory listing before queries, so files added by another
+worker or by hand are picked up without reading the ones already indexed.
+Every update holds an flock() on DATA_DIR/.derived/fleet.lock, so workers
+sharing DATA_DIR do not lose each other's changes.
+"""
+import fnmatch
+import json
+import os
+import tempfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: the thread lock only covers this process
+    fcntl = None
+
+try:
+    from . import graph_store
+    from .utils import parse_version_range, version_key
+except ImportError:
+    import graph_store
+    from utils import parse_version_range, version_key
+
+INDEX_FILENAME = "fleet.json"
+LOCK_FILENAME = "fleet.lock"
+
+_lock = threading.Lock()
+# (index path, (mtime_ns, size)) -> parsed index, so repeated queries skip the JSON parse
+_loaded = {}
+
+
+def index_path(data_dir):
+    return Path(data_dir) / graph_store.DERIVED_DIRNAME / INDEX_FILENAME
+
+
+def _empty():
+    return {"files": {}, "postings": {}, "keys": {}}
+
+
+@contextmanager
+def _locked(data_dir):
+    """Holds the thread lock and, across processes, the index's lock file."""
+    with _lock:
+        if fcntl is None:
+            yield
+            return
+        path = index_path(data_dir).with_name(LOCK_FILENAME)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _with_keys(index):
+    # Indexes written before "keys" existed get it derived once
+    if "keys" not in index:
+        keys = index["keys"] = {filename: [] for filename in index["files"]}
+        for module, versions in index["postings"].items():
+            for version, files in versions.items():
+                for filename in files:
+                    keys.setdefault(filename, []).append([module, version])
+    return index
+
+
+def _load(data_dir):
+    path = index_path(data_dir)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return _empty()
+    cached = _loaded.get(str(path))
+    if cached is not None and cached[0] == (st.st_mtime_ns, st.st_size):
+        return cached[1]
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            index = _with_keys(json.load(f))
+    except (OSError, ValueError) as e:
+        print(f"Rebuilding unreadable fleet index: {e}")
+        return _empty()
+    _loaded[str(path)] = ((st.st_mtime_ns, st.st_size), index)
+    return index
+
+
+def _save(data_dir, index):
+    path = index_path(data_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(index, f, separators=(",", ":"))
+        os.replace(temp_name, path)
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+    st = os.stat(path)
+    _loaded[str(path)] = ((st.st_mtime_ns, st.st_size), index)
+
+
+def file_postings(store):
+    """Counts the (module, version) occurrences in the tree of a mapped store."""
+    counts = Counter(store.tree_rec)
+    postings = Counter()
+    for rec, count in counts.items():
+        version = store.string(store.rec_version[rec])
+        if version:
+            postings[(store.string(store.rec_module[rec]), version)] += count
+    return postings
+
+
+def _remove(index, filename):
+    if index["files"].pop(filename, None) is None:
+        return False
+    postings = index["postings"]
+    for module, version in index["keys"].pop(filename, ()):
+        versions = postings.get(module)
+        if versions is None or version not in versions:
+            continue
+        versions[version].pop(filename, None)
+        if not versions[version]:
+            del versions[version]
+            if not versions:
+                del postings[module]
+    return True
+
+
+def _add(index, json_path, store):
+    filename = Path(json_path).name
+    _remove(index, filename)
+    keys = []
+    for (module, version), count in file_postings(store).items():
+        index["postings"].setdefault(module, {}).setdefault(version, {})[filename] = count
+        keys.append([module, version])
+    index["files"][filename] = list(store.fingerprint)
+    index["keys"][filename] = keys
+
+
+def add_file(json_path, store):
+    """Indexes (or reindexes) a stored file from its mapped store."""
+    data_dir = Path(json_path).parent
+    with _locked(data_dir):
+        index = _load(data_dir)
+        _add(index, json_path, store)
+        _save(data_dir, index)
+
+
+def remove_file(json_path):
+    """Drops a stored file from the index."""
+    data_dir = Path(json_path).parent
+    with _locked(data_dir):
+        index = _load(data_dir)
+        if _remove(index, Path(json_path).name):
+            _save(data_dir, index)
+
+
+def sync(data_dir, open_store):
+    """
+    Brings the index in line with the files in data_dir, indexing new or
+    changed files with open_store(path) and dropping vanished ones. Returns the index.
+    """
+    data_dir = Path(data_dir)
+    with _locked(data_dir):
+        index = _load(data_dir)
+        changed = False
+        present = {}
+        if data_dir.exists():
+            for path in data_dir.glob("*.json"):
+                try:
+                    present[path.name] = list(graph_store.source_fingerprint(path))
+                except FileNotFoundError:
+                    continue
+        for filename in list(index["files"]):
+            if filename not in present:
+                changed |= _remove(index, filename)
+        for filename, fingerprint in present.items():
+            if index["files"].get(filename) != fingerprint:
+                try:
+                    _add(index, data_dir / filename, open_store(data_dir / filename))
+                    changed = True
+                except Exception as e:
+                    print(f"Could not index {filename}: {e}")
+        if changed:
+            _save(data_dir, index)
+        return index
+
+
+def query(index, module, versions=None):
+    """
+    Finds the stored files containing module (group:artifact, glob patterns
+    allowed) at versions matching the range. Results are grouped per module
+    and version, in version order.
+    """
+    matches_version = parse_version_range(versions)
+    pattern = module.strip().lower()
+    if any(c in pattern for c in "*?["):
+        modules = [m for m in index["postings"] if fnmatch.fnmatchcase(m.lower(), pattern)]
+    else:
+        modules = [m for m in index["postings"] if m.lower() == pattern]
+
+    results = []
+    for name in sorted(modules):
+        by_version = index["postings"][name]
+        for version in sorted(by_version, key=version_key):
+            if not matches_version(version):
+                continue
+            files = sorted(by_version[version].items(), key=lambda item: (-item[1], item[0]))
+            results.append({
+                "module": name,
+                "version": version,
+                "files": [{"filename": f, "count": count} for f, count in files],
+                "total_count": sum(count for _, count in files),
+            })
+    return results
@@ -0,0 +1,176 @@
+"""
+Per-node footprint metrics of the dependency graph: fan-in, fan-out,
+transitive closure size (distinct nodes reachable below a node), height
+(longest path down to a leaf) and depth (BFS level from the root).
+
+Closures are Python int bitsets unioned in reverse topological order over the
+strongly connected components, so cycles are handled and every union is a
+word-level OR. Bits are numbered in component order (sinks first), which keeps
+each closure no wider than the part of the graph below it, and a component's
+bitset is released as soon as its last predecessor has consumed it.
+"""
+from array import array
+
+SORT_KEYS = ("closure", "fan_in", "fan_out", "height", "depth")
+
+
+def strongly_connected_components(node_count, offsets, targets):
+    """
+    Iterative Tarjan over a CSR adjacency. Returns (component of each node,
+    component count). Components are numbered in reverse topological order:
+    every edge between components goes to a lower number.
+    """
+    index = array("i", [-1]) * node_count
+    low = array("i", [0]) * node_count
+    component = array("i", [-1]) * node_count
+    on_stack = bytearray(node_count)
+    stack = []
+    counter = 0
+    count = 0
+
+    for start in range(node_count):
+        if index[start] >= 0:
+            continue
+        index[start] = low[start] = counter
+        counter += 1
+        stack.append(start)
+        on_stack[start] = 1
+        work = [[start, offsets[start]]]
+        while work:
+            frame = work[-1]
+            node, edge = frame
+            if edge < offsets[node + 1]:
+                frame[1] = edge + 1
+                target = targets[edge]
+                if index[target] < 0:
+                    index[target] = low[target] = counter
+                    counter += 1
+                    stack.append(target)
+                    on_stack[target] = 1
+                    work.append([target, offsets[target]])
+                elif on_stack[target] and index[target] < low[node]:
+                    low[node] = index[target]
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[node] < low[parent]:
+                    low[parent] = low[node]
+            if low[node] == index[node]:
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = 0
+                    component[member] = count
+                    if member == node:
+                        break
+                count += 1
+    return component, count
+
+
+class Footprint:
+    """Metric columns indexed by graph node index."""
+
+    def __init__(self, node_count, offsets, targets, levels=None):
+        component, count = strongly_connected_components(node_count, offsets, targets)
+
+        sizes = array("I", [0]) * count
+        for node in range(node_count):
+            sizes[component[node]] += 1
+        # Bit range [starts[c], starts[c] + sizes[c]) holds the members of c
+        starts = array("I", [0]) * count
+        position = 0
+        for c in range(count):
+            starts[c] = position
+            position += sizes[c]
+
+        successors = [set() for _ in range(count)]
+        self.fan_out = array("I", [0]) * node_count
+        self.fan_in = array("I", [0]) * node_count
+        for node in range(node_count):
+            source = component[node]
+            self.fan_out[node] = offsets[node + 1] - offsets[node]
+            for edge in range(offsets[node], offsets[node + 1]):
+                target = targets[edge]
+                self.fan_in[target] += 1
+                if component[target] != source:
+                    successors[source].add(component[target])
+
+        pending = array("I", [0]) * count
+        for targets_of in successors:
+            for target in targets_of:
+                pending[target] += 1
+
+        reach = [0] * count
+        closure_sizes = array("I", [0]) * count
+        heights = array("I", [0]) * count
+        for c in range(count):
+            bits = 0
+            height = 0
+            for successor in successors[c]:
+                bits |= reach[successor]
+                if heights[successor] + 1 > height:
+                    height = heights[successor] + 1
+                pending[successor] -= 1
+                if pending[successor] == 0:
+                    reach[successor] = 0
+            closure_sizes[c] = bits.bit_count()
+            heights[c] = height
+            # What a predecessor reaches through c: c itself and everything below
+            if pending[c]:
+                reach[c] = bits | (((1 << sizes[c]) - 1) << starts[c])
+
+        self.closure = array("I", [0]) * node_count
+        self.height = array("I", [0]) * node_count
+        for node in range(node_count):
+            c = component[node]
+            # Other members of a cycle are reachable too
+            self.closure[node] = closure_sizes[c] + sizes[c] - 1
+            self.height[node] = heights[c]
+        self.depth = array("i", levels) if levels is not None else array("i", [-1]) * node_count
+        self.component_count = count
+        self.cyclic_components = sum(1 for size in sizes if size > 1)
+
+    def metrics(self, node):
+        return {
+            "fan_in": self.fan_in[node],
+            "fan_out": self.fan_out[node],
+            "closure": self.closure[node],
+            "height": self.height[node],
+            "depth": self.depth[node],
+        }
+
+
+def store_footprint(store):
+    """Returns the Footprint of a mapped store, computing it once per store."""
+    return store.cached(
+        "footprint",
+        lambda s: Footprint(s.node_count, s.child_off, s.child_tgt, s.node_level),
+    )
+
+
+def footprint_report(store, sort="closure", limit=None, direct=False):
+    """
+    Returns node metrics sorted by a metric (descending), leaving out the
+    synthetic root. With direct, only the root's children are listed.
+    """
+    footprint = store_footprint(store)
+    if direct and store.root_node >= 0:
+        nodes = list(store.children_of(store.root_node))
+    else:
+        nodes = [i for i in range(store.node_count) if i != store.root_node]
+    column = getattr(footprint, sort)
+    nodes.sort(key=lambda node: -column[node])
+    if limit is not None:
+        nodes = nodes[:limit]
+    return {
+        "nodes": [
+            {"id": store.string(store.node_id[node]), **footprint.metrics(node)}
+            for node in nodes
+        ],
+        "metadata": {
+            "total_nodes": store.node_count - (1 if store.root_node >= 0 else 0),
+            "components": footprint.component_count,
+            "cyclic_components": footprint.cyclic_components,
+        },
+    }
@@ -0,0 +1,578 @@
+"""
+Read-only, memory-mapped binary representation of a stored dependency file.
+
+Each DATA_DIR/<name>.json gets a derived DATA_DIR/.derived/<name>.gdvs holding
+a string table, the unique node records, the tree as flattened pre-order
+columns (record, depth, subtree size) and the deduplicated graph (node table,
+BFS levels from root and CSR adjacency in both directions). Every section is a
+flat array of native 32-bit integers, so workers map the file and read it in
+place; the OS page cache shares the pages between processes.
+
+The file is derived data for the local host: it uses native byte order and is
+rebuilt whenever the source file changes.
+
+Indexes and reports computed from a store (search index, footprint,
+dominators, node lookups) are Python objects, private to each process. They
+are kept for the DERIVED_CACHE_SIZE most recently used (store, kind) pairs
+of the process, so their memory per worker stays bounded however many files
+are opened.
+"""
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict, deque
+from pathlib import Path
+
+try:
+    from .traverse import flatten, loads
+    from .utils import get_root_key_and_nodes
+except ImportError:
+    from traverse import flatten, loads
+    from utils import get_root_key_and_nodes
+
+# Objects computed from stores kept per process, over all stores
+DERIVED_CACHE_SIZE = int(os.environ.get("DERIVED_CACHE_SIZE", "16"))
+
+_derived = OrderedDict()
+_derived_lock = threading.Lock()
+
+DERIVED_DIRNAME = ".derived"
+STORE_SUFFIX = ".gdvs"
+MAGIC = b"GDVSTOR2"
+ROOT_ID = "root:"
+
+# (name, array typecode) of every section, in file order
+SECTIONS = (
+    ("str_off", "I"),
+    ("str_blob", "B"),
+    ("rec_module", "I"),
+    ("rec_version", "I"),
+    ("rec_resolution", "I"),
+    ("rec_full", "I"),
+    ("rec_node", "I"),
+    ("tree_rec", "I"),
+    ("tree_depth", "I"),
+    ("tree_size", "I"),
+    ("node_id", "I"),
+    ("node_module", "I"),
+    ("node_version", "I"),
+    ("node_resolution", "I"),
+    ("node_full", "I"),
+    ("node_level", "i"),
+    ("child_off", "I"),
+    ("child_tgt", "I"),
+    ("parent_off", "I"),
+    ("parent_tgt", "I"),
+)
+
+# magic, source fingerprint (4 x u64), root key string id, root node index (-1 if none)
+_HEADER = struct.Struct("<8sQQQQIi")
+_SECTION = struct.Struct("<QQ")
+
+
+def derived_dir(json_path):
+    """Returns the directory holding derived artifacts for a stored file."""
+    return Path(json_path).parent / DERIVED_DIRNAME
+
+
+def store_path_for(json_path):
+    """Returns the path of the mapped store derived from a stored JSON file."""
+    json_path = Path(json_path)
+    return derived_dir(json_path) / (json_path.name + STORE_SUFFIX)
+
+
+def source_fingerprint(json_path):
+    """
+    Identifies the source file a store was built from: its inode, size and
+    modification time, so any rewrite of the file invalidates the store.
+    """
+    st = os.stat(json_path)
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def store_fingerprint(store_path):
+    """Returns the source fingerprint recorded in a store, or None if unreadable."""
+    try:
+        with open(store_path, "rb") as f:
+            header = f.read(_HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(header) < _HEADER.size:
+        return None
+    magic, *fingerprint, _, _ = _HEADER.unpack(header)
+    if magic != MAGIC:
+        return None
+    return tuple(fingerprint)
+
+
+def is_current(json_path):
+    """Tells whether the store of a stored file exists and matches it."""
+    return store_fingerprint(store_path_for(json_path)) == source_fingerprint(json_path)
+
+
+class _Strings:
+    def __init__(self):
+        self.ids = {}
+        self.offsets = array("I", [0])
+        self.blob = bytearray()
+
+    def intern(self, value):
+        sid = self.ids.get(value)
+        if sid is None:
+            sid = self.ids[value] = len(self.ids)
+            self.blob += value.encode("utf-8")
+            self.offsets.append(len(self.blob))
+        return sid
+
+
+def _csr(lists):
+    offsets = array("I", [0])
+    targets = array("I")
+    for items in lists:
+        targets.extend(items)
+        offsets.append(len(targets))
+    return offsets, targets
+
+
+def build_sections(dependency_data):
+    """
+    Builds the store sections for parsed dependency data.
+    Returns (root_key_sid, root_node, sections) with sections keyed by name.
+    """
+    strings = _Strings()
+    root_key, root_nodes = get_root_key_and_nodes(dependency_data)
+    root_key_sid = strings.intern(root_key or "")
+    items, depths, sizes = flatten(root_nodes or [])
+
+    records = {}
+    rec_cols = [array("I") for _ in range(5)]
+    node_index = {}
+    node_ids = []
+    node_cols = [array("I") for _ in range(5)]
+    children = []
+    parents = []
+
+    def add_node(node_id, module, version, resolution, full):
+        index = node_index[node_id] = len(node_index)
+        node_ids.append(node_id)
+        for col, value in zip(node_cols, (node_id, module, version, resolution, full)):
+            col.append(strings.intern(value))
+        children.append({})
+        parents.append({})
+        return index
+
+    tree_rec = array("I")
+    path = []
+    for node, depth in zip(items, depths):
+        module = node.get("module", "")
+        version = node.get("version", "")
+        resolution = node.get("resolution", "")
+        full = node.get("full", "")
+        key = (module, version, resolution, full)
+        rec = records.get(key)
+        if rec is None:
+            # Same node ID scheme as convert_to_graph.traverse_tree
+            node_id = f"{module}:{version}" if version else module
+            index = node_index.get(node_id)
+            if index is None:
+                index = add_node(node_id, module, version, resolution, full)
+            rec = records[key] = len(records)
+            for col, value in zip(rec_cols, (module, version, resolution, full)):
+                col.append(strings.intern(value))
+            rec_cols[4].append(index)
+        tree_rec.append(rec)
+
+        index = rec_cols[4][rec]
+        del path[depth:]
+        # An empty parent ID never links, as in traverse_tree
+        if path and node_ids[path[-1]]:
+            parent = path[-1]
+            children[parent][index] = None
+            parents[index][parent] = None
+        path.append(index)
+
+    root_node = -1
+    if items:
+        # Connect a synthetic root to every node without parents, like build_graph
+        orphans = [i for i in range(len(parents)) if not parents[i]]
+        root_node = add_node(ROOT_ID, "root", "", "", "root")
+        for index in orphans:
+            children[root_node][index] = None
+            parents[index][root_node] = None
+
+    levels = array("i", [-1]) * len(node_index)
+    if root_node >= 0:
+        levels[root_node] = 0
+        queue = deque([root_node])
+        while queue:
+            current = queue.popleft()
+            next_level = levels[current] + 1
+            for child in children[current]:
+                if levels[child] < 0:
+                    levels[child] = next_level
+                    queue.append(child)
+
+    child_off, child_tgt = _csr(children)
+    parent_off, parent_tgt = _csr(parents)
+    sections = {
+        "str_off": strings.offsets,
+        "str_blob": array("B", bytes(strings.blob)),
+        "rec_module": rec_cols[0],
+        "rec_version": rec_cols[1],
+        "rec_resolution": rec_cols[2],
+        "rec_full": rec_cols[3],
+        "rec_node": rec_cols[4],
+        "tree_rec": tree_rec,
+        "tree_depth": array("I", depths),
+        "tree_size": array("I", sizes),
+        "node_id": node_cols[0],
+        "node_module": node_cols[1],
+        "node_version": node_cols[2],
+        "node_resolution": node_cols[3],
+        "node_full": node_cols[4],
+        "node_level": levels,
+        "child_off": child_off,
+        "child_tgt": child_tgt,
+        "parent_off": parent_off,
+        "parent_tgt": parent_tgt,
+    }
+    return root_key_sid, root_node, sections
+
+
+def write_store(dependency_data, store_path, fingerprint):
+    """Writes the mapped store for dependency data atomically."""
+    root_key_sid, root_node, sections = build_sections(dependency_data)
+    store_path = Path(store_path)
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+
+    table_size = _HEADER.size + _SECTION.size * len(SECTIONS)
+    layout = []
+    offset = table_size
+    for name, _ in SECTIONS:
+        data = sections[name].tobytes()
+        offset += -offset % 8
+        layout.append((offset, data))
+        offset += len(data)
+
+    fd, temp_name = tempfile.mkstemp(dir=store_path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, *fingerprint, root_key_sid, root_node))
+            for section_offset, data in layout:
+                f.write(_SECTION.pack(section_offset, len(data)))
+            for section_offset, data in layout:
+                f.write(b"\0" * (section_offset - f.tell()))
+                f.write(data)
+        os.replace(temp_name, store_path)
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+
+
+def build_store(json_path):
+    """Builds the mapped store for a stored JSON file from its contents."""
+    fingerprint = source_fingerprint(json_path)
+    with open(json_path, "r", encoding="utf-8") as f:
+        dependency_data = loads(f.read())
+    write_store(dependency_data, store_path_for(json_path), fingerprint)
+
+
+def clone_store(source_json_path, json_path):
+    """
+    Reuses the store of source_json_path for json_path, a copy of the same
+    contents, by rewriting the header fingerprint. Returns False when the
+    source store is missing or stale.
+    """
+    if not is_current(source_json_path):
+        return False
+    try:
+        with open(store_path_for(source_json_path), "rb") as f:
+            magic, _, _, _, _, root_key_sid, root_node = _HEADER.unpack(f.read(_HEADER.size))
+            store_path = store_path_for(json_path)
+            store_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_name = tempfile.mkstemp(dir=store_path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as out:
+                    out.write(
+                        _HEADER.pack(
+                            MAGIC, *source_fingerprint(json_path), root_key_sid, root_node
+                        )
+                    )
+                    shutil.copyfileobj(f, out)
+                os.replace(temp_name, store_path)
+            except BaseException:
+                Path(temp_name).unlink(missing_ok=True)
+                raise
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def iter_derived(json_path):
+    """Yields (path, suffix) for every derived artifact of a stored file."""
+    directory = derived_dir(json_path)
+    name = Path(json_path).name
+    if directory.exists():
+        for path in directory.glob(f"{name}.*"):
+            yield path, path.name[len(name):]
+
+
+def remove_derived(json_path):
+    """Deletes every derived artifact of a stored JSON file."""
+    for path, _ in list(iter_derived(json_path)):
+        path.unlink(missing_ok=True)
+
+
+class MappedStore:
+    """Zero-copy view over a .gdvs file. Sections are memoryviews into the mapping."""
+
+    def __init__(self, store_path):
+        with open(store_path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mm)
+        magic, *fingerprint, root_key_sid, root_node = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{store_path} is not a dependency store")
+        self.fingerprint = tuple(fingerprint)
+        self.root_node = root_node
+        for i, (name, typecode) in enumerate(SECTIONS):
+            offset, length = _SECTION.unpack_from(view, _HEADER.size + i * _SECTION.size)
+            setattr(self, name, view[offset:offset + length].cast(typecode))
+        self.root_key = self.string(root_key_sid) or None
+        self.position_count = len(self.tree_rec)
+        self.node_count = len(self.node_id)
+
+    def cached(self, name, build):
+        """
+        Memoizes build(self), data derived from this store's contents, in the
+        process-wide cache of the DERIVED_CACHE_SIZE most recently used objects.
+        """
+        key = (self.fingerprint, name)
+        with _derived_lock:
+            value = _derived.get(key)
+            if value is not None:
+                _derived.move_to_end(key)
+                return value
+        value = build(self)
+        with _derived_lock:
+            _derived[key] = value
+            _derived.move_to_end(key)
+            while len(_derived) > DERIVED_CACHE_SIZE:
+                _derived.popitem(last=False)
+        return value
+
+    def string(self, sid):
+        return str(self.str_blob[self.str_off[sid]:self.str_off[sid + 1]], "utf-8")
+
+    # Tree access
+
+    def record(self, rec):
+        """Returns the node dict (without children) for a record."""
+        return {
+            "module": self.string(self.rec_module[rec]),
+            "version": self.string(self.rec_version[rec]),
+            "resolution": self.string(self.rec_resolution[rec]),
+            "full": self.string(self.rec_full[rec]),
+        }
+
+    def prune_positions(self, keep):
+        """
+        Returns the tree positions whose record satisfies keep(rec), dropping the
+        subtree of every position that does not.
+        """
+        positions = []
+        tree_rec = self.tree_rec
+        tree_size = self.tree_size
+        position = 0
+        while position < self.position_count:
+            if keep(tree_rec[position]):
+                positions.append(position)
+                position += 1
+            else:
+                position += tree_size[position]
+        return positions
+
+    def build_tree(self, positions=None):
+        """
+        Rebuilds nested node dicts for the given pre-order positions (all by default).
+        Every position's parent must be included as well.
+        """
+        if positions is None:
+            positions = range(self.position_count)
+        result = []
+        outputs = [result]
+        records = {}
+        tree_depth = self.tree_depth
+        tree_rec = self.tree_rec
+        for position in positions:
+            depth = tree_depth[position]
+            rec = tree_rec[position]
+            fields = records.get(rec)
+            if fields is None:
+                fields = records[rec] = self.record(rec)
+            node = dict(fields)
+            node["children"] = []
+            del outputs[depth + 1:]
+            outputs[depth].append(node)
+            outputs.append(node["children"])
+        return result
+
+    def tree_data(self, positions=None):
+        """Returns {root_key: nodes}, the same shape as the stored JSON without raw_txt."""
+        if self.root_key is None:
+            return {}
+        return {self.root_key: self.build_tree(positions)}
+
+    def select_project_only(self):
+        """Positions kept by filter.filter_project_only."""
+        keep = [
+            self.string(sid).startswith("project ") for sid in self.rec_module
+        ]
+        return self.prune_positions(keep.__getitem__)
+
+    def select_matches(self, matches_record):
+        """
+        Positions kept by filter.find_matches_and_relatives followed by rebuild_tree,
+        where matches_record(rec) decides whether a node matches.
+        """
+        tree_rec = self.tree_rec
+        tree_depth = self.tree_depth
+        tree_size = self.tree_size
+        rec_full = self.rec_full
+        matched = [matches_record(rec) for rec in range(len(rec_full))]
+
+        kept_full = set()
+        path = []
+        for position in range(self.position_count):
+            del path[tree_depth[position]:]
+            path.append(position)
+            if matched[tree_rec[position]]:
+                kept_full.update(rec_full[tree_rec[p]] for p in path)
+                end = position + tree_size[position]
+                child = position + 1
+                while child < end:
+                    kept_full.add(rec_full[tree_rec[child]])
+                    child += tree_size[child]
+        return self.prune_positions(lambda rec: rec_full[rec] in kept_full)
+
+    def select_keywords(self, keywords):
+        """Positions kept by a comma-separated keyword filter."""
+        lowered = [keyword.lower() for keyword in keywords]
+        modules = [self.string(sid).lower() for sid in self.rec_module]
+        return self.select_matches(
+            lambda rec: any(keyword in modules[rec] for keyword in lowered)
+        )
+
+    def select_query(self, query):
+        """Positions kept by a compiled query.Query."""
+        return self.select_matches(query.record_matcher(self))
+
+    def dependencies(self):
+        """Returns the sorted unique module:version list, like enlist.extract_dependencies_from_json."""
+        result = set()
+        for rec in range(len(self.rec_module)):
+            version = self.string(self.rec_version[rec])
+            if version:
+                result.add(f"{self.string(self.rec_module[rec])}:{version}")
+        return sorted(result)
+
+    # Graph access
+
+    def children_of(self, index):
+        return self.child_tgt[self.child_off[index]:self.child_off[index + 1]]
+
+    def parents_of(self, index):
+        return self.parent_tgt[self.parent_off[index]:self.parent_off[index + 1]]
+
+    def node_index(self):
+        """Returns a dict from graph node ID to node index."""
+        return {self.string(sid): index for index, sid in enumerate(self.node_id)}
+
+    def select_graph_nodes(self, distance=None, exclude=None):
+        """
+        Node indices kept by the distance and exclude options, or None for all.
+        Same semantics as convert_to_graph.select_nodes.
+        """
+        if distance is None:
+            if not exclude:
+                return None
+            return {
+                i for i, sid in enumerate(self.node_id)
+                if exclude not in self.string(sid)
+            }
+
+        levels = self.node_level
+        if not exclude:
+            if self.root_node < 0:
+                return None
+            return {i for i, level in enumerate(levels) if 0 <= level <= distance}
+
+        excluded = {
+            i for i, sid in enumerate(self.node_id) if exclude in self.string(sid)
+        }
+        if self.root_node < 0 or self.root_node in excluded:
+            return set(range(self.node_count)) - excluded
+        distances = {self.root_node: 0}
+        queue = deque([self.root_node])
+        while queue:
+            current = queue.popleft()
+            current_distance = distances[current]
+            if current_distance >= distance:
+                continue
+            for child in self.children_of(current):
+                if child not in distances and child not in excluded:
+                    distances[child] = current_distance + 1
+                    queue.append(child)
+        return set(distances)
+
+    def graph_node(self, index):
+        """Returns a graph node in the convert_to_graph output format."""
+        return {
+            "id": self.string(self.node_id[index]),
+            "module": self.string(self.node_module[index]),
+            "version": self.string(self.node_version[index]),
+            "resolution": self.string(self.node_resolution[index]),
+            "full": self.string(self.node_full[index]),
+        }
+
+    def iter_graph_nodes(self, kept=None):
+        """Yields graph nodes in the convert_to_graph output format."""
+        for index in range(self.node_count):
+            if kept is None or index in kept:
+                yield self.graph_node(index)
+
+    def iter_graph_edges(self, kept=None):
+        """Yields (source, target) node ID pairs."""
+        ids = {}
+        for index in range(self.node_count):
+            if kept is not None and index not in kept:
+                continue
+            for child in self.children_of(index):
+                if kept is None or child in kept:
+                    source = ids.get(index)
+                    if source is None:
+                        source = ids[index] = self.string(self.node_id[index])
+                    target = ids.get(child)
+                    if target is None:
+                        target = ids[child] = self.string(self.node_id[child])
+                    yield source, target
+
+    def graph_data(self, distance=None, exclude=None):
+        """Returns the graph in the convert_to_graph.process_data format, or None."""
+        if self.root_node < 0:
+            return None
+        kept = self.select_graph_nodes(distance, exclude)
+        nodes = list(self.iter_graph_nodes(kept))
+        edges = [
+            {"source": source, "target": target}
+            for source, target in self.iter_graph_edges(kept)
+        ]
+        return {
+            "nodes": nodes,
+            "edges": edges,
+            "metadata": {"total_nodes": len(nodes), "total_edges": len(edges)},
+        }
@@ -0,0 +1,138 @@
+"""
+Progressive graph delivery as Server-Sent Events.
+
+The graph is sent in BFS order from the root, in batches of nodes together
+with the edges whose endpoints have both been sent, so the viewer can draw
+the top levels while the rest is still being produced:
+
+    event: meta   {"total_nodes": n}
+    event: batch  {"level": l, "nodes": [...], "edges": [{"source", "target"}, ...]}
+    event: done   {"total_nodes": n, "total_edges": m}
+
+Nodes unreachable from the root come last with level -1.
+"""
+import json
+from collections import deque
+
+try:
+    from .graph_store import ROOT_ID
+except ImportError:
+    from graph_store import ROOT_ID
+
+BATCH_SIZE = 500
+
+
+def store_order(store, kept=None):
+    """Node indices of a mapped store by BFS level, unreachable ones last."""
+    buckets = []
+    unreachable = []
+    for index, level in enumerate(store.node_level):
+        if kept is not None and index not in kept:
+            continue
+        if level < 0:
+            unreachable.append(index)
+            continue
+        while len(buckets) <= level:
+            buckets.append([])
+        buckets[level].append(index)
+    return [(level, bucket) for level, bucket in enumerate(buckets) if bucket] + (
+        [(-1, unreachable)] if unreachable else []
+    )
+
+
+def store_batches(store, kept=None, batch_size=BATCH_SIZE):
+    """Yields (level, nodes, edges) batches of a mapped store, edges as (source, target) IDs."""
+    sent = bytearray(store.node_count)
+    ids = {}
+
+    def node_id(index):
+        value = ids.get(index)
+        if value is None:
+            value = ids[index] = store.string(store.node_id[index])
+        return value
+
+    for level, indices in store_order(store, kept):
+        for start in range(0, len(indices), batch_size):
+            nodes = []
+            edges = []
+            for index in indices[start:start + batch_size]:
+                sent[index] = 1
+                nodes.append(store.graph_node(index))
+                # Each edge goes out with whichever endpoint is sent last
+                for parent in store.parents_of(index):
+                    if sent[parent]:
+                        edges.append((node_id(parent), node_id(index)))
+                for child in store.children_of(index):
+                    if sent[child] and child != index:
+                        edges.append((node_id(index), node_id(child)))
+            yield level, nodes, edges
+
+
+def graph_batches(graph_data, batch_size=BATCH_SIZE):
+    """Yields (level, nodes, edges) batches of a convert_to_graph.process_data result."""
+    children = {}
+    has_parent = set()
+    for edge in graph_data["edges"]:
+        children.setdefault(edge["source"], []).append(edge["target"])
+        has_parent.add(edge["target"])
+    by_id = {node["id"]: node for node in graph_data["nodes"]}
+
+    if ROOT_ID in by_id:
+        starts = [ROOT_ID]
+    else:
+        starts = [node_id for node_id in by_id if node_id not in has_parent]
+    levels = dict.fromkeys(starts, 0)
+    queue = deque(starts)
+    while queue:
+        current = queue.popleft()
+        for child in children.get(current, ()):
+            if child not in levels and child in by_id:
+                levels[child] = levels[current] + 1
+                queue.append(child)
+
+    order = sorted(levels, key=levels.get)
+    order += [node_id for node_id in by_id if node_id not in levels]
+    sent = set()
+    parents = {}
+    for edge in graph_data["edges"]:
+        parents.setdefault(edge["target"], []).append(edge["source"])
+
+    position = 0
+    while position < len(order):
+        level = levels.get(order[position], -1)
+        nodes = []
+        edges = []
+        while position < len(order) and len(nodes) < batch_size:
+            node_id = order[position]
+            if levels.get(node_id, -1) != level:
+                break
+            position += 1
+            sent.add(node_id)
+            nodes.append(by_id[node_id])
+            for parent in parents.get(node_id, ()):
+                if parent in sent:
+                    edges.append((parent, node_id))
+            for child in children.get(node_id, ()):
+                if child in sent and child != node_id:
+                    edges.append((node_id, child))
+        yield level, nodes, edges
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def sse_graph(batches, total_nodes):
+    """Yields the SSE messages for (level, nodes, edges) batches."""
+    yield sse_event("meta", {"total_nodes": total_nodes})
+    sent_nodes = 0
+    sent_edges = 0
+    for level, nodes, edges in batches:
+        sent_nodes += len(nodes)
+        sent_edges += len(edges)
+        yield sse_event("batch", {
+            "level": level,
+            "nodes": nodes,
+            "edges": [{"source": source, "target": target} for source, target in edges],
+        })
+    yield sse_event("done", {"total_nodes": sent_nodes, "total_edges": sent_edges})
@@ -5,48 +5,263 @@ import os
 import subprocess
 import sys
 import tempfile
-import uuid
 from datetime import datetime
 from pathlib import Path
 
-import yaml
-from fastapi import FastAPI, File, HTTPException, Response, UploadFile
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, File, HTTPException, Query, Response, UploadFile
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 from starlette.requests import Request
 
+from .admission import BodyLimitMiddleware
+from .memprof import MemoryProfileMiddleware
+from .profiler import ProfileMiddleware, track
+from .telemetry import (
+    TimingMiddleware,
+    observe_nodes,
+    observe_payload,
+    render_prometheus,
+    stage,
+)
+
 APP_ROOT = Path(__file__).resolve().parent
 REPO_ROOT = APP_ROOT.parent
 PARSE_SCRIPT = APP_ROOT / "parse.py"
 CONVERT_SCRIPT = APP_ROOT / "convert_to_graph.py"
-DATA_DIR = APP_ROOT / "static" / "data"
+DATA_DIR = Path(os.environ.get("DATA_DIR", APP_ROOT / "static" / "data"))
 SAMPLE_DIR = APP_ROOT / "static" / "sample"
+TEMPLATE_DIRS = [str(APP_ROOT / "templates"), str(APP_ROOT / "viz")]
+# Compiled template bytecode, prebuilt by scripts/prebuild.py in the image
+TEMPLATE_CACHE_DIR = Path(
+    os.environ.get("TEMPLATE_CACHE_DIR", APP_ROOT / ".template_cache")
+)
 
-# Ensure data directory exists
-DATA_DIR.mkdir(parents=True, exist_ok=True)
-SAMPLE_DIR.mkdir(parents=True, exist_ok=True)
+# Stored graphs with more nodes than this are streamed to the graph viewer
+GRAPH_STREAM_THRESHOLD = int(os.environ.get("GRAPH_STREAM_THRESHOLD", "5000"))
 
 app = FastAPI()
+app.add_middleware(BodyLimitMiddleware)
+app.add_middleware(MemoryProfileMiddleware)
+app.add_middleware(TimingMiddleware)
+app.add_middleware(ProfileMiddleware)
 
-templates = Jinja2Templates(
-    directory=[str(APP_ROOT / "templates"), str(APP_ROOT / "viz")]
-)
+_templates = None
+
+
+def get_templates():
+    # Jinja is imported and configured on the first rendered page, not at startup
+    global _templates
+    if _templates is None:
+        import jinja2
+        from fastapi.templating import Jinja2Templates
+
+        bytecode_cache = None
+        try:
+            TEMPLATE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            if os.access(TEMPLATE_CACHE_DIR, os.W_OK):
+                bytecode_cache = jinja2.FileSystemBytecodeCache(str(TEMPLATE_CACHE_DIR))
+        except OSError as e:
+            print(f"Template cache disabled: {e}")
+
+        env = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(TEMPLATE_DIRS),
+            autoescape=True,
+            bytecode_cache=bytecode_cache,
+        )
+        _templates = Jinja2Templates(env=env)
+    return _templates
+
+
+def _ensure_data_dir() -> None:
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 
 @app.get("/", response_class=HTMLResponse)
 def index(request: Request) -> HTMLResponse:
     deps_history = os.environ.get("DEPS_HISTORY", "1")
-    return templates.TemplateResponse(
+    return get_templates().TemplateResponse(
         request=request, name="index.html", context={"deps_history": deps_history}
     )
 
 
+def _select_positions(store, filter: str = None, project_only: bool = False):
+    # Tree positions kept by the viewer filters, or None for the whole tree
+    if project_only:
+        print("Filtering: Project Only")
+        return store.select_project_only()
+    if filter:
+        from .query import compile_query
+
+        print(f"Filtering query: {filter}")
+        return store.select_query(compile_query(filter))
+    return None
+
+
+def _check_filter(filter: str = None) -> None:
+    # Rejects a filter query that does not parse before any work is queued
+    if filter:
+        from .query import QueryError, compile_query
+
+        try:
+            compile_query(filter)
+        except QueryError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid filter: {e}")
+
+
+def _load_tree_data(
+    dep_json_path: Path, filter: str = None, project_only: bool = False
+) -> dict:
+    from . import artifacts
+
+    if dep_json_path.parent == DATA_DIR:
+        # Stored files are read from their memory-mapped store
+        store = artifacts.open_store(dep_json_path)
+        with stage("filter"):
+            return store.tree_data(_select_positions(store, filter, project_only))
+
+    from . import filter as filter_module
+    from .utils import get_root_key_and_nodes
+
+    dependency_data = artifacts.load_dependency_data(dep_json_path)
+    root_key, root_nodes = get_root_key_and_nodes(dependency_data)
+
+    # Apply filtering if requested
+    with stage("filter"):
+        if project_only:
+            dependency_data[root_key] = filter_module.filter_project_only(root_nodes)
+        elif filter:
+            dependency_data[root_key] = filter_module.filter_dependencies(
+                root_nodes, filter
+            )
+    return dependency_data
+
+
+def _build_graph_data(
+    dep_json_path: Path,
+    filter: str = None,
+    project_only: bool = False,
+    distance: int = None,
+    exclude: str = None,
+) -> dict | None:
+    from . import artifacts, convert_to_graph
+
+    if not filter and not project_only and dep_json_path.parent == DATA_DIR:
+        # Unfiltered graphs come straight from the stored graph and BFS levels
+        store = artifacts.open_store(dep_json_path)
+        with stage("filter"):
+            graph_data = store.graph_data(distance, exclude)
+    else:
+        dependency_data = _load_tree_data(dep_json_path, filter, project_only)
+
+        # Process directly in-process
+        with stage("graph"):
+            graph_data = convert_to_graph.process_data(
+                dependency_data, distance=distance, exclude=exclude
+            )
+
+    if graph_data:
+        observe_nodes("graph", graph_data["metadata"]["total_nodes"])
+    return graph_data
+
+
+def _graph_viewer_json(
+    dep_json_path: Path,
+    filter: str = None,
+    project_only: bool = False,
+    distance: int = None,
+    exclude: str = None,
+) -> str:
+    # Runs on a worker: builds the graph and serializes it for the page
+    from jinja2.utils import htmlsafe_json_dumps
+
+    graph_data = None
+    try:
+        graph_data = _build_graph_data(
+            dep_json_path, filter, project_only, distance, exclude
+        )
+    except Exception as e:
+        print(f"Error converting graph in-process: {e}")
+        import traceback
+
+        traceback.print_exc()
+
+    with stage("serialize"):
+        return htmlsafe_json_dumps(graph_data)
+
+
+def _tree_viewer_json(
+    dep_json_path: Path, filter: str = None, project_only: bool = False
+) -> str:
+    # Runs on a worker: loads and filters the tree and serializes it for the page
+    from jinja2.utils import htmlsafe_json_dumps
+
+    from .traverse import dumps
+
+    tree_data = None
+    try:
+        tree_data = _load_tree_data(dep_json_path, filter, project_only)
+        observe_nodes("tree", sum(len(v) for v in tree_data.values()))
+    except Exception as e:
+        print(f"Error processing tree data: {e}")
+
+    with stage("serialize"):
+        return htmlsafe_json_dumps(tree_data, dumps=dumps)
+
+
+def _graph_node_count(dep_json_path: Path) -> int:
+    # Runs on a worker, since opening a store may have to build it
+    from . import artifacts
+
+    return artifacts.open_store(dep_json_path).node_count
+
+
+def _graph_stream_url(
+    file: str,
+    filter: str = None,
+    project_only: bool = False,
+    distance: int = None,
+    exclude: str = None,
+) -> str:
+    from urllib.parse import quote, urlencode
+
+    params = {"filter": filter, "distance": distance, "exclude": exclude}
+    params = {key: value for key, value in params.items() if value is not None}
+    if project_only:
+        params["project_only"] = "true"
+    url = f"/api/graph/{quote(file)}/stream"
+    return f"{url}?{urlencode(params)}" if params else url
+
+
+def _graph_ego_url(file: str, node: str, hops: int = 1, direction: str = "both") -> str:
+    from urllib.parse import quote, urlencode
+
+    params = urlencode({"node": node, "hops": hops, "direction": direction})
+    return f"/api/graph/{quote(file)}/ego?{params}"
+
+
+def _overlay_url(files: list) -> str:
+    from urllib.parse import urlencode
+
+    return "/api/overlay?" + urlencode([("files", filename) for filename in files])
+
+
 @app.get("/viz/graph_viewer.html", response_class=HTMLResponse)
 async def graph_viewer(
-    request: Request, file: str = None, filter: str = None, project_only: bool = False
+    request: Request,
+    file: str = None,
+    filter: str = None,
+    project_only: bool = False,
+    distance: int = None,
+    exclude: str = None,
+    stream: bool = None,
+    node: str = None,
+    hops: int = 1,
+    direction: str = "both",
+    overlay: list[str] = Query(None),
 ) -> HTMLResponse:
-    graph_data = None
+    from jinja2.utils import htmlsafe_json_dumps
+
+    from . import workers
 
     if file:
         dep_json_path = DATA_DIR / file
@@ -54,93 +269,87 @@ async def graph_viewer(
         # Fallback for backward compatibility
         dep_json_path = REPO_ROOT / "dependencies.json"
 
-    if dep_json_path.exists():
-        try:
-            from . import convert_to_graph
-            from . import filter as filter_module
-            from .utils import get_root_key_and_nodes
-
-            # Read the dependency data
-            with open(dep_json_path, "r", encoding="utf-8") as f:
-                dependency_data = json.load(f)
-
-            root_key, root_nodes = get_root_key_and_nodes(dependency_data)
-
-            # Apply filtering if requested
-            if project_only:
-                print("Filtering: Project Only")
-                dependency_data[root_key] = filter_module.filter_project_only(
-                    root_nodes
-                )
-            elif filter:
-                keywords = [k.strip() for k in filter.split(",")]
-                print(f"Filtering keywords: {keywords}")
-                kept_nodes = set()
-                filter_module.find_matches_and_relatives(
-                    root_nodes, keywords, kept_nodes, []
-                )
-                dependency_data[root_key] = filter_module.rebuild_tree(
-                    root_nodes, kept_nodes
-                )
-
-            # Process directly in-process
-            graph_data = convert_to_graph.process_data(dependency_data)
-        except Exception as e:
-            print(f"Error converting graph in-process: {e}")
-            import traceback
-
-            traceback.print_exc()
-
-    return templates.TemplateResponse(
-        request=request,
-        name="graph_viewer.html",
-        context={"graph_data": graph_data, "file_name": file},
-    )
+    stream_url = None
+    ego_url = None
+    overlay_url = None
+    if overlay:
+        # Several files merged into one graph, fetched by the page
+        overlay_url = _overlay_url(overlay)
+    elif file and node:
+        # The page fetches the neighbourhood of one node instead of the whole graph
+        ego_url = _graph_ego_url(file, node, hops, direction)
+    elif file and dep_json_path.exists() and stream is not False:
+        # Large graphs are streamed level by level instead of inlined in the page
+        if stream or await workers.run(_graph_node_count, dep_json_path) > GRAPH_STREAM_THRESHOLD:
+            stream_url = _graph_stream_url(file, filter, project_only, distance, exclude)
+
+    if stream_url is not None or ego_url is not None or overlay_url is not None:
+        with stage("serialize"):
+            graph_json = "null"
+    elif dep_json_path.exists():
+        # Identical concurrent requests, e.g. a shared link, are computed once
+        graph_json = await workers.run_shared(
+            ("graph_viewer", str(dep_json_path), filter, project_only, distance, exclude),
+            _graph_viewer_json,
+            dep_json_path, filter, project_only, distance, exclude,
+        )
+    else:
+        with stage("serialize"):
+            graph_json = "null"
+    observe_payload("response", len(graph_json))
+
+    with stage("render"):
+        return get_templates().TemplateResponse(
+            request=request,
+            name="graph_viewer.html",
+            context={
+                "graph_json": graph_json,
+                "stream_url": htmlsafe_json_dumps(stream_url),
+                "ego_url": htmlsafe_json_dumps(ego_url),
+                "overlay_url": htmlsafe_json_dumps(overlay_url),
+                "file_name": file,
+            },
+        )
 
 
 @app.get("/viz/tree_viewer.html", response_class=HTMLResponse)
 async def tree_viewer(
     request: Request, file: str = None, filter: str = None, project_only: bool = False
 ) -> HTMLResponse:
-    tree_data = None
+    from . import workers
+
+    dep_json_path = DATA_DIR / file if file else None
+    if dep_json_path is not None and dep_json_path.exists():
+        tree_json = await workers.run_shared(
+            ("tree_viewer", str(dep_json_path), filter, project_only),
+            _tree_viewer_json,
+            dep_json_path, filter, project_only,
+        )
+    else:
+        with stage("serialize"):
+            tree_json = "null"
+    observe_payload("response", len(tree_json))
+
+    with stage("render"):
+        return get_templates().TemplateResponse(
+            request=request,
+            name="tree_viewer.html",
+            context={"tree_json": tree_json, "file_name": file},
+        )
 
-    if file:
-        dep_json_path = DATA_DIR / file
-        if dep_json_path.exists():
-            try:
-                from . import filter as filter_module
-                from .utils import get_root_key_and_nodes
-
-                with open(dep_json_path, "r", encoding="utf-8") as f:
-                    dependency_data = json.load(f)
-
-                root_key, root_nodes = get_root_key_and_nodes(dependency_data)
-
-                # Apply filtering if requested
-                if project_only:
-                    dependency_data[root_key] = filter_module.filter_project_only(
-                        root_nodes
-                    )
-                elif filter:
-                    keywords = [k.strip() for k in filter.split(",")]
-                    kept_nodes = set()
-                    filter_module.find_matches_and_relatives(
-                        root_nodes, keywords, kept_nodes, []
-                    )
-                    dependency_data[root_key] = filter_module.rebuild_tree(
-                        root_nodes, kept_nodes
-                    )
-
-                tree_data = dependency_data
-
-            except Exception as e:
-                print(f"Error processing tree data: {e}")
-
-    return templates.TemplateResponse(
-        request=request,
-        name="tree_viewer.html",
-        context={"tree_data": tree_data, "file_name": file},
-    )
+
+# Registered before the static mount, which would otherwise serve these files
+@app.get("/static/data/{filename}")
+async def data_file(request: Request, filename: str):
+    from . import workers
+    from .precompress import file_response, negotiate, variant_path, write_variants
+
+    file_path = _data_file(filename)
+    encoding = negotiate(request.headers.get("accept-encoding"))
+    if encoding is not None and not variant_path(file_path, encoding).exists():
+        # Compressing at the highest level takes a while for a large file
+        await workers.run(write_variants, file_path)
+    return file_response(request, file_path)
 
 
 app.mount("/static", StaticFiles(directory=APP_ROOT / "static"), name="static")
@@ -148,6 +357,8 @@ app.mount("/viz", StaticFiles(directory=APP_ROOT / "viz"), name="viz")
 
 
 def _run_parser(input_path: Path) -> dict:
+    from .traverse import loads
+
     if not PARSE_SCRIPT.exists():
         raise HTTPException(status_code=500, detail="parse.py not found.")
 
@@ -167,7 +378,7 @@ def _run_parser(input_path: Path) -> dict:
         stdout = result.stdout.strip()
         if stdout:
             try:
-                return json.loads(stdout)
+                return loads(stdout)
             except json.JSONDecodeError:
                 pass
 
@@ -184,7 +395,7 @@ def _run_parser(input_path: Path) -> dict:
 
         if json_path and json_path.exists():
             try:
-                return json.loads(json_path.read_text(encoding="utf-8"))
+                return loads(json_path.read_text(encoding="utf-8"))
             except (json.JSONDecodeError, UnicodeDecodeError) as exc:
                 raise HTTPException(
                     status_code=500,
@@ -219,6 +430,40 @@ async def list_samples():
     return samples
 
 
+def _cleanup_history(max_files: int = 20) -> None:
+    from . import artifacts
+
+    # Cleanup old files (keep max 20), along with their derived artifacts.
+    # Only stat and sort when there is something to remove.
+    with os.scandir(DATA_DIR) as entries:
+        json_files = [e for e in entries if e.name.endswith(".json") and e.is_file()]
+    if len(json_files) <= max_files:
+        return
+    json_files.sort(key=lambda e: e.stat().st_mtime)
+    for entry in json_files[: len(json_files) - max_files]:
+        file_to_remove = Path(entry.path)
+        try:
+            file_to_remove.unlink()
+            artifacts.invalidate(file_to_remove)
+            print(f"Removed old file: {file_to_remove.name}")
+        except Exception as e:
+            print(f"Error removing file {file_to_remove.name}: {e}")
+
+
+def _store_sample(sample_path: Path, dest_path: Path) -> None:
+    # Runs on a worker: copying may have to build the store, and indexing
+    # rewrites the fleet index
+    from . import artifacts
+
+    _ensure_data_dir()
+    artifacts.copy_sample(sample_path, dest_path)
+    artifacts.write_variants(dest_path)
+    artifacts.index_file(dest_path)
+    artifacts.record_timeline(dest_path)
+
+    _cleanup_history()
+
+
 @app.post("/api/samples/{filename}/process")
 async def process_sample(filename: str):
     sample_path = SAMPLE_DIR / filename
@@ -232,57 +477,53 @@ async def process_sample(filename: str):
     dest_filename = f"{original_stem}_sample_{timestamp}.json"
     dest_path = DATA_DIR / dest_filename
 
-    try:
-        dest_path.write_bytes(sample_path.read_bytes())
-
-        # Cleanup old files (keep max 20) logic duplicate - could be refactored but ok for now
-        json_files = sorted(DATA_DIR.glob("*.json"), key=lambda f: f.stat().st_mtime)
-        while len(json_files) > 20:
-            file_to_remove = json_files.pop(0)
-            try:
-                file_to_remove.unlink()
-            except Exception:
-                pass
+    from . import workers
 
+    try:
+        await workers.run(_store_sample, sample_path, dest_path)
         return {"filename": dest_filename}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process sample: {e}")
 
 
-@app.post("/api/upload")
-async def upload(file: UploadFile = File(...)) -> dict:
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="No file uploaded.")
-
-    if not file.filename.lower().endswith(".txt"):
-        raise HTTPException(status_code=400, detail="Only .txt files are supported.")
+def _process_upload(upload_file, filename: str) -> str:
+    # Runs on a parse thread once the upload has been admitted. Returns the
+    # serialized response, which FastAPI's recursive encoder could not produce
+    # for trees nested deeper than the recursion limit.
+    from .traverse import dumps
 
-    data = await file.read()
+    data = upload_file.read()
+    observe_payload("upload", len(data))
 
     # Try common encodings
     txt_content = None
-    for encoding in ["utf-8-sig", "utf-16", "cp1252"]:
-        try:
-            txt_content = data.decode(encoding)
-            break
-        except (UnicodeDecodeError, LookupError):
-            continue
+    with stage("decode"):
+        for encoding in ["utf-8-sig", "utf-16", "cp1252"]:
+            try:
+                txt_content = data.decode(encoding)
+                break
+            except (UnicodeDecodeError, LookupError):
+                continue
 
-    if txt_content is None:
-        try:
-            txt_content = data.decode("latin-1")
-        except Exception as exc:
-            raise HTTPException(
-                status_code=400,
-                detail="TXT file could not be decoded. Please ensure it is UTF-8 or UTF-16 encoded.",
-            ) from exc
+        if txt_content is None:
+            try:
+                txt_content = data.decode("latin-1")
+            except Exception as exc:
+                raise HTTPException(
+                    status_code=400,
+                    detail="TXT file could not be decoded. Please ensure it is UTF-8 or UTF-16 encoded.",
+                ) from exc
+
+    from . import artifacts
 
     with tempfile.NamedTemporaryFile(delete=False, suffix=".txt") as temp_file:
         temp_path = Path(temp_file.name)
         temp_file.write(data)
+    del data
 
     try:
-        parsed_json = _run_parser(temp_path)
+        with stage("parse"):
+            parsed_json = _run_parser(temp_path)
 
         # Save to static/data directory with the same name as txt file (but .json)
         # Embed the original TXT content for persistence
@@ -290,31 +531,55 @@ async def upload(file: UploadFile = File(...)) -> dict:
 
         # Generate timestamped filename
         timestamp = datetime.now().strftime("%d%H%M")
-        original_stem = Path(file.filename).stem
+        original_stem = Path(filename).stem
         json_filename = f"{original_stem}_{timestamp}.json"
         dest_path = DATA_DIR / json_filename
 
-        with open(dest_path, "w", encoding="utf-8") as f:
-            json.dump(parsed_json, f, indent=2)
+        _ensure_data_dir()
+        with stage("store"):
+            artifacts.write_dependency_data(dest_path, parsed_json)
+        artifacts.build_store(dest_path, parsed_json)
+        artifacts.write_variants(dest_path)
+        artifacts.index_file(dest_path)
+        artifacts.record_timeline(dest_path)
 
-        # Cleanup old files (keep max 20)
-        json_files = sorted(DATA_DIR.glob("*.json"), key=lambda f: f.stat().st_mtime)
-        while len(json_files) > 20:
-            file_to_remove = json_files.pop(0)
-            try:
-                file_to_remove.unlink()
-                print(f"Removed old file: {file_to_remove.name}")
-            except Exception as e:
-                print(f"Error removing file {file_to_remove.name}: {e}")
+        _cleanup_history()
 
     finally:
         temp_path.unlink(missing_ok=True)
 
-    return {
-        "filename": json_filename,
-        "txt": txt_content,
-        "json": parsed_json,
-    }
+    with stage("serialize"):
+        return dumps({
+            "filename": json_filename,
+            "txt": txt_content,
+            "json": parsed_json,
+        })
+
+
+@app.post("/api/upload")
+async def upload(file: UploadFile = File(...)) -> Response:
+    from . import admission
+
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="No file uploaded.")
+
+    if not file.filename.lower().endswith(".txt"):
+        raise HTTPException(status_code=400, detail="Only .txt files are supported.")
+
+    # The body is spooled by now; it is only read into memory once admitted
+    size = file.size if file.size is not None else 0
+    try:
+        content = await admission.get_pool().run(
+            size, _process_upload, file.file, file.filename
+        )
+    except admission.Overloaded as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many uploads are being processed. Please retry later.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    observe_payload("response", len(content))
+    return Response(content=content, media_type="application/json")
 
 
 @app.get("/api/files")
@@ -339,12 +604,84 @@ async def delete_file(filename: str):
     if Path(filename).name != filename:
         raise HTTPException(status_code=400, detail="Invalid filename.")
 
+    from . import artifacts, workers
+
     file_path.unlink()
+    # Drops the derived artifacts and rewrites the fleet index
+    await workers.run(artifacts.invalidate, file_path)
     return {"message": f"File {filename} deleted."}
 
 
+def _data_file(filename: str) -> Path:
+    # Security check: ensure it's just a filename and not a path
+    if Path(filename).name != filename:
+        raise HTTPException(status_code=400, detail="Invalid filename.")
+
+    file_path = DATA_DIR / filename
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail=f"File not found: {filename}")
+    return file_path
+
+
+def _streaming_response(pieces, media_type: str) -> StreamingResponse:
+    from .export import chunked
+
+    def body():
+        size = 0
+        # Sync bodies are iterated on threadpool threads, outside the event loop
+        with stage("serialize"), track():
+            for chunk in chunked(pieces):
+                size += len(chunk)
+                yield chunk
+        observe_payload("response", size)
+
+    return StreamingResponse(body(), media_type=media_type)
+
+
+def _load_enlist(file_path: Path) -> list:
+    # Runs on a worker, since opening a store may have to build it
+    from . import artifacts
+
+    store = artifacts.open_store(file_path)
+    with stage("filter"):
+        dependencies = store.dependencies()
+    observe_nodes("dependencies", len(dependencies))
+    return dependencies
+
+
+@app.get("/api/enlist")
+async def enlist_many(
+    files: list[str] = Query(...), op: str = "union", format: str = "yaml"
+):
+    from . import enlist as enlist_module, workers
+    from .export import ENLIST_FORMATS, ENLIST_WRITERS
+
+    if op not in enlist_module.SET_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported operation: {op}")
+    if format not in ENLIST_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+
+    file_paths = [_data_file(filename) for filename in files]
+    try:
+        dependencies = enlist_module.combine_dependencies(
+            [await workers.run(_load_enlist, file_path) for file_path in file_paths], op
+        )
+    except Exception as e:
+        import traceback
+
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return _streaming_response(
+        ENLIST_WRITERS[format](dependencies), ENLIST_FORMATS[format]
+    )
+
+
 @app.get("/api/enlist/{filename}")
-async def enlist(filename: str):
+async def enlist(filename: str, format: str = "yaml"):
+    from . import workers
+    from .export import ENLIST_FORMATS, ENLIST_WRITERS
+
     file_path = DATA_DIR / filename
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="File not found.")
@@ -353,22 +690,459 @@ async def enlist(filename: str):
     if Path(filename).name != filename:
         raise HTTPException(status_code=400, detail="Invalid filename.")
 
+    if format not in ENLIST_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+
     try:
-        from . import enlist as enlist_module
+        dependencies = await workers.run(_load_enlist, file_path)
+    except Exception as e:
+        import traceback
+
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return _streaming_response(
+        ENLIST_WRITERS[format](dependencies), ENLIST_FORMATS[format]
+    )
+
+
+def _search_results(file_path: Path, q: str, limit: int) -> dict:
+    # Runs on a worker: opening the store or building its index can take a while
+    from . import artifacts
+    from .search import search_index
+
+    store = artifacts.open_store(file_path)
+    with stage("filter"):
+        index = search_index(store)
+        results = index.search(q, limit)
+    return {"query": q, "total_modules": len(index), "results": results}
+
+
+@app.get("/api/search/{filename}")
+async def search(filename: str, q: str = "", limit: int = Query(10, ge=1, le=100)):
+    from . import workers
+
+    file_path = _data_file(filename)
+    return await workers.run(_search_results, file_path, q, limit)
+
 
-        with open(file_path, "r", encoding="utf-8") as f:
-            json_data = json.load(f)
+def _footprint_report(file_path: Path, sort: str, limit: int, direct: bool):
+    # Runs on a worker; None when the file has no dependency tree
+    from . import artifacts
+    from .footprint import footprint_report
 
-        dependencies = enlist_module.extract_dependencies_from_json(json_data)
-        yaml_data = {"dependencies": dependencies, "total_count": len(dependencies)}
+    store = artifacts.open_store(file_path)
+    if store.root_node < 0:
+        return None
+    with stage("graph"):
+        return footprint_report(store, sort, limit, direct)
 
-        yaml_content = yaml.dump(yaml_data, default_flow_style=False, sort_keys=False)
 
-        return Response(
-            content=yaml_content, media_type="application/x-yaml", headers={}
+@app.get("/api/footprint/{filename}")
+async def footprint(
+    filename: str,
+    sort: str = "closure",
+    limit: int = Query(None, ge=1),
+    direct: bool = False,
+):
+    from . import workers
+    from .footprint import SORT_KEYS
+
+    file_path = _data_file(filename)
+    if sort not in SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"Unsupported sort: {sort}")
+
+    report = await workers.run(_footprint_report, file_path, sort, limit, direct)
+    if report is None:
+        raise HTTPException(status_code=422, detail="File has no dependency tree.")
+    return report
+
+
+def _dominator_report(file_path: Path, limit: int, node: str):
+    # Runs on a worker.
+    # Returns (has a tree, report or None when the node is unknown).
+    from . import artifacts
+    from .dominators import dominator_report, store_dominators
+
+    store = artifacts.open_store(file_path)
+    if store.root_node < 0:
+        return False, None
+    with stage("graph"):
+        node_ids = store.cached(
+            "node_ids", lambda s: [s.string(sid) for sid in s.node_id]
         )
-    except Exception as e:
-        import traceback
+        return True, dominator_report(node_ids, store_dominators(store), limit, node)
 
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/dominators/{filename}")
+async def dominators(filename: str, limit: int = Query(None, ge=1), node: str = None):
+    from . import workers
+
+    file_path = _data_file(filename)
+    has_tree, report = await workers.run(_dominator_report, file_path, limit, node)
+    if not has_tree:
+        raise HTTPException(status_code=422, detail="File has no dependency tree.")
+    if report is None:
+        raise HTTPException(status_code=404, detail=f"Node not found: {node}")
+    return report
+
+
+def _fleet_results(module: str, versions: str = None) -> dict:
+    # Runs on a worker: syncing may open new stores and rewrite the index.
+    # Raises ValueError for an invalid version range.
+    from . import artifacts, fleet
+
+    with stage("load"):
+        index = fleet.sync(DATA_DIR, artifacts.open_store)
+    with stage("filter"):
+        results = fleet.query(index, module, versions)
+    return {"results": results, "files_indexed": len(index["files"])}
+
+
+@app.get("/api/fleet")
+async def fleet_query(module: str, versions: str = None):
+    from . import workers
+
+    try:
+        return await workers.run(_fleet_results, module, versions)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _overlay_json(file_paths: list, subset: list = None, match: str = "any") -> str:
+    # Runs on a worker: merges the files (or reuses the cached overlay) and serializes it
+    from . import artifacts
+    from .convert_to_graph import overlay_format
+
+    overlay = artifacts.open_overlay(file_paths)
+    with stage("filter"):
+        graph_data = overlay_format(overlay, subset, match)
+    observe_nodes("graph", graph_data["metadata"]["total_nodes"])
+    with stage("serialize"):
+        return json.dumps(graph_data)
+
+
+@app.get("/api/overlay")
+async def overlay(
+    files: list[str] = Query(...), subset: str = None, match: str = "any"
+):
+    from . import workers
+    from .convert_to_graph import MAX_OVERLAY_SNAPSHOTS
+
+    if len(files) > MAX_OVERLAY_SNAPSHOTS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {MAX_OVERLAY_SNAPSHOTS} files can be overlaid."
+        )
+    if match not in ("any", "all"):
+        raise HTTPException(status_code=400, detail=f"Unsupported match: {match}")
+    positions = None
+    if subset:
+        try:
+            positions = [int(p) for p in subset.split(",")]
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid subset: {subset}")
+        if any(not 0 <= p < len(files) for p in positions):
+            raise HTTPException(status_code=400, detail=f"Invalid subset: {subset}")
+
+    file_paths = [_data_file(filename) for filename in files]
+    content = await workers.run_shared(
+        ("overlay", tuple(map(str, file_paths)), subset, match),
+        _overlay_json,
+        file_paths, positions, match,
+    )
+    observe_payload("response", len(content))
+    return Response(content=content, media_type="application/json")
+
+
+def _skew_report(scope: str, min_versions: int, module: str = None, limit: int = None) -> dict:
+    # Runs on a worker: syncs the fleet index and builds (or reuses) the matrix
+    from . import artifacts, skew
+
+    with stage("graph"):
+        return skew.report(DATA_DIR, artifacts.open_store, scope, min_versions, module, limit)
+
+
+@app.get("/api/skew")
+async def skew_report(
+    scope: str = "projects",
+    module: str = None,
+    min_versions: int = Query(2, ge=1),
+    limit: int = Query(None, ge=1),
+):
+    from . import skew, workers
+
+    if scope not in skew.SCOPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported scope: {scope}")
+    return await workers.run_shared(
+        ("skew", scope, min_versions, module, limit),
+        _skew_report,
+        scope, min_versions, module, limit,
+    )
+
+
+def _timeline_call(fn, *args):
+    # Runs on a worker: timelines are read and replayed from disk, after the
+    # snapshots still queued by this process are recorded
+    from . import artifacts
+
+    artifacts.wait_for_timeline()
+    with stage("load"):
+        return fn(*args)
+
+
+@app.get("/api/timeline")
+async def timeline_projects():
+    from . import timeline, workers
+
+    return {"projects": await workers.run(_timeline_call, timeline.projects, DATA_DIR)}
+
+
+@app.get("/api/timeline/{project}")
+async def timeline_history(project: str, module: str = None):
+    from . import timeline, workers
+
+    result = await workers.run(_timeline_call, timeline.history, DATA_DIR, project, module)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No timeline for project: {project}")
+    return result
+
+
+@app.get("/api/timeline/{project}/{seq}")
+async def timeline_snapshot(project: str, seq: int):
+    from . import timeline, workers
+
+    graph_data = await workers.run(_timeline_call, timeline.snapshot, DATA_DIR, project, seq)
+    if graph_data is None:
+        raise HTTPException(status_code=404, detail=f"Snapshot not found: {project} #{seq}")
+    observe_nodes("graph", graph_data["metadata"]["total_nodes"])
+    return graph_data
+
+
+def _check_profile_token(request: Request) -> None:
+    from . import profiler
+
+    if profiler.PROFILE_TOKEN is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiler.check_token(request.headers.get("x-profile-token")):
+        raise HTTPException(status_code=403, detail="Invalid profile token.")
+
+
+@app.get("/api/admin/profiles")
+async def list_profiles(request: Request):
+    from . import profiler
+
+    _check_profile_token(request)
+    return {"profiles": profiler.profiles()}
+
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def download_profile(request: Request, profile_id: int, format: str = "collapsed"):
+    from . import profiler
+
+    _check_profile_token(request)
+    if format not in profiler.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    record = profiler.get_profile(profile_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Profile not found: {profile_id}")
+    if format not in record["formats"]:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} has no {format} data.")
+    if format == "pstats":
+        content, media_type, suffix = record["_pstats"], "application/octet-stream", "pstats"
+    else:
+        content, media_type, suffix = profiler.collapsed(record), "text/plain", "collapsed.txt"
+    return Response(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.{suffix}"'},
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    return PlainTextResponse(
+        render_prometheus(), media_type="text/plain; version=0.0.4"
+    )
+
+
+def _graph_api_json(
+    file_path: Path,
+    filter: str = None,
+    project_only: bool = False,
+    distance: int = None,
+    exclude: str = None,
+) -> str | None:
+    # Runs on a worker; None when the file has no dependency tree
+    graph_data = _build_graph_data(file_path, filter, project_only, distance, exclude)
+    if graph_data is None:
+        return None
+    with stage("serialize"):
+        return json.dumps(graph_data)
+
+
+@app.get("/api/graph/{filename}")
+async def graph(
+    filename: str,
+    filter: str = None,
+    project_only: bool = False,
+    distance: int = None,
+    exclude: str = None,
+):
+    file_path = _data_file(filename)
+
+    if distance is not None and distance < 0:
+        raise HTTPException(status_code=400, detail="distance must be >= 0.")
+    _check_filter(filter)
+
+    from . import workers
+
+    content = await workers.run_shared(
+        ("graph", str(file_path), filter, project_only, distance, exclude),
+        _graph_api_json,
+        file_path, filter, project_only, distance, exclude,
+    )
+    if content is None:
+        raise HTTPException(status_code=422, detail="File has no dependency tree.")
+    observe_payload("response", len(content))
+    return Response(content=content, media_type="application/json")
+
+
+@app.get("/api/graph/{filename}/export")
+async def graph_export(
+    filename: str,
+    format: str = "json",
+    filter: str = None,
+    project_only: bool = False,
+    distance: int = None,
+    exclude: str = None,
+):
+    from . import artifacts, workers
+    from .export import GRAPH_FORMATS, GRAPH_WRITERS
+
+    file_path = _data_file(filename)
+    if format not in GRAPH_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    _check_filter(filter)
+
+    if not filter and not project_only:
+        # Stream straight from the mapped store without building the node list
+        selection = await workers.run(_stored_selection, file_path, distance, exclude)
+        if selection is None:
+            raise HTTPException(status_code=422, detail="File has no dependency tree.")
+        _, kept = selection
+        # Built (if it had to be) on the worker, so this only maps the store
+        store = artifacts.open_store(file_path)
+        nodes = store.iter_graph_nodes(kept)
+        edges = store.iter_graph_edges(kept)
+    else:
+        graph_data = await workers.run(
+            _build_graph_data, file_path, filter, project_only, distance, exclude
+        )
+        if graph_data is None:
+            raise HTTPException(status_code=422, detail="File has no dependency tree.")
+        nodes = graph_data["nodes"]
+        edges = ((e["source"], e["target"]) for e in graph_data["edges"])
+
+    return _streaming_response(GRAPH_WRITERS[format](nodes, edges), GRAPH_FORMATS[format])
+
+
+def _stored_selection(file_path: Path, distance: int = None, exclude: str = None):
+    # Runs on a worker, since opening a store may have to build it.
+    # Returns (node count, kept node indices or None for all), or None without a tree.
+    from . import artifacts
+
+    store = artifacts.open_store(file_path)
+    if store.root_node < 0:
+        return None
+    with stage("filter"):
+        kept = store.select_graph_nodes(distance, exclude)
+    return (store.node_count if kept is None else len(kept)), kept
+
+
+@app.get("/api/graph/{filename}/stream")
+async def graph_stream(
+    filename: str,
+    filter: str = None,
+    project_only: bool = False,
+    distance: int = None,
+    exclude: str = None,
+    batch: int = Query(500, ge=1, le=10000),
+):
+    from . import artifacts, graph_stream as graph_stream_module, workers
+
+    file_path = _data_file(filename)
+    if distance is not None and distance < 0:
+        raise HTTPException(status_code=400, detail="distance must be >= 0.")
+    _check_filter(filter)
+
+    if not filter and not project_only:
+        # Walks the stored graph level by level; nothing is built up front
+        selection = await workers.run(_stored_selection, file_path, distance, exclude)
+        if selection is None:
+            raise HTTPException(status_code=422, detail="File has no dependency tree.")
+        total, kept = selection
+        # Built (if it had to be) on the worker, so this only maps the store
+        store = artifacts.open_store(file_path)
+        batches = graph_stream_module.store_batches(store, kept, batch)
+    else:
+        graph_data = await workers.run(
+            _build_graph_data, file_path, filter, project_only, distance, exclude
+        )
+        if graph_data is None:
+            raise HTTPException(status_code=422, detail="File has no dependency tree.")
+        total = len(graph_data["nodes"])
+        batches = graph_stream_module.graph_batches(graph_data, batch)
+
+    def body():
+        size = 0
+        # Sync bodies are iterated on threadpool threads, outside the event loop
+        with stage("serialize"), track():
+            for message in graph_stream_module.sse_graph(batches, total):
+                size += len(message)
+                yield message
+        observe_payload("response", size)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _ego_graph_data(file_path: Path, node: str, hops: int, direction: str, limit: int):
+    # Runs on a worker, since opening a store may have to build it.
+    # Returns (has a tree, ego graph or None when the node is unknown).
+    from . import artifacts
+    from .ego import ego_graph
+
+    store = artifacts.open_store(file_path)
+    if store.root_node < 0:
+        return False, None
+    with stage("graph"):
+        return True, ego_graph(store, node, hops, direction, limit)
+
+
+@app.get("/api/graph/{filename}/ego")
+async def graph_ego(
+    filename: str,
+    node: str,
+    hops: int = Query(1, ge=0, le=50),
+    direction: str = "both",
+    limit: int = Query(2000, ge=1, le=50000),
+):
+    from . import workers
+    from .ego import DIRECTIONS
+
+    file_path = _data_file(filename)
+    if direction not in DIRECTIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported direction: {direction}")
+
+    has_tree, graph_data = await workers.run(
+        _ego_graph_data, file_path, node, hops, direction, limit
+    )
+    if not has_tree:
+        raise HTTPException(status_code=422, detail="File has no dependency tree.")
+    if graph_data is None:
+        raise HTTPException(status_code=404, detail=f"Node not found: {node}")
+    observe_nodes("graph", graph_data["metadata"]["total_nodes"])
+    return graph_data
@@ -0,0 +1,215 @@
+"""
+tracemalloc-based memory profiling of the pipeline stages.
+
+Inside profiling(), every stage(name) block (and every telemetry.stage) is
+recorded with its peak memory above the level at which it started, the
+memory it retained on exit, and the source lines that retained the most:
+
+    with memprof.profiling() as profile:
+        with memprof.stage("parse"):
+            ...
+    print(memprof.format_report(profile))
+
+The CLIs take --profile-memory. The server profiles a request sent with an
+"X-Profile-Memory: 1" header when MEMORY_PROFILING=1 is set, answering with
+an X-Memory-Profile header and printing the full report. tracemalloc is
+process-wide, so only one profile runs at a time and allocations made by
+other threads meanwhile are counted too.
+"""
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+MEMORY_PROFILING = os.environ.get("MEMORY_PROFILING", "0") == "1"
+PROFILE_HEADER = b"x-profile-memory"
+TOP_SITES = 5
+# Frames kept per allocation; one is enough to name the site
+TRACE_FRAMES = 1
+
+_active = ContextVar("memory_profile", default=None)
+# tracemalloc's peak is global, so profiles must not overlap
+_lock = threading.Lock()
+_IGNORED = (tracemalloc.__file__, __file__)
+
+
+class MemoryProfile:
+    """Per-stage memory records of one profiled run."""
+
+    def __init__(self, top=TOP_SITES, sites=True):
+        self.top = top
+        self.sites = sites
+        self.stages = []
+        self.peak_bytes = 0
+        self.retained_bytes = 0
+        self._stack = []
+
+    def _enter(self, name):
+        current, peak = tracemalloc.get_traced_memory()
+        # Fold the peak seen so far into the enclosing stages before resetting it
+        for frame in self._stack:
+            frame["peak_abs"] = max(frame["peak_abs"], peak)
+        tracemalloc.reset_peak()
+        frame = {
+            "name": name,
+            "start": current,
+            "peak_abs": current,
+            "snapshot": self._snapshot() if self.sites else None,
+        }
+        self._stack.append(frame)
+        return frame
+
+    def _exit(self, frame):
+        current, peak = tracemalloc.get_traced_memory()
+        peak = max(frame["peak_abs"], peak)
+        if frame in self._stack:
+            self._stack.remove(frame)
+        for outer in self._stack:
+            outer["peak_abs"] = max(outer["peak_abs"], peak)
+        record = {
+            "stage": frame["name"],
+            "peak_bytes": peak - frame["start"],
+            "retained_bytes": current - frame["start"],
+            "top": [],
+        }
+        if frame["snapshot"] is not None:
+            stats = self._snapshot().compare_to(frame["snapshot"], "lineno")
+            for stat in stats:
+                if len(record["top"]) >= self.top:
+                    break
+                if stat.size_diff <= 0:
+                    continue
+                site = stat.traceback[0]
+                record["top"].append({
+                    "site": f"{site.filename}:{site.lineno}",
+                    "bytes": stat.size_diff,
+                    "blocks": stat.count_diff,
+                })
+        self.stages.append(record)
+        return record
+
+    @staticmethod
+    def _snapshot():
+        snapshot = tracemalloc.take_snapshot()
+        return snapshot.filter_traces(
+            [tracemalloc.Filter(False, filename) for filename in _IGNORED]
+        )
+
+    def report(self):
+        return {
+            "peak_bytes": self.peak_bytes,
+            "retained_bytes": self.retained_bytes,
+            "stages": [dict(record) for record in self.stages],
+        }
+
+    def header_value(self):
+        """Compact per-stage summary, in the style of Server-Timing."""
+        parts = [
+            f"{r['stage']};peak={r['peak_bytes']};retained={r['retained_bytes']}"
+            for r in self.stages
+        ]
+        if not self._stack:
+            # The total is only known once the profile has finished
+            parts.append(f"total;peak={self.peak_bytes};retained={self.retained_bytes}")
+        return ", ".join(parts)
+
+
+@contextmanager
+def profiling(top=TOP_SITES, sites=True):
+    """
+    Profiles the stages run inside the block. Yields the MemoryProfile, or
+    None when another profile is already running.
+    """
+    if not _lock.acquire(blocking=False):
+        yield None
+        return
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(TRACE_FRAMES)
+    profile = MemoryProfile(top, sites)
+    token = _active.set(profile)
+    try:
+        frame = profile._enter("total")
+        try:
+            yield profile
+        finally:
+            total = profile._exit(frame)
+            profile.stages.remove(total)
+            profile.peak_bytes = total["peak_bytes"]
+            profile.retained_bytes = total["retained_bytes"]
+    finally:
+        _active.reset(token)
+        if started:
+            tracemalloc.stop()
+        _lock.release()
+
+
+@contextmanager
+def stage(name):
+    """Records a stage in the active profile; does nothing without one."""
+    profile = _active.get()
+    if profile is None:
+        yield
+        return
+    frame = profile._enter(name)
+    try:
+        yield
+    finally:
+        profile._exit(frame)
+
+
+def _size(value):
+    for unit in ("B", "KiB", "MiB"):
+        if abs(value) < 1024:
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GiB"
+
+
+def format_report(profile):
+    """Formats a profile as a text table with the top sites under each stage."""
+    lines = [f"{'stage':<16} {'peak':>12} {'retained':>12}"]
+    for record in profile.stages:
+        lines.append(
+            f"{record['stage']:<16} {_size(record['peak_bytes']):>12} "
+            f"{_size(record['retained_bytes']):>12}"
+        )
+        for site in record["top"]:
+            lines.append(f"    {_size(site['bytes']):>10}  {site['site']}")
+    lines.append(
+        f"{'total':<16} {_size(profile.peak_bytes):>12} {_size(profile.retained_bytes):>12}"
+    )
+    return "\n".join(lines)
+
+
+class MemoryProfileMiddleware:
+    """ASGI middleware profiling requests that ask for it, when enabled."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not MEMORY_PROFILING
+            or dict(scope.get("headers", ())).get(PROFILE_HEADER) != b"1"
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        with profiling() as profile:
+            if profile is None:
+                await self.app(scope, receive, send)
+                return
+
+            async def send_with_profile(message):
+                if message["type"] == "http.response.start":
+                    value = profile.header_value()
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-memory-profile", value.encode("latin-1")))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_profile)
+        print(f"Memory profile for {scope.get('path')}:\n{format_report(profile)}")
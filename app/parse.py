@@ -1,37 +1,43 @@
-import json
 import argparse
 import os
-import re
-from utils import parse_dependency_line
+import sys
+from contextlib import nullcontext
+try:
+    from .dialects import DIALECTS, detect, get_dialect
+    from .memprof import format_report, profiling, stage
+    from .traverse import dumps
+except ImportError:
+    from dialects import DIALECTS, detect, get_dialect
+    from memprof import format_report, profiling, stage
+    from traverse import dumps
 
 
 
 
-def extract_project_name(lines):
+def extract_project_name(lines, dialect="gradle"):
     """Extracts the project name from the lines (e.g., Project ':app' -> 'app')."""
-    for line in lines:
-        match = re.search(r"^Project ':([^']+)'", line.strip())
-        if match:
-            return match.group(1)
-    return "root"
+    return get_dialect(dialect).project_name(lines)
 
 
-def parse_dependencies(lines):
-    """Parses the dependency tree and returns a list of root nodes."""
+def parse_dependencies(lines, dialect="gradle"):
+    """Parses the dependency tree of a dialect and returns a list of root nodes."""
+    dialect = get_dialect(dialect)
+    starts_tree = dialect.starts_tree
+    parse_line = dialect.parse_line
     root_nodes = []
     node_stack = []  # Stack to keep track of (node, level)
 
     parsing = False
     for line in lines:
         line = line.rstrip()
-        if re.match(r'^\w+(Runtime|Compile)Classpath', line):
+        if starts_tree(line):
             parsing = True
             continue
 
-        if not parsing or not line.strip() or '---' not in line:
+        if not parsing or not line.strip():
             continue
 
-        node, level = parse_dependency_line(line)
+        node, level = parse_line(line)
         if not node:
             continue
 
@@ -54,14 +60,8 @@ def parse_dependencies(lines):
 
 
 
-def main():
-    """Main function to read, parse, and write dependencies."""
-    parser = argparse.ArgumentParser(description='Parse Gradle dependency tree from text file')
-    parser.add_argument('file_path', help='Path to the input file (txt or no extension)')
-    args = parser.parse_args()
-    
-    input_path = args.file_path
-    
+def parse_file(input_path, dialect="auto"):
+    """Parses a dependency dump into a .json file next to it."""
     # Determine output path: same path and filename with .json suffix
     base_path = os.path.splitext(input_path)[0]
     output_path = base_path + '.json'
@@ -74,7 +74,7 @@ def main():
     lines = None
     for encoding in encodings:
         try:
-            with open(input_path, 'r', encoding=encoding) as f:
+            with stage("read"), open(input_path, 'r', encoding=encoding) as f:
                 lines = f.readlines()
             break
         except (UnicodeDecodeError, LookupError):
@@ -87,15 +87,30 @@ def main():
         print(f"Error: Could not decode {input_path} with common encodings.")
         return
 
-    project_name = extract_project_name(lines)
-    root_nodes = parse_dependencies(lines)
+    with stage("parse"):
+        dialect = detect(lines) if dialect == "auto" else get_dialect(dialect)
+        project_name = extract_project_name(lines, dialect)
+        root_nodes = parse_dependencies(lines, dialect)
 
     dependency_graph = {project_name: root_nodes}
 
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(dependency_graph, f, indent=2)
+    with stage("write"), open(output_path, 'w', encoding='utf-8') as f:
+        f.write(dumps(dependency_graph, indent=2))
+
+    print(f"Successfully parsed {input_path} ({dialect.name}) and created {output_path}")
+
+def main():
+    """Main function to read, parse, and write dependencies."""
+    parser = argparse.ArgumentParser(description='Parse Gradle or Maven dependency tree from text file')
+    parser.add_argument('file_path', help='Path to the input file (txt or no extension)')
+    parser.add_argument('--dialect', choices=['auto', *DIALECTS], default='auto', help='Tree format of the input (default: detected)')
+    parser.add_argument('--profile-memory', action='store_true', help='Report peak and retained memory per stage on stderr')
+    args = parser.parse_args()
 
-    print(f"Successfully parsed {input_path} and created {output_path}")
+    with profiling() if args.profile_memory else nullcontext() as profile:
+        parse_file(args.file_path, args.dialect)
+    if profile is not None:
+        print(format_report(profile), file=sys.stderr)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
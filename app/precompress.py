@@ -0,0 +1,161 @@
+"""
+Precompressed variants of stored files, served with content negotiation and
+conditional GET.
+
+Each DATA_DIR/<name>.json gets DATA_DIR/.derived/<name>.<fingerprint>.gz (and
+.br when the optional brotli package is installed). The source fingerprint in
+the name ties a variant to the exact file it was made from, so a replaced
+or rewritten file never serves stale ones. The fingerprint includes the modification time, which makes it a valid
+strong ETag.
+"""
+import gzip
+import os
+import shutil
+import tempfile
+from email.utils import formatdate
+from pathlib import Path
+
+from starlette.responses import FileResponse, Response
+
+try:
+    from . import graph_store
+except ImportError:
+    import graph_store
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content-Encoding -> (file suffix, compress function), best first
+ENCODINGS = {}
+if brotli is not None:
+    ENCODINGS["br"] = (".br", lambda data: brotli.compress(data, quality=11))
+ENCODINGS["gzip"] = (".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0))
+
+
+def fingerprint_tag(json_path):
+    return "-".join(f"{part:x}" for part in graph_store.source_fingerprint(json_path))
+
+
+def variant_path(json_path, encoding, tag=None):
+    json_path = Path(json_path)
+    suffix = ENCODINGS[encoding][0]
+    tag = tag or fingerprint_tag(json_path)
+    return graph_store.derived_dir(json_path) / f"{json_path.name}.{tag}{suffix}"
+
+
+def clone_variants(source_json_path, json_path):
+    """
+    Reuses the current variants of source_json_path for json_path, a copy of
+    the same contents. Variants are never modified in place, so they are
+    hardlinked where the filesystem allows it.
+    """
+    for encoding in ENCODINGS:
+        source = variant_path(source_json_path, encoding)
+        if not source.exists():
+            continue
+        path = variant_path(json_path, encoding)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        os.close(fd)
+        try:
+            try:
+                os.unlink(temp_name)
+                os.link(source, temp_name)
+            except OSError:
+                shutil.copyfile(source, temp_name)
+            os.replace(temp_name, path)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+
+
+def write_variants(json_path):
+    """Writes the missing compressed variants of a stored file and drops outdated ones."""
+    json_path = Path(json_path)
+    tag = fingerprint_tag(json_path)
+    wanted = {variant_path(json_path, encoding, tag) for encoding in ENCODINGS}
+    for path, suffix in list(graph_store.iter_derived(json_path)):
+        if suffix.endswith((".gz", ".br")) and path not in wanted:
+            path.unlink(missing_ok=True)
+
+    data = None
+    for encoding, (_, compress) in ENCODINGS.items():
+        path = variant_path(json_path, encoding, tag)
+        if path.exists():
+            continue
+        if data is None:
+            data = json_path.read_bytes()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(compress(data))
+            os.replace(temp_name, path)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+
+
+def negotiate(accept_encoding):
+    """Picks the best available encoding allowed by an Accept-Encoding header, or None."""
+    allowed = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            allowed[name.strip().lower()] = quality
+    best = None
+    for encoding in ENCODINGS:
+        quality = allowed.get(encoding, allowed.get("*", 0.0))
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (encoding, quality)
+    return best[0] if best else None
+
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def file_response(request, json_path, media_type="application/json"):
+    """
+    Serves a stored file, precompressed when the client accepts it, with a
+    strong ETag per representation and a 304 only when If-None-Match names the
+    ETag of the representation negotiated for this request.
+    """
+    json_path = Path(json_path)
+    tag = fingerprint_tag(json_path)
+    encoding = negotiate(request.headers.get("accept-encoding"))
+
+    path = json_path
+    etag = f'"{tag}"'
+    if encoding is not None:
+        variant = variant_path(json_path, encoding, tag)
+        if not variant.exists():
+            write_variants(json_path)
+        path = variant
+        etag = f'"{tag}-{encoding}"'
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+        "Last-Modified": formatdate(json_path.stat().st_mtime, usegmt=True),
+    }
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return FileResponse(path, media_type=media_type, headers=headers)
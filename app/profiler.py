@@ -0,0 +1,325 @@
+"""
+On-demand CPU profiling of slow requests, for production use.
+
+Requests to the viewer, upload and enlist endpoints (PROFILE_PATHS) are
+profiled when
+
+    - they carry "X-Profile-Token: <PROFILE_TOKEN>", optionally with
+      "X-Profile-Mode: cprofile" (default "sample"); the response gets an
+      X-Profile-Id header, or
+    - PROFILE_SLOW_MS is set: every such request is sampled, and the profile is
+      kept only when the request took at least that long.
+
+Sampling reads the stacks of the threads working for the request every
+PROFILE_SAMPLE_INTERVAL_MS from one background thread: the event loop thread
+while the request's task runs on it, and worker threads inside track() blocks
+(workers, upload parsing and streamed bodies enter one). "cprofile" also runs
+cProfile in those threads; on the event loop thread it then counts the work of
+concurrent requests too, and only one such profile runs at a time.
+
+The last PROFILE_BUFFER_SIZE profiles are kept in memory with their request
+metadata and are served, to callers with the token only, by
+/api/admin/profiles as pstats or collapsed stacks (flamegraph.pl, speedscope).
+Nothing is profiled and the endpoints do not exist while PROFILE_TOKEN is unset.
+"""
+import asyncio
+import hmac
+import itertools
+import marshal
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN") or None
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", "0"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_BUFFER_SIZE = int(os.environ.get("PROFILE_BUFFER_SIZE", "20"))
+PROFILE_PATHS = ("/viz/graph_viewer.html", "/viz/tree_viewer.html", "/api/upload", "/api/enlist")
+TOKEN_HEADER = b"x-profile-token"
+MODE_HEADER = b"x-profile-mode"
+MODES = ("sample", "cprofile")
+FORMATS = ("collapsed", "pstats")
+# Frames kept per sampled stack, innermost first
+MAX_DEPTH = 128
+
+_active = ContextVar("cpu_profile", default=None)
+_lock = threading.Lock()
+# cProfile hooks are per thread and replace each other, so they must not overlap
+_cprofile_lock = threading.Lock()
+_captures = set()
+_sampler = None
+_profiles = deque(maxlen=PROFILE_BUFFER_SIZE)
+_ids = itertools.count(1)
+_local = threading.local()
+
+
+class Capture:
+    """Samples and cProfile data collected for one request."""
+
+    def __init__(self, mode, loop=None, task=None):
+        self.mode = mode
+        self.loop = loop
+        self.task = task
+        self.loop_thread = threading.get_ident() if loop is not None else None
+        self.threads = Counter()  # thread ID -> nesting depth of track() blocks
+        self.stacks = Counter()
+        self.samples = 0
+        self.cprofiles = []
+        self._lock = threading.Lock()
+
+    def enter(self, tid):
+        with self._lock:
+            self.threads[tid] += 1
+
+    def leave(self, tid):
+        with self._lock:
+            self.threads[tid] -= 1
+
+    def sample(self, frames):
+        with self._lock:
+            threads = [tid for tid, depth in self.threads.items() if depth > 0]
+        if (
+            self.loop_thread is not None
+            and self.loop_thread not in threads
+            and asyncio.current_task(self.loop) is self.task
+        ):
+            threads.append(self.loop_thread)
+        stacks = [collapse(frames[tid]) for tid in threads if tid in frames]
+        with self._lock:
+            for stack in stacks:
+                self.stacks[stack] += 1
+            self.samples += len(stacks)
+
+    def stats(self):
+        """Merged pstats.Stats of the cProfile runs, or None."""
+        with self._lock:
+            runs = list(self.cprofiles)
+        if not runs:
+            return None
+        import io
+        import pstats
+
+        stats = pstats.Stats(runs[0], stream=io.StringIO())
+        for run in runs[1:]:
+            stats.add(run)
+        return stats
+
+    def _add_cprofile(self, profile):
+        with self._lock:
+            self.cprofiles.append(profile)
+
+
+def _label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse(frame):
+    """The stack of a frame as one collapsed-stack line key, outermost first."""
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        names.append(_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _sample_loop():
+    global _sampler
+    interval = PROFILE_SAMPLE_INTERVAL_MS / 1000
+    me = threading.get_ident()
+    while True:
+        with _lock:
+            if not _captures:
+                _sampler = None
+                return
+            captures = list(_captures)
+        frames = sys._current_frames()
+        frames.pop(me, None)
+        for capture in captures:
+            capture.sample(frames)
+        del frames
+        time.sleep(interval)
+
+
+def _start(capture):
+    global _sampler
+    with _lock:
+        _captures.add(capture)
+        if _sampler is None:
+            _sampler = threading.Thread(target=_sample_loop, name="gdv-profiler", daemon=True)
+            _sampler.start()
+
+
+def _stop(capture):
+    with _lock:
+        _captures.discard(capture)
+
+
+def _enable_cprofile(capture):
+    # One cProfile per thread; nested track() blocks reuse it
+    if capture.mode != "cprofile" or getattr(_local, "cprofile", None) is not None:
+        return None
+    import cProfile
+
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Another profiler already owns this thread
+        return None
+    _local.cprofile = profile
+    return profile
+
+
+def _disable_cprofile(capture, profile):
+    if profile is None:
+        return
+    profile.disable()
+    _local.cprofile = None
+    capture._add_cprofile(profile)
+
+
+@contextmanager
+def track():
+    """Profiles the current thread for the active request, if it is profiled."""
+    capture = _active.get()
+    if capture is None:
+        yield
+        return
+    tid = threading.get_ident()
+    profile = _enable_cprofile(capture)
+    capture.enter(tid)
+    try:
+        yield
+    finally:
+        capture.leave(tid)
+        _disable_cprofile(capture, profile)
+
+
+def check_token(value):
+    """True when profiling is enabled and value is its token."""
+    if PROFILE_TOKEN is None or value is None:
+        return False
+    return hmac.compare_digest(value.encode(), PROFILE_TOKEN.encode())
+
+
+def _store(capture, meta, profile_id=None):
+    stats = capture.stats()
+    with capture._lock:
+        stacks = dict(capture.stacks)
+        samples = capture.samples
+    record = {
+        "id": profile_id or next(_ids),
+        "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        **meta,
+        "mode": capture.mode,
+        "samples": samples,
+        "formats": ["collapsed", "pstats"] if stats is not None else ["collapsed"],
+        "_stacks": stacks,
+        "_pstats": marshal.dumps(stats.stats) if stats is not None else None,
+    }
+    with _lock:
+        _profiles.append(record)
+    return record
+
+
+def profiles():
+    """Metadata of the buffered profiles, newest first."""
+    with _lock:
+        records = list(_profiles)
+    return [
+        {key: value for key, value in record.items() if not key.startswith("_")}
+        for record in reversed(records)
+    ]
+
+
+def get_profile(profile_id):
+    with _lock:
+        for record in _profiles:
+            if record["id"] == profile_id:
+                return record
+    return None
+
+
+def collapsed(record):
+    """The profile's samples in collapsed-stack format, one "stack count" per line."""
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(record["_stacks"].items()))
+
+
+def clear():
+    with _lock:
+        _profiles.clear()
+
+
+class ProfileMiddleware:
+    """ASGI middleware profiling requests to PROFILE_PATHS that ask for it or are slow."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or PROFILE_TOKEN is None
+            or not scope["path"].startswith(PROFILE_PATHS)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers", ()))
+        token = headers.get(TOKEN_HEADER)
+        requested = check_token(token.decode("latin-1")) if token is not None else False
+        if not requested and PROFILE_SLOW_MS <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        mode = headers.get(MODE_HEADER, b"sample").decode("latin-1") if requested else "sample"
+        if mode not in MODES:
+            mode = "sample"
+        if mode == "cprofile" and not _cprofile_lock.acquire(blocking=False):
+            mode = "sample"
+        try:
+            await self._profile(scope, receive, send, mode, requested)
+        finally:
+            if mode == "cprofile":
+                _cprofile_lock.release()
+
+    async def _profile(self, scope, receive, send, mode, requested):
+        capture = Capture(mode, asyncio.get_running_loop(), asyncio.current_task())
+        profile_id = next(_ids) if requested else None
+        status = None
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profile_id is not None:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-profile-id", str(profile_id).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        token = _active.set(capture)
+        start = time.perf_counter()
+        loop_profile = _enable_cprofile(capture)
+        _start(capture)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _stop(capture)
+            _disable_cprofile(capture, loop_profile)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            _active.reset(token)
+        if requested or elapsed_ms >= PROFILE_SLOW_MS:
+            _store(capture, {
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "status": status,
+                "duration_ms": round(elapsed_ms, 2),
+                "trigger": "header" if requested else "slow",
+            }, profile_id)
@@ -0,0 +1,328 @@
+"""
+Filter query language for the viewers, the graph API and filter.py.
+
+    okhttp, retrofit                  legacy keyword list: module contains any of them
+    group:androidx.compose* AND NOT artifact:*-android
+    module:/^com\\.squareup\\.(okhttp3|retrofit2):/ OR full:"-> 2.0"
+    (version<2.0 OR version:"[3.0,3.5)") resolution:c
+
+Predicates are field:value (substring, or a glob when the value contains
+* ? or [), field=value and field!=value (whole value), field:/regex/ (a
+regex search) and, for version, the comparisons < <= > >= against
+utils.version_key plus version:RANGE with the syntax of
+utils.parse_version_range. All matching ignores case. A bare word or
+"quoted text" matches a module substring. Terms next to each other are ANDed; NOT binds
+tighter than AND, which binds tighter than OR and commas. Operators are
+uppercase so that artifacts named "and" or "not" stay searchable.
+
+A query without operators, fields, parentheses, quotes or regexes is a
+legacy keyword list and keeps its old meaning exactly, spaces included.
+"""
+import fnmatch
+import re
+
+try:
+    from .utils import parse_version_range, version_key
+except ImportError:
+    from utils import parse_version_range, version_key
+
+FIELDS = ("module", "group", "artifact", "version", "resolution", "full")
+_OPERATORS = ("<=", ">=", "!=", "<", ">", "=", ":")
+_KEYWORDS = ("AND", "OR", "NOT")
+_FIELD_PATTERN = re.compile(
+    r"(%s)\s*(%s)" % ("|".join(FIELDS), "|".join(map(re.escape, _OPERATORS)))
+)
+_WORD_END = re.compile(r"[\s(),]")
+_CLOSING = {"[": "])", "(": "])"}
+
+
+class QueryError(ValueError):
+    """Raised for a query that does not parse."""
+
+
+def _read_delimited(text, start, quote):
+    # Returns (body, end) for a quoted string or regex starting at text[start] == quote
+    body = []
+    i = start + 1
+    while i < len(text):
+        char = text[i]
+        if char == "\\" and i + 1 < len(text):
+            # Regexes keep their escapes, strings only unescape the quote
+            if quote == "/" and text[i + 1] != "/":
+                body.append(char)
+            body.append(text[i + 1])
+            i += 2
+            continue
+        if char == quote:
+            return "".join(body), i + 1
+        body.append(char)
+        i += 1
+    raise QueryError(f"Unterminated {quote} at position {start}")
+
+
+def _read_word(text, start):
+    match = _WORD_END.search(text, start)
+    end = match.start() if match else len(text)
+    return text[start:end], end
+
+
+def _read_value(text, start, field):
+    # Returns (kind, value, end) where kind is "text" or "regex"
+    if start >= len(text):
+        raise QueryError(f"Missing value for {field}")
+    char = text[start]
+    if char == '"':
+        value, end = _read_delimited(text, start, '"')
+        return "text", value, end
+    if char == "/":
+        value, end = _read_delimited(text, start, "/")
+        return "regex", value, end
+    if field == "version" and char in _CLOSING:
+        # Maven intervals may hold commas and parentheses: [1.0,2.0) or (,1.5]
+        i = start + 1
+        while i < len(text) and text[i] not in _CLOSING[char]:
+            i += 1
+        if i == len(text):
+            raise QueryError(f"Unterminated version range at position {start}")
+        return "text", text[start:i + 1], i + 1
+    value, end = _read_word(text, start)
+    if not value:
+        raise QueryError(f"Missing value for {field}")
+    return "text", value, end
+
+
+def tokenize(text):
+    """
+    Splits a query into tokens: ("(",), (")",), (",",), ("AND",), ("OR",),
+    ("NOT",), ("term", field, op, kind, value) and ("word", text).
+    """
+    tokens = []
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char.isspace():
+            i += 1
+            continue
+        if char in "(),":
+            tokens.append((char,))
+            i += 1
+            continue
+        if char == '"':
+            value, i = _read_delimited(text, i, '"')
+            tokens.append(("term", "module", ":", "text", value))
+            continue
+        if char == "/":
+            value, i = _read_delimited(text, i, "/")
+            tokens.append(("term", "module", ":", "regex", value))
+            continue
+        match = _FIELD_PATTERN.match(text, i)
+        if match:
+            field, op = match.group(1), match.group(2)
+            start = match.end()
+            while start < len(text) and text[start] == " ":
+                start += 1
+            kind, value, i = _read_value(text, start, field)
+            tokens.append(("term", field, op, kind, value))
+            continue
+        word, i = _read_word(text, i)
+        tokens.append((word,) if word in _KEYWORDS else ("word", word))
+    return tokens
+
+
+def _is_legacy(tokens):
+    return all(token[0] in ("word", ",") for token in tokens)
+
+
+class _Parser:
+    """Recursive descent over the token list, producing predicate closures."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def take(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse(self):
+        predicate = self.parse_or()
+        if self.peek() is not None:
+            raise QueryError(f"Unexpected {self.take()[-1]!r}")
+        return predicate
+
+    def parse_or(self):
+        operands = [self.parse_and()]
+        while self.peek() in ("OR", ","):
+            self.take()
+            operands.append(self.parse_and())
+        if len(operands) == 1:
+            return operands[0]
+        return lambda fields: any(operand(fields) for operand in operands)
+
+    def parse_and(self):
+        operands = [self.parse_not()]
+        while self.peek() not in (None, "OR", ",", ")"):
+            if self.peek() == "AND":
+                self.take()
+            operands.append(self.parse_not())
+        if len(operands) == 1:
+            return operands[0]
+        return lambda fields: all(operand(fields) for operand in operands)
+
+    def parse_not(self):
+        if self.peek() == "NOT":
+            self.take()
+            operand = self.parse_not()
+            return lambda fields: not operand(fields)
+        return self.parse_atom()
+
+    def parse_atom(self):
+        kind = self.peek()
+        if kind is None:
+            raise QueryError("Unexpected end of query")
+        token = self.take()
+        if kind == "(":
+            predicate = self.parse_or()
+            if self.peek() != ")":
+                raise QueryError("Missing closing parenthesis")
+            self.take()
+            return predicate
+        if kind == "word":
+            return _predicate("module", ":", "text", token[1])
+        if kind == "term":
+            return _predicate(*token[1:])
+        raise QueryError(f"Unexpected {kind!r}")
+
+
+def _field_index(field):
+    # Fields are looked up in the (module, group, artifact, version, resolution, full) tuple
+    return FIELDS.index(field)
+
+
+def _predicate(field, op, kind, value):
+    index = _field_index(field)
+    if kind == "regex":
+        if op != ":":
+            raise QueryError(f"Regexes need {field}:/.../")
+        try:
+            search = re.compile(value, re.IGNORECASE).search
+        except re.error as e:
+            raise QueryError(f"Invalid regex /{value}/: {e}") from e
+        return lambda fields: search(fields[index]) is not None
+
+    if field == "version" and op in ("<", "<=", ">", ">="):
+        bound = version_key(value)
+        compare = {
+            "<": lambda key: key < bound,
+            "<=": lambda key: key <= bound,
+            ">": lambda key: key > bound,
+            ">=": lambda key: key >= bound,
+        }[op]
+        # Projects and unresolved nodes have no version to compare
+        return lambda fields: bool(fields[index]) and compare(version_key(fields[index]))
+    if op in ("<", "<=", ">", ">="):
+        raise QueryError(f"{field} does not support {op}")
+    if field == "version" and op == ":":
+        try:
+            in_range = parse_version_range(value)
+        except ValueError as e:
+            raise QueryError(str(e)) from e
+        return lambda fields: bool(fields[index]) and in_range(fields[index])
+
+    value = value.lower()
+    if any(c in value for c in "*?["):
+        pattern = re.compile(fnmatch.translate(value)).match
+        matches = lambda text: pattern(text) is not None  # noqa: E731
+    elif op == ":":
+        matches = lambda text: value in text  # noqa: E731
+    else:
+        matches = lambda text: text == value  # noqa: E731
+    if op == "!=":
+        return lambda fields: not matches(fields[index].lower())
+    return lambda fields: matches(fields[index].lower())
+
+
+def node_fields(module, version="", resolution="", full=""):
+    """The field tuple a compiled query is evaluated on."""
+    group, _, artifact = module.rpartition(":") if ":" in module else ("", "", module)
+    return (module, group.strip(), artifact.strip(), version, resolution, full)
+
+
+class Query:
+    """A compiled filter query."""
+
+    def __init__(self, text):
+        self.text = text
+        tokens = tokenize(text)
+        self.legacy = _is_legacy(tokens)
+        if self.legacy:
+            # Exactly the old comma split, so keywords keep their inner spaces
+            self.keywords = [keyword.strip() for keyword in text.split(",")]
+            lowered = [keyword.lower() for keyword in self.keywords]
+            module = _field_index("module")
+            self._predicate = lambda fields: any(
+                keyword in fields[module].lower() for keyword in lowered
+            )
+        else:
+            self.keywords = None
+            self._predicate = _Parser(tokens).parse()
+
+    def matches_fields(self, fields):
+        return self._predicate(fields)
+
+    def matches(self, node):
+        """Whether a tree node dict matches."""
+        return self._predicate(node_fields(
+            node.get("module", ""), node.get("version", ""),
+            node.get("resolution", ""), node.get("full", ""),
+        ))
+
+    def node_matcher(self):
+        """
+        Returns matches() memoized on the node identity, for trees where the
+        same dependency appears many times.
+        """
+        seen = {}
+
+        def matcher(node):
+            key = (node.get("module", ""), node.get("version", ""),
+                   node.get("resolution", ""), node.get("full", ""))
+            result = seen.get(key)
+            if result is None:
+                result = seen[key] = self._predicate(node_fields(*key))
+            return result
+
+        return matcher
+
+    def record_matcher(self, store):
+        """
+        Returns matches_record(rec) for graph_store.MappedStore.select_matches.
+        Each unique string is decoded once and each record is evaluated once.
+        """
+        strings = {}
+
+        def string(sid):
+            value = strings.get(sid)
+            if value is None:
+                value = strings[sid] = store.string(sid)
+            return value
+
+        def matches_record(rec):
+            return self._predicate(node_fields(
+                string(store.rec_module[rec]), string(store.rec_version[rec]),
+                string(store.rec_resolution[rec]), string(store.rec_full[rec]),
+            ))
+
+        return matches_record
+
+    def __repr__(self):
+        return f"Query({self.text!r})"
+
+
+def compile_query(text):
+    """Compiles a filter query. Raises QueryError when it does not parse."""
+    return Query(text)
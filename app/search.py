@@ -0,0 +1,146 @@
+"""
+Typeahead search over the modules of a stored file.
+
+The index holds one entry per unique module with its occurrence count in the
+tree and the versions it appears with. Queries of one or two characters use a
+sorted prefix table over the module and its name segments; longer queries
+intersect trigram postings over the module and 'full' strings, and fall back
+to trigram overlap for fuzzy (typo-tolerant) matches.
+"""
+import heapq
+import re
+from bisect import bisect_left
+from collections import Counter
+
+# Ranks, best first
+EXACT, PREFIX, SEGMENT_PREFIX, SUBSTRING, FUZZY = range(5)
+MATCH_KINDS = ("exact", "prefix", "segment", "substring", "fuzzy")
+
+# Share of the query trigrams a fuzzy match must contain
+FUZZY_THRESHOLD = 0.5
+
+_SEGMENT_SEPARATORS = re.compile(r"[:.\-_]")
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    def __init__(self, store):
+        occurrences = Counter()
+        versions = {}
+        fulls = {}
+        for position in range(store.position_count):
+            rec = store.tree_rec[position]
+            module_sid = store.rec_module[rec]
+            occurrences[module_sid] += 1
+            version = store.rec_version[rec]
+            versions.setdefault(module_sid, Counter())[version] += 1
+            fulls.setdefault(module_sid, set()).add(store.rec_full[rec])
+
+        self.modules = []
+        self.counts = []
+        self.versions = []
+        self.texts = []
+        prefixes = []
+        self.postings = {}
+        for entry, module_sid in enumerate(occurrences):
+            module = store.string(module_sid)
+            lowered = module.lower()
+            self.modules.append(module)
+            self.counts.append(occurrences[module_sid])
+            # Most used version first
+            by_use = sorted(
+                (-count, store.string(sid)) for sid, count in versions[module_sid].items()
+            )
+            self.versions.append([version for _, version in by_use if version])
+            text = " ".join(
+                [lowered] + sorted(store.string(sid).lower() for sid in fulls[module_sid])
+            )
+            self.texts.append(text)
+
+            prefixes.append((lowered, entry))
+            for match in _SEGMENT_SEPARATORS.finditer(lowered):
+                segment = lowered[match.end():]
+                if segment:
+                    prefixes.append((segment, entry))
+            for gram in _trigrams(text):
+                self.postings.setdefault(gram, []).append(entry)
+
+        prefixes.sort()
+        self.prefix_keys = [key for key, _ in prefixes]
+        self.prefix_entries = [entry for _, entry in prefixes]
+
+    def __len__(self):
+        return len(self.modules)
+
+    def _rank(self, entry, query):
+        module = self.modules[entry].lower()
+        if module == query:
+            return EXACT
+        if module.startswith(query):
+            return PREFIX
+        if any(
+            module.startswith(query, match.end())
+            for match in _SEGMENT_SEPARATORS.finditer(module)
+        ):
+            return SEGMENT_PREFIX
+        if query in self.texts[entry]:
+            return SUBSTRING
+        return None
+
+    def _prefix_candidates(self, query):
+        start = bisect_left(self.prefix_keys, query)
+        end = bisect_left(self.prefix_keys, query + "\uffff", start)
+        return set(self.prefix_entries[start:end])
+
+    def _trigram_candidates(self, query):
+        grams = _trigrams(query)
+        hits = Counter()
+        for gram in grams:
+            hits.update(self.postings.get(gram, ()))
+        return hits, len(grams)
+
+    def search(self, query, limit=10):
+        """Returns up to limit ranked result dicts for query."""
+        query = query.strip().lower()
+        if not query:
+            return []
+
+        ranked = []
+        if len(query) < 3:
+            for entry in self._prefix_candidates(query):
+                ranked.append(((self._rank(entry, query), 0), entry))
+        else:
+            hits, gram_count = self._trigram_candidates(query)
+            for entry, hit_count in hits.items():
+                rank = self._rank(entry, query) if hit_count == gram_count else None
+                if rank is not None:
+                    ranked.append(((rank, 0), entry))
+                elif hit_count >= gram_count * FUZZY_THRESHOLD:
+                    # More shared trigrams rank a fuzzy match higher
+                    ranked.append(((FUZZY, -hit_count), entry))
+
+        # Better match first, then more occurrences, then shorter names
+        top = heapq.nsmallest(
+            limit,
+            ranked,
+            key=lambda item: (
+                item[0], -self.counts[item[1]], len(self.modules[item[1]]), self.modules[item[1]]
+            ),
+        )
+        results = []
+        for (kind, _), entry in top:
+            results.append({
+                "module": self.modules[entry],
+                "count": self.counts[entry],
+                "versions": self.versions[entry],
+                "match": MATCH_KINDS[kind],
+            })
+        return results
+
+
+def search_index(store):
+    """Returns the search index of a mapped store, building it on first use."""
+    return store.cached("search", SearchIndex)
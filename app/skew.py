@@ -0,0 +1,220 @@
+"""
+Version skew across stored projects: every module resolved to different
+versions in different snapshots, and how far apart they are.
+
+The report is computed from the fleet index postings, i.e. the same non-empty
+(module, version) pairs as enlist.collect_dependencies, which are kept up to
+date incrementally as files are stored and removed. Versions are encoded as
+integer ranks in version_key order, so the module x snapshot matrix is three
+flat integer columns (module, snapshot, version rank); one sort and a linear
+pass over it give every module's oldest, latest and median version. The
+matrix and the rows of every skewed module are rebuilt in full when the
+compared files change, and filtered per request.
+"""
+import fnmatch
+import os
+import threading
+from array import array
+from pathlib import Path
+
+try:
+    from . import fleet
+    from .utils import version_key
+except ImportError:
+    import fleet
+    from utils import version_key
+
+SCOPES = ("projects", "files")
+
+_lock = threading.Lock()
+# filename -> (fingerprint, project) of the files seen so far
+_projects = {}
+# Matrix and skew rows (every module with two or more versions) of the last
+# report, with the files they were built from
+_cache = {"key": None, "matrix": None, "rows": None}
+
+
+def encode_versions(versions):
+    """Returns (ordered versions, {version: rank}) with ranks in version_key order."""
+    ordered = sorted(set(versions), key=lambda v: (version_key(v), v))
+    return ordered, {version: rank for rank, version in enumerate(ordered)}
+
+
+def _major(version):
+    for kind, value, _ in version_key(version):
+        if kind == 2:
+            return value
+    return 0
+
+
+def _file_projects(data_dir, index, open_store):
+    # Only files that are new or changed since the last report are opened
+    for filename, fingerprint in index["files"].items():
+        cached = _projects.get(filename)
+        if cached is None or cached[0] != fingerprint:
+            try:
+                project = open_store(Path(data_dir) / filename).root_key
+            except Exception as e:
+                print(f"Could not read the project of {filename}: {e}")
+                project = None
+            _projects[filename] = (fingerprint, project or "root")
+    for filename in list(_projects):
+        if filename not in index["files"]:
+            del _projects[filename]
+    return {filename: _projects[filename][1] for filename in index["files"]}
+
+
+def _columns(data_dir, index, projects, scope):
+    """The snapshots compared: every file, or the newest file of each project."""
+    if scope == "files":
+        return sorted(index["files"])
+    newest = {}
+    for filename, project in projects.items():
+        try:
+            mtime = os.stat(Path(data_dir) / filename).st_mtime_ns
+        except FileNotFoundError:
+            continue
+        if project not in newest or mtime > newest[project][0]:
+            newest[project] = (mtime, filename)
+    return sorted(filename for _, filename in newest.values())
+
+
+def build_matrix(postings, columns):
+    """
+    Builds the sparse module x snapshot matrix of a fleet index postings map.
+    Returns (modules, versions, module column, snapshot column, rank column),
+    sorted by module, snapshot and rank.
+    """
+    column_of = {filename: i for i, filename in enumerate(columns)}
+    modules = sorted(postings)
+    versions, rank_of = encode_versions(
+        version for by_version in postings.values() for version in by_version
+    )
+    cells = []
+    for m, module in enumerate(modules):
+        for version, files in postings[module].items():
+            rank = rank_of[version]
+            for filename in files:
+                column = column_of.get(filename)
+                if column is not None:
+                    cells.append((m, column, rank))
+    cells.sort()
+    return (
+        modules,
+        versions,
+        array("I", (c[0] for c in cells)),
+        array("I", (c[1] for c in cells)),
+        array("I", (c[2] for c in cells)),
+    )
+
+
+def _module_rows(matrix):
+    """Yields (module index, [(snapshot, rank)]) with one entry per snapshot, its newest version."""
+    _, _, module_col, column_col, rank_col = matrix
+    start = 0
+    count = len(module_col)
+    while start < count:
+        module = module_col[start]
+        end = start
+        cells = []
+        while end < count and module_col[end] == module:
+            # Sorted by rank within a snapshot, so the last cell is its newest version
+            if end + 1 == count or module_col[end + 1] != module or column_col[end + 1] != column_col[end]:
+                cells.append((column_col[end], rank_col[end]))
+            end += 1
+        yield module, cells
+        start = end
+
+
+def _module_filter(module):
+    """A predicate on module names for a name or glob pattern; None matches all."""
+    pattern = module.strip().lower() if module else None
+    if pattern is None:
+        return lambda name: True
+    if any(c in pattern for c in "*?["):
+        return lambda name: fnmatch.fnmatchcase(name.lower(), pattern)
+    return lambda name: name.lower() == pattern
+
+
+def skew_rows(matrix, columns, projects, min_versions=2, module=None):
+    """Skew of every module used at min_versions or more distinct versions, most skewed first."""
+    modules, versions = matrix[0], matrix[1]
+    wanted = _module_filter(module)
+    rows = []
+    for m, cells in _module_rows(matrix):
+        name = modules[m]
+        if not wanted(name):
+            continue
+        ranks = sorted({rank for _, rank in cells})
+        if len(ranks) < min_versions:
+            continue
+        latest = ranks[-1]
+        median = sorted(rank for _, rank in cells)[len(cells) // 2]
+        by_rank = {}
+        for column, rank in cells:
+            by_rank.setdefault(rank, []).append(column)
+        position = {rank: i for i, rank in enumerate(ranks)}
+        rows.append({
+            "module": name,
+            "latest": versions[latest],
+            "oldest": versions[ranks[0]],
+            "spread": len(ranks),
+            "major_gap": _major(versions[latest]) - _major(versions[ranks[0]]),
+            "versions": [
+                {
+                    "version": versions[rank],
+                    "behind": len(ranks) - 1 - position[rank],
+                    "snapshots": [
+                        {"filename": columns[c], "project": projects.get(columns[c])}
+                        for c in by_rank[rank]
+                    ],
+                }
+                for rank in ranks
+            ],
+            # Snapshots lagging behind the version most of them use
+            "outliers": [
+                {
+                    "filename": columns[column],
+                    "project": projects.get(columns[column]),
+                    "version": versions[rank],
+                    "behind": len(ranks) - 1 - position[rank],
+                }
+                for column, rank in cells
+                if rank < median
+            ],
+        })
+    rows.sort(key=lambda r: (-r["spread"], -r["major_gap"], r["module"]))
+    return rows
+
+
+def report(data_dir, open_store, scope="projects", min_versions=2, module=None, limit=None):
+    """Returns the version skew report over the files in data_dir."""
+    if scope not in SCOPES:
+        raise ValueError(f"Unsupported scope: {scope}")
+    index = fleet.sync(data_dir, open_store)
+    with _lock:
+        projects = _file_projects(data_dir, index, open_store)
+        columns = _columns(data_dir, index, projects, scope)
+        key = (str(data_dir), scope, tuple(
+            (filename, tuple(index["files"][filename]), projects[filename]) for filename in columns
+        ))
+        if _cache["key"] != key:
+            matrix = build_matrix(index["postings"], columns)
+            _cache.update(key=key, matrix=matrix, rows=skew_rows(matrix, columns, projects))
+        matrix = _cache["matrix"]
+        if min_versions < 2:
+            # Unskewed modules are not cached; a spread of one is rarely asked for
+            rows = skew_rows(matrix, columns, projects, min_versions, module)
+        else:
+            wanted = _module_filter(module)
+            rows = [
+                row for row in _cache["rows"]
+                if row["spread"] >= min_versions and wanted(row["module"])
+            ]
+    return {
+        "scope": scope,
+        "snapshots": [{"filename": c, "project": projects.get(c)} for c in columns],
+        "total_modules": len(matrix[0]),
+        "skewed_modules": len(rows),
+        "modules": rows[:limit] if limit else rows,
+    }
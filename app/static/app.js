@@ -115,7 +115,10 @@ async function selectFile(filename) {
     const filterInput = document.getElementById('filter-text');
     const projectOnlyCheckbox = document.getElementById('project-only');
 
-    const handleVizClick = (targetUrlConstructor) => {
+    const distanceInput = document.getElementById('graph-distance');
+    const excludeInput = document.getElementById('graph-exclude');
+
+    const handleVizClick = (targetUrlConstructor, graphOptions = false) => {
       const filterValue = filterInput.value.trim();
       const projectOnly = projectOnlyCheckbox.checked;
 
@@ -128,6 +131,16 @@ async function selectFile(filename) {
       if (projectOnly) {
         params.append('project_only', 'true');
       }
+      if (graphOptions) {
+        const distanceValue = distanceInput.value.trim();
+        const excludeValue = excludeInput.value.trim();
+        if (distanceValue) {
+          params.append('distance', distanceValue);
+        }
+        if (excludeValue) {
+          params.append('exclude', excludeValue);
+        }
+      }
 
       const queryString = params.toString();
       if (queryString) {
@@ -137,7 +150,7 @@ async function selectFile(filename) {
       window.location.href = url;
     };
 
-    openGraphBtn.onclick = () => handleVizClick((f) => `/viz/graph_viewer.html?file=${f}`);
+    openGraphBtn.onclick = () => handleVizClick((f) => `/viz/graph_viewer.html?file=${f}`, true);
     openTreeBtn.onclick = () => handleVizClick((f) => `/viz/tree_viewer.html?file=${f}`);
 
     enlistBtn.onclick = () => {
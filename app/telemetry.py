@@ -0,0 +1,265 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from .memprof import stage as memory_stage
+
+# Pipeline stages reported in Server-Timing and /metrics
+STAGES = ("queue", "decode", "parse", "store", "load", "filter", "graph", "serialize", "render")
+
+# Default bucket bounds (seconds) for latency histograms
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1024, 10240, 102400, 1048576, 10485760, 104857600)
+COUNT_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000)
+
+# Per-request list of (stage, seconds), set by TimingMiddleware
+_request_timings = ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    """A labelled Prometheus-style histogram kept in process memory."""
+
+    def __init__(self, name, help_text, buckets, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label_names = label_names
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            items = sorted(self._series.items())
+            items = [(labels, list(c), s, n) for labels, (c, s, n) in items]
+        for labels, counts, total, count in items:
+            label_str = ",".join(
+                f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels)
+            )
+            sep = "," if label_str else ""
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                lines.append(f'{self.name}_bucket{{{label_str}{sep}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_str}{sep}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label_str}}} {total}")
+            lines.append(f"{self.name}_count{{{label_str}}} {count}")
+        return "\n".join(lines)
+
+
+class Gauge:
+    """A labelled Prometheus-style gauge (or counter) kept in process memory."""
+
+    def __init__(self, name, help_text, label_names=(), kind="gauge"):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.kind = kind
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            label_str = ",".join(
+                f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels)
+            )
+            if label_str:
+                lines.append(f"{self.name}{{{label_str}}} {value}")
+            else:
+                lines.append(f"{self.name} {value}")
+        return "\n".join(lines)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+STAGE_SECONDS = Histogram(
+    "gdv_stage_duration_seconds",
+    "Time spent in each pipeline stage.",
+    LATENCY_BUCKETS,
+    ("stage", "endpoint"),
+)
+REQUEST_SECONDS = Histogram(
+    "gdv_request_duration_seconds",
+    "Total request handling time per endpoint.",
+    LATENCY_BUCKETS,
+    ("endpoint",),
+)
+PAYLOAD_BYTES = Histogram(
+    "gdv_payload_bytes",
+    "Size of uploaded and serialized payloads.",
+    SIZE_BUCKETS,
+    ("kind", "endpoint"),
+)
+NODE_COUNT = Histogram(
+    "gdv_node_count",
+    "Number of nodes handled per request.",
+    COUNT_BUCKETS,
+    ("kind", "endpoint"),
+)
+
+PARSE_QUEUE_DEPTH = Gauge(
+    "gdv_parse_queue_depth", "Uploads admitted and waiting for a parse worker."
+)
+PARSE_RUNNING = Gauge("gdv_parse_running", "Uploads being parsed.")
+PARSE_PENDING_COST = Gauge(
+    "gdv_parse_pending_cost_bytes",
+    "Estimated peak memory of the uploads admitted and not yet finished.",
+)
+UPLOADS_REJECTED = Gauge(
+    "gdv_uploads_rejected_total",
+    "Uploads turned away by admission control.",
+    ("reason",),
+    kind="counter",
+)
+
+REGISTRY = [
+    STAGE_SECONDS,
+    REQUEST_SECONDS,
+    PAYLOAD_BYTES,
+    NODE_COUNT,
+    PARSE_QUEUE_DEPTH,
+    PARSE_RUNNING,
+    PARSE_PENDING_COST,
+    UPLOADS_REJECTED,
+]
+
+
+def _current_endpoint():
+    timings = _request_timings.get()
+    return timings.endpoint if timings is not None else "cli"
+
+
+class _RequestTimings(list):
+    """Stage timings collected for a single request."""
+
+    def __init__(self, scope):
+        super().__init__()
+        self.scope = scope
+
+    @property
+    def endpoint(self):
+        # The router fills in scope["endpoint"] in place once the route matches
+        return _endpoint_name(self.scope)
+
+
+@contextmanager
+def stage(name):
+    """Times a pipeline stage and attributes it to the current request, if any."""
+    start = time.perf_counter()
+    try:
+        with memory_stage(name):
+            yield
+    finally:
+        observe_stage(name, time.perf_counter() - start)
+
+
+def observe_stage(name, elapsed):
+    """Records a stage duration measured elsewhere for the current request."""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, elapsed))
+        STAGE_SECONDS.observe(elapsed, name, timings.endpoint)
+    else:
+        STAGE_SECONDS.observe(elapsed, name, "cli")
+
+
+def observe_payload(kind, size):
+    """Records a payload size in bytes for the current request."""
+    PAYLOAD_BYTES.observe(size, kind, _current_endpoint())
+
+
+def observe_nodes(kind, count):
+    """Records a node count for the current request."""
+    NODE_COUNT.observe(count, kind, _current_endpoint())
+
+
+def server_timing_header(timings, total=None):
+    """Formats collected stage timings as a Server-Timing header value."""
+    merged = {}
+    for name, elapsed in timings:
+        merged[name] = merged.get(name, 0.0) + elapsed
+    parts = [f"{name};dur={elapsed * 1000:.2f}" for name, elapsed in merged.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def render_prometheus():
+    """Renders every registered metric in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+def _endpoint_name(scope):
+    endpoint = scope.get("endpoint")
+    if endpoint is not None:
+        return getattr(endpoint, "__name__", "unknown")
+    if "app" in scope and scope.get("root_path"):
+        return "static"
+    return "unknown"
+
+
+class TimingMiddleware:
+    """ASGI middleware that collects stage timings and emits Server-Timing headers."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = _RequestTimings(scope)
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                value = server_timing_header(timings, time.perf_counter() - start)
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", value.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            REQUEST_SECONDS.observe(time.perf_counter() - start, timings.endpoint)
@@ -0,0 +1,375 @@
+"""
+Per-project timeline of graph snapshots, stored as deltas.
+
+Every stored file is also recorded in the timeline of its project (the root
+key of the parsed file, as named by parse.extract_project_name, or for a dump
+without a project name the name it was stored under, see project_of) under
+DATA_DIR/.timeline/<project>/:
+
+    log.jsonl              one line per snapshot, line n being snapshot n:
+                           the graph nodes and edges added and removed since
+                           the previous snapshot (the first one adds everything)
+    checkpoint-<n>.json    the full node and edge set after snapshot n, written
+                           every CHECKPOINT_INTERVAL snapshots
+    lock                   flock()ed while the log is appended to or read, so
+                           several server processes can share DATA_DIR
+
+A snapshot is rebuilt from the nearest checkpoint at or before it plus fewer
+than CHECKPOINT_INTERVAL deltas. The timeline is not subject to history
+cleanup, and an unchanged snapshot costs one short line.
+"""
+import fnmatch
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+try:
+    import fcntl
+except ImportError:  # Windows: the thread lock only covers this process
+    fcntl = None
+
+try:
+    from .utils import version_key
+except ImportError:
+    from utils import version_key
+
+TIMELINE_DIRNAME = ".timeline"
+LOG_FILENAME = "log.jsonl"
+LOCK_FILENAME = "lock"
+CHECKPOINT_INTERVAL = int(os.environ.get("TIMELINE_CHECKPOINT_INTERVAL", "50"))
+
+_lock = threading.Lock()
+# Latest snapshot of recently recorded projects: directory -> (log size, count, state),
+# so recording does not replay the log. The size detects appends by other processes.
+LATEST_CACHE_SIZE = 8
+_latest = OrderedDict()
+# Parsed history of recently read projects: directory -> state of history(),
+# extended with only the lines appended since, as the log size tells
+HISTORY_CACHE_SIZE = 8
+_history = OrderedDict()
+_history_lock = threading.Lock()
+# Project name the parser falls back to when a dump names none
+DEFAULT_PROJECT = "root"
+
+
+def timeline_dir(data_dir):
+    return Path(data_dir) / TIMELINE_DIRNAME
+
+
+def project_dir(data_dir, project):
+    # Project paths contain ':'; quoting keeps every name a single, reversible path segment
+    name = quote(project, safe="")
+    if name.startswith("."):
+        name = "%2E" + name[1:]
+    return timeline_dir(data_dir) / name
+
+
+def store_snapshot(store):
+    """
+    Returns (nodes, edges) of a mapped store's graph: {node ID: [module,
+    version, resolution, full]} and a set of (source, target) node IDs.
+    """
+    ids = [store.string(sid) for sid in store.node_id]
+    nodes = {}
+    edges = set()
+    for index, node_id in enumerate(ids):
+        nodes[node_id] = [
+            store.string(store.node_module[index]),
+            store.string(store.node_version[index]),
+            store.string(store.node_resolution[index]),
+            store.string(store.node_full[index]),
+        ]
+        for child in store.children_of(index):
+            edges.add((node_id, ids[child]))
+    return nodes, edges
+
+
+def diff(old, new):
+    """The delta record turning snapshot old into snapshot new."""
+    old_nodes, old_edges = old
+    new_nodes, new_edges = new
+    return {
+        "added_nodes": sorted(
+            [node_id, *fields] for node_id, fields in new_nodes.items()
+            if old_nodes.get(node_id) != fields
+        ),
+        "removed_nodes": sorted(node_id for node_id in old_nodes if node_id not in new_nodes),
+        "added_edges": sorted([s, t] for s, t in new_edges - old_edges),
+        "removed_edges": sorted([s, t] for s, t in old_edges - new_edges),
+    }
+
+
+def apply(state, delta):
+    """Applies a delta record to a (nodes, edges) snapshot in place."""
+    nodes, edges = state
+    for node_id in delta["removed_nodes"]:
+        nodes.pop(node_id, None)
+    for node_id, *fields in delta["added_nodes"]:
+        nodes[node_id] = fields
+    edges.difference_update(map(tuple, delta["removed_edges"]))
+    edges.update(map(tuple, delta["added_edges"]))
+
+
+@contextmanager
+def _locked(directory, shared=False):
+    """Holds the project's lock file: exclusive to append, shared to read."""
+    if fcntl is None or not directory.is_dir():
+        yield
+        return
+    with open(directory / LOCK_FILENAME, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _log_lines(directory):
+    try:
+        with open(directory / LOG_FILENAME, "rb") as f:
+            return f.read().splitlines()
+    except FileNotFoundError:
+        return []
+
+
+def _size(path):
+    try:
+        return os.stat(path).st_size
+    except FileNotFoundError:
+        return -1
+
+
+def _checkpoints(directory):
+    seqs = []
+    for path in directory.glob("checkpoint-*.json"):
+        try:
+            seqs.append(int(path.stem.split("-", 1)[1]))
+        except ValueError:
+            continue
+    return sorted(seqs)
+
+
+def _write_checkpoint(directory, seq, state):
+    nodes, edges = state
+    data = {
+        "seq": seq,
+        "nodes": sorted([node_id, *fields] for node_id, fields in nodes.items()),
+        "edges": sorted([s, t] for s, t in edges),
+    }
+    fd, temp_name = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(temp_name, directory / f"checkpoint-{seq:06d}.json")
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+
+
+def _state_at(directory, lines, seq):
+    """Rebuilds snapshot seq from the nearest checkpoint and the deltas after it."""
+    start = -1
+    for checkpoint in _checkpoints(directory):
+        if checkpoint <= seq:
+            start = checkpoint
+    state = ({}, set())
+    if start >= 0:
+        with open(directory / f"checkpoint-{start:06d}.json", "r", encoding="utf-8") as f:
+            data = json.load(f)
+        state = (
+            {node_id: fields for node_id, *fields in data["nodes"]},
+            set(map(tuple, data["edges"])),
+        )
+    # Lines before the checkpoint are never parsed
+    for line in lines[start + 1:seq + 1]:
+        apply(state, json.loads(line))
+    return state
+
+
+def project_of(store, source):
+    """
+    The timeline a stored file belongs to: its project, or for a dump without
+    a project name the stem of source without the "_<timestamp>" suffix the
+    server appends, so unrelated unnamed projects do not share one timeline.
+    """
+    if store.root_key != DEFAULT_PROJECT:
+        return store.root_key
+    stem, sep, suffix = Path(source).stem.rpartition("_")
+    if not (sep and suffix.isdigit()):
+        stem = Path(source).stem
+    return stem or DEFAULT_PROJECT
+
+
+def record(data_dir, store, source, at=None):
+    """
+    Appends the snapshot of a mapped store to its project's timeline.
+    Returns the summary of the new snapshot, or None for a file without a project.
+    """
+    if store.root_key is None:
+        return None
+    directory = project_dir(data_dir, project_of(store, source))
+    at = at or datetime.now(timezone.utc).isoformat(timespec="seconds")
+    snapshot = store_snapshot(store)
+    directory.mkdir(parents=True, exist_ok=True)
+    with _lock, _locked(directory):
+        log_path = directory / LOG_FILENAME
+        cached = _latest.get(directory)
+        if cached is not None and _size(log_path) == cached[0]:
+            _, seq, previous = cached
+        else:
+            lines = _log_lines(directory)
+            seq = len(lines)
+            previous = _state_at(directory, lines, seq - 1) if lines else ({}, set())
+        delta = {"seq": seq, "at": at, "source": source, **diff(previous, snapshot)}
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(delta, separators=(",", ":")) + "\n")
+        if seq and seq % CHECKPOINT_INTERVAL == 0:
+            _write_checkpoint(directory, seq, snapshot)
+        _latest[directory] = (_size(log_path), seq + 1, snapshot)
+        _latest.move_to_end(directory)
+        while len(_latest) > LATEST_CACHE_SIZE:
+            _latest.popitem(last=False)
+    return _summary(delta)
+
+
+def _summary(delta):
+    return {
+        "seq": delta["seq"],
+        "at": delta["at"],
+        "source": delta["source"],
+        **{key: len(delta[key]) for key in ("added_nodes", "removed_nodes", "added_edges", "removed_edges")},
+    }
+
+
+def projects(data_dir):
+    """Lists the projects with a timeline, with their snapshot count and time span."""
+    result = []
+    root = timeline_dir(data_dir)
+    if not root.exists():
+        return result
+    for directory in sorted(root.iterdir()):
+        with _locked(directory, shared=True):
+            lines = _log_lines(directory)
+        if not lines:
+            continue
+        result.append({
+            "project": unquote(directory.name),
+            "snapshots": len(lines),
+            "first": json.loads(lines[0])["at"],
+            "last": json.loads(lines[-1])["at"],
+        })
+    return result
+
+
+def _extend_history(state, lines):
+    snapshots, spans, fields_of = state["snapshots"], state["spans"], state["fields"]
+    for line in lines:
+        delta = json.loads(line)
+        snapshots.append(_summary(delta))
+        point = {"seq": delta["seq"], "at": delta["at"]}
+        for node_id in delta["removed_nodes"]:
+            if node_id in fields_of:
+                spans[node_id][-1]["left"] = point
+        for node_id, *fields in delta["added_nodes"]:
+            if not fields[1]:
+                continue
+            intervals = spans.setdefault(node_id, [])
+            fields_of[node_id] = fields
+            # A changed resolution re-adds a node that never left
+            if not intervals or intervals[-1]["left"] is not None:
+                intervals.append({"entered": point, "left": None})
+
+
+def _history_state(directory):
+    """
+    The parsed log of a project, reading only what was appended since the last
+    call. The state is extended in place later, so callers hold _history_lock.
+    """
+    log_path = directory / LOG_FILENAME
+    with _locked(directory, shared=True):
+        size = _size(log_path)
+        state = _history.get(directory)
+        if state is None or size < state["size"]:
+            state = {"size": 0, "snapshots": [], "spans": {}, "fields": {}}
+        if size > state["size"]:
+            with open(log_path, "rb") as f:
+                f.seek(state["size"])
+                _extend_history(state, f.read(size - state["size"]).splitlines())
+            state["size"] = size
+        if size > 0:
+            _history[directory] = state
+            _history.move_to_end(directory)
+            while len(_history) > HISTORY_CACHE_SIZE:
+                _history.popitem(last=False)
+    return state
+
+
+def history(data_dir, project, module=None):
+    """
+    Returns the snapshots of a project and, for every module version that
+    appeared in it (optionally only modules matching a glob), the spans of
+    snapshots it was present in. None when the project has no timeline.
+    """
+    pattern = module.strip().lower() if module else None
+
+    def wanted(name):
+        if pattern is None:
+            return True
+        if any(c in pattern for c in "*?["):
+            return fnmatch.fnmatchcase(name.lower(), pattern)
+        return name.lower() == pattern
+
+    with _history_lock:
+        state = _history_state(project_dir(data_dir, project))
+        if not state["snapshots"]:
+            return None
+        # Copied: spans still open are closed in place by later calls
+        snapshots = list(state["snapshots"])
+        versions = [
+            {
+                "module": fields[0],
+                "version": fields[1],
+                "present": [dict(span) for span in state["spans"][node_id]],
+            }
+            for node_id, fields in state["fields"].items()
+            if wanted(fields[0])
+        ]
+    versions.sort(key=lambda v: (v["module"], version_key(v["version"])))
+    return {"project": project, "snapshots": snapshots, "versions": versions}
+
+
+def snapshot(data_dir, project, seq):
+    """
+    Rebuilds snapshot seq of a project in the convert_to_graph output format,
+    or returns None when it does not exist.
+    """
+    directory = project_dir(data_dir, project)
+    with _locked(directory, shared=True):
+        lines = _log_lines(directory)
+        if not 0 <= seq < len(lines):
+            return None
+        # The checkpoints are read under the lock too
+        nodes, edges = _state_at(directory, lines, seq)
+    delta = json.loads(lines[seq])
+    node_list = [
+        {"id": node_id, "module": module, "version": version, "resolution": resolution, "full": full}
+        for node_id, (module, version, resolution, full) in sorted(nodes.items())
+    ]
+    edge_list = [{"source": s, "target": t} for s, t in sorted(edges)]
+    return {
+        "nodes": node_list,
+        "edges": edge_list,
+        "metadata": {
+            "total_nodes": len(node_list),
+            "total_edges": len(edge_list),
+            "seq": seq,
+            "at": delta["at"],
+            "source": delta["source"],
+        },
+    }
@@ -0,0 +1,229 @@
+"""
+Recursion-free traversal helpers for nested dependency trees.
+
+Trees are lists of node dicts with a 'children' list. Everything here uses
+explicit stacks, so arbitrarily deep trees never hit the interpreter's
+recursion limit. That includes JSON: the json module recurses once per
+nesting level (in C without indent, in Python with it), so dumps() and
+loads() use it as the fast path and fall back to the explicit-stack
+iter_json() and parse_json() when a document is too deep for it.
+"""
+import json
+import re
+from json.decoder import JSONDecodeError, scanstring
+
+
+def iter_preorder(nodes):
+    """
+    Yields (node, depth) for every node in pre-order, depth 0 being the given nodes.
+    """
+    stack = [iter(nodes)]
+    while stack:
+        for node in stack[-1]:
+            if isinstance(node, dict):
+                yield node, len(stack) - 1
+                children = node.get('children')
+                if children:
+                    stack.append(iter(children))
+                    break
+        else:
+            stack.pop()
+
+
+def flatten(nodes):
+    """
+    Flattens a tree into pre-order columns (items, depths, sizes).
+    sizes[i] counts the positions in the subtree rooted at i, itself included,
+    so the subtree of i spans items[i:i + sizes[i]].
+    """
+    items = []
+    depths = []
+    sizes = []
+    open_positions = []
+    for node, depth in iter_preorder(nodes):
+        while len(open_positions) > depth:
+            position = open_positions.pop()
+            sizes[position] = len(items) - position
+        open_positions.append(len(items))
+        items.append(node)
+        depths.append(depth)
+        sizes.append(1)
+    for position in open_positions:
+        sizes[position] = len(items) - position
+    return items, depths, sizes
+
+
+def iter_children(position, sizes):
+    """Yields the positions of the direct children of position in a flattened tree."""
+    child = position + 1
+    end = position + sizes[position]
+    while child < end:
+        yield child
+        child += sizes[child]
+
+
+def prune(nodes, keep):
+    """
+    Rebuilds the tree with only the nodes for which keep(node) is true.
+    A node that is not kept drops its whole subtree, which is never visited.
+    Kept nodes are shallow copies with a fresh 'children' list; the input tree
+    is not modified.
+    """
+    result = []
+    stack = [(iter(nodes), result)]
+    while stack:
+        children, output = stack[-1]
+        for node in children:
+            if isinstance(node, dict) and keep(node):
+                new_node = dict(node)
+                new_node['children'] = []
+                output.append(new_node)
+                stack.append((iter(node.get('children') or ()), new_node['children']))
+                break
+        else:
+            stack.pop()
+    return result
+
+
+_END = object()
+
+
+def iter_json(value, indent=None, separators=None):
+    """Yields the chunks of json.dumps(value, indent=indent, separators=separators)."""
+    if separators is None:
+        separators = (',', ': ') if indent is not None else (', ', ': ')
+    item_separator, key_separator = separators
+    if isinstance(indent, int):
+        indent = ' ' * indent
+    stack = []  # [items iterator, closing bracket, is a dict, no item emitted yet]
+    pending = value
+    while True:
+        if pending is not _END:
+            if isinstance(pending, dict) and pending:
+                yield '{'
+                stack.append([iter(pending.items()), '}', True, True])
+            elif isinstance(pending, (list, tuple)) and pending:
+                yield '['
+                stack.append([iter(pending), ']', False, True])
+            else:
+                yield json.dumps(pending)
+            pending = _END
+        if not stack:
+            return
+        entry = stack[-1]
+        item = next(entry[0], _END)
+        if item is _END:
+            stack.pop()
+            if indent is not None:
+                yield '\n' + indent * len(stack)
+            yield entry[1]
+            continue
+        prefix = '' if entry[3] else item_separator
+        entry[3] = False
+        if indent is not None:
+            prefix += '\n' + indent * len(stack)
+        if entry[2]:
+            key, item = item
+            prefix += json.dumps(key if isinstance(key, str) else str(key)) + key_separator
+        yield prefix
+        pending = item
+
+
+def dumps(value, indent=None, separators=None):
+    """
+    json.dumps that also handles documents nested deeper than the recursion
+    limit. Those are written without indentation, whose size would grow with
+    the square of their depth.
+    """
+    try:
+        return json.dumps(value, indent=indent, separators=separators)
+    except RecursionError:
+        return ''.join(iter_json(value, separators=separators if indent is None else None))
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_NUMBER = re.compile(r'-?(?:0|[1-9]\d*)(\.\d+)?([eE][-+]?\d+)?')
+_LITERALS = {'null': None, 'true': True, 'false': False}
+
+
+def _skip(text, index):
+    return _WHITESPACE.match(text, index).end()
+
+
+def _scalar(text, index):
+    if text.startswith('"', index):
+        return scanstring(text, index + 1)
+    for literal, value in _LITERALS.items():
+        if text.startswith(literal, index):
+            return value, index + len(literal)
+    match = _NUMBER.match(text, index)
+    if match is None:
+        raise JSONDecodeError('Expecting value', text, index)
+    number = match.group()
+    if match.group(1) or match.group(2):
+        return float(number), match.end()
+    return int(number), match.end()
+
+
+def _key(text, index):
+    if not text.startswith('"', index):
+        raise JSONDecodeError('Expecting property name enclosed in double quotes', text, index)
+    key, index = scanstring(text, index + 1)
+    index = _skip(text, index)
+    if not text.startswith(':', index):
+        raise JSONDecodeError("Expecting ':' delimiter", text, index)
+    return key, _skip(text, index + 1)
+
+
+def parse_json(text):
+    """Parses a JSON document with an explicit stack instead of recursion."""
+    stack = []  # [open container, key of the value being parsed]
+    index = _skip(text, 0)
+    while True:
+        if text.startswith('{', index):
+            index = _skip(text, index + 1)
+            if not text.startswith('}', index):
+                key, index = _key(text, index)
+                stack.append([{}, key])
+                continue
+            value, index = {}, index + 1
+        elif text.startswith('[', index):
+            index = _skip(text, index + 1)
+            if not text.startswith(']', index):
+                stack.append([[], None])
+                continue
+            value, index = [], index + 1
+        else:
+            value, index = _scalar(text, index)
+
+        # Adds the value to its container, closing every container it completes
+        while True:
+            index = _skip(text, index)
+            if not stack:
+                if index != len(text):
+                    raise JSONDecodeError('Extra data', text, index)
+                return value
+            entry = stack[-1]
+            container = entry[0]
+            if entry[1] is None:
+                container.append(value)
+            else:
+                container[entry[1]] = value
+            if text.startswith(',', index):
+                index = _skip(text, index + 1)
+                if isinstance(container, dict):
+                    entry[1], index = _key(text, index)
+                break
+            closing = '}' if isinstance(container, dict) else ']'
+            if not text.startswith(closing, index):
+                raise JSONDecodeError(f"Expecting ',' or '{closing}'", text, index)
+            stack.pop()
+            value, index = container, index + 1
+
+
+def loads(text):
+    """json.loads that also handles documents nested deeper than the recursion limit."""
+    try:
+        return json.loads(text)
+    except RecursionError:
+        return parse_json(text)
@@ -84,3 +84,115 @@ def get_root_key_and_nodes(dependency_data):
             return key, value
             
     return None, []
+
+# Ordering of well-known pre-release qualifiers, all below the release itself
+_QUALIFIER_RANKS = {
+    'alpha': 0, 'a': 0,
+    'beta': 1, 'b': 1,
+    'milestone': 2, 'm': 2,
+    'rc': 3, 'cr': 3,
+    'snapshot': 4,
+}
+_RELEASE_QUALIFIERS = {'ga', 'final', 'release'}
+_END = (1, 0, '')
+
+def version_key(version, keep_zeros=False):
+    """
+    Returns a sort key for a version string, close to Maven's ordering:
+    numeric parts compare as numbers and trailing zeros are ignored (1.0 == 1.0.0),
+    alpha < beta < milestone < rc < snapshot < release < anything else (e.g. sp, jre).
+    With keep_zeros, zeros are kept, as prefix matching needs them (1.0.* is not 1.*).
+    """
+    items = []
+
+    def strip_zeros():
+        while not keep_zeros and items and items[-1] == (2, 0, ''):
+            items.pop()
+
+    for token in re.findall(r'\d+|[A-Za-z]+', version or ''):
+        if token.isdigit():
+            items.append((2, int(token), ''))
+            continue
+        token = token.lower()
+        if token in _RELEASE_QUALIFIERS:
+            continue
+        strip_zeros()
+        if token in _QUALIFIER_RANKS:
+            items.append((0, _QUALIFIER_RANKS[token], ''))
+        else:
+            items.append((1, 1, token))
+    strip_zeros()
+    items.append(_END)
+    return tuple(items)
+
+_COMPARISON = re.compile(r'^(>=|<=|>|<|==|=|!=)?\s*(.+)$')
+
+
+def parse_version_range(text):
+    """
+    Parses a version range into a predicate over version strings. Accepts
+    Maven/Gradle intervals ("[1.0,2.0)", "(,1.2.17]", "[1.5]", several joined
+    with commas between brackets) and comparison lists (">=1.0,<2.0", "1.2.17").
+    A trailing ".*" or ".+" selects a prefix ("1.*"). Raises ValueError.
+    """
+    text = (text or "").strip()
+    if not text:
+        return lambda version: True
+
+    if text[0] in "[(":
+        intervals = re.findall(r"([\[(])([^\[\]()]*)([\])])", text)
+        if not intervals:
+            raise ValueError(f"Invalid version range: {text}")
+        checks = []
+        for opening, body, closing in intervals:
+            if "," not in body:
+                exact = version_key(body.strip())
+                checks.append(lambda key, exact=exact: key == exact)
+                continue
+            low, high = (part.strip() for part in body.split(",", 1))
+            low_key = version_key(low) if low else None
+            high_key = version_key(high) if high else None
+
+            def check(key, low_key=low_key, high_key=high_key, opening=opening, closing=closing):
+                if low_key is not None and (key < low_key or (opening == "(" and key == low_key)):
+                    return False
+                if high_key is not None and (key > high_key or (closing == ")" and key == high_key)):
+                    return False
+                return True
+
+            checks.append(check)
+        return lambda version: any(check(version_key(version)) for check in checks)
+
+    conditions = []
+    prefixes = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        match = _COMPARISON.match(part)
+        operator, operand = match.group(1) or "==", match.group(2).strip()
+        if operand.endswith((".*", ".+")) and operator in ("==", "="):
+            prefixes.append(version_key(operand[:-2], keep_zeros=True)[:-1])
+            continue
+        operand_key = version_key(operand)
+        conditions.append({
+            ">=": lambda key, o=operand_key: key >= o,
+            "<=": lambda key, o=operand_key: key <= o,
+            ">": lambda key, o=operand_key: key > o,
+            "<": lambda key, o=operand_key: key < o,
+            "==": lambda key, o=operand_key: key == o,
+            "=": lambda key, o=operand_key: key == o,
+            "!=": lambda key, o=operand_key: key != o,
+        }[operator])
+    if not conditions and not prefixes:
+        raise ValueError(f"Invalid version range: {text}")
+
+    def matches(version):
+        if prefixes:
+            full = version_key(version, keep_zeros=True)
+            if not all(full[:len(prefix)] == prefix for prefix in prefixes):
+                return False
+        key = version_key(version)
+        return all(condition(key) for condition in conditions)
+
+    return matches
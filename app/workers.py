@@ -0,0 +1,79 @@
+"""
+Bounded executor for CPU-bound request work, keeping the event loop free.
+
+WORKER_EXECUTOR selects "thread" (default) or "process" workers and
+WORKER_CONCURRENCY their number. Thread workers run in a copy of the caller's
+context, so stage timings still land on the request; process workers run
+module-level functions only and report no stages. Identical concurrent calls
+can share a single computation (single-flight) through run_shared.
+"""
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .profiler import track
+from .telemetry import observe_stage
+
+WORKER_EXECUTOR = os.environ.get("WORKER_EXECUTOR", "thread")
+WORKER_CONCURRENCY = int(
+    os.environ.get("WORKER_CONCURRENCY", str(min(4, os.cpu_count() or 1)))
+)
+
+_executor = None
+# (event loop, key) -> future of the computation in flight
+_inflight = {}
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        if WORKER_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=WORKER_CONCURRENCY)
+        else:
+            _executor = ThreadPoolExecutor(
+                max_workers=WORKER_CONCURRENCY, thread_name_prefix="gdv-worker"
+            )
+    return _executor
+
+
+def _timed_call(submitted, fn, *args):
+    # Time spent waiting for a free worker
+    observe_stage("queue", time.perf_counter() - submitted)
+    with track():
+        return fn(*args)
+
+
+async def run(fn, *args):
+    """Runs fn(*args) on a worker and returns its result."""
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    if isinstance(executor, ProcessPoolExecutor):
+        return await loop.run_in_executor(executor, fn, *args)
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        executor, context.run, _timed_call, time.perf_counter(), fn, *args
+    )
+
+
+async def run_shared(key, fn, *args):
+    """
+    Like run, but concurrent calls with an equal key share one computation.
+    The result is shared as is, so it must not be mutated by callers. A caller
+    that is cancelled does not cancel the computation for the others.
+    """
+    loop = asyncio.get_running_loop()
+    flight_key = (loop, key)
+    future = _inflight.get(flight_key)
+    if future is None:
+        future = asyncio.ensure_future(run(fn, *args))
+        _inflight[flight_key] = future
+        future.add_done_callback(lambda _: _inflight.pop(flight_key, None))
+        return await asyncio.shield(future)
+
+    start = time.perf_counter()
+    try:
+        return await asyncio.shield(future)
+    finally:
+        observe_stage("queue", time.perf_counter() - start)
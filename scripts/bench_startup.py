@@ -0,0 +1,176 @@
+"""
+Measures cold-start cost: the import time of app.main and the latency of the
+first requests served by a fresh process. Each run uses a new interpreter.
+
+With --baseline-ref, the same probe also runs against a git worktree of that
+revision, interleaved with the runs of the working tree, and the command exits
+with status 1 when a median exceeds the baseline's by more than the tolerance
+in scripts/startup_budget.json (relative, with an absolute slack so that
+millisecond-sized timings are not flaky). Both sides are measured on the same
+machine in the same job, so the gate does not depend on the runner. Without
+it, the medians are compared with the absolute budgets in the file, which
+were recorded on one machine and are only reported, never failed on.
+
+    uv run python scripts/bench_startup.py --baseline-ref origin/main
+    uv run python scripts/bench_startup.py
+    uv run python scripts/bench_startup.py --runs 9 --update
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BUDGET_FILE = Path(__file__).resolve().parent / "startup_budget.json"
+SAMPLE = "homeassistant_181149.json"
+
+# Runs in a fresh interpreter and prints one JSON object of timings in ms
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+timings = {"import_ms": (time.perf_counter() - start) * 1000}
+
+from fastapi.testclient import TestClient
+
+client = TestClient(app.main.app)
+
+def timed(name, method, url):
+    start = time.perf_counter()
+    response = client.request(method, url)
+    timings[name] = (time.perf_counter() - start) * 1000
+    response.raise_for_status()
+    return response
+
+timed("first_index_ms", "GET", "/")
+filename = timed("sample_process_ms", "POST", f"/api/samples/{sys.argv[1]}/process").json()["filename"]
+try:
+    timed("first_graph_ms", "GET", f"/viz/graph_viewer.html?file={filename}")
+    timed("first_tree_ms", "GET", f"/viz/tree_viewer.html?file={filename}")
+finally:
+    client.delete(f"/api/files/{filename}")
+print(json.dumps(timings))
+"""
+
+
+def probe(sample, root=REPO_ROOT):
+    # A fresh DATA_DIR per run, so state left by earlier runs (history, fleet
+    # index, timelines) does not grow into the measurement. It sits next to the
+    # samples, on the same filesystem, so their variants can still be hardlinked.
+    with tempfile.TemporaryDirectory(prefix=".bench-data-", dir=root / "app" / "static") as data_dir:
+        result = subprocess.run(
+            [sys.executable, "-c", _PROBE, sample],
+            cwd=root,
+            env={**os.environ, "DATA_DIR": data_dir},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    # The app logs to stdout; the timings are the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def add_worktree(ref, path):
+    """Checks out ref at path and prebuilds it; False when the ref does not resolve."""
+    try:
+        subprocess.run(
+            ["git", "worktree", "add", "--detach", str(path), ref],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"Could not check out baseline {ref}: {getattr(e, 'stderr', e)}".strip())
+        return False
+    if (path / "scripts" / "prebuild.py").exists():
+        subprocess.run(
+            [sys.executable, "scripts/prebuild.py"], cwd=path, capture_output=True, check=True
+        )
+    return True
+
+
+def remove_worktree(path):
+    subprocess.run(
+        ["git", "worktree", "remove", "--force", str(path)], cwd=REPO_ROOT, capture_output=True
+    )
+
+
+def medians_of(runs):
+    return {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+
+
+def compare(medians, reference, tolerance, slack, label):
+    """Prints the medians against the reference ones; returns True when one regressed."""
+    failed = False
+    print(f"{'metric':<20} {'median':>10} {label:>10}")
+    for key, value in medians.items():
+        limit = reference.get(key)
+        if limit is None:
+            print(f"{key:<20} {value:8.1f}ms {'-':>10}")
+            continue
+        over = value > max(limit * (1 + tolerance), limit + slack)
+        failed = failed or over
+        status = "  REGRESSION" if over else ""
+        print(f"{key:<20} {value:8.1f}ms {limit:8.1f}ms{status}")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark import time and first-request latency")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes to measure")
+    parser.add_argument("--sample", default=SAMPLE, help="Sample file processed by the probe")
+    parser.add_argument("--budget", type=Path, default=BUDGET_FILE, help="Budget JSON file")
+    parser.add_argument("--update", action="store_true", help="Record the medians as the new budget")
+    parser.add_argument("--baseline-ref", help="Git revision measured alongside and gated against")
+    args = parser.parse_args()
+
+    budget = json.loads(args.budget.read_text()) if args.budget.exists() else {}
+    tolerance = budget.get("tolerance", 0.5)
+    slack = budget.get("slack_ms", 10)
+
+    baseline = None
+    if args.baseline_ref:
+        with tempfile.TemporaryDirectory(prefix="gdv-baseline-") as temp:
+            path = Path(temp) / "baseline"
+            if add_worktree(args.baseline_ref, path):
+                try:
+                    runs, baseline_runs = [], []
+                    # Interleaved, so drifting machine load hits both sides alike
+                    for _ in range(args.runs):
+                        runs.append(probe(args.sample))
+                        baseline_runs.append(probe(args.sample, path))
+                    baseline = medians_of(baseline_runs)
+                finally:
+                    remove_worktree(path)
+    if baseline is None:
+        runs = [probe(args.sample) for _ in range(args.runs)]
+    medians = medians_of(runs)
+
+    if args.update:
+        budget["tolerance"] = tolerance
+        budget["slack_ms"] = slack
+        budget["budgets_ms"] = {key: round(value, 1) for key, value in medians.items()}
+        args.budget.write_text(json.dumps(budget, indent=2) + "\n")
+        print(f"Budget written to {args.budget}")
+
+    if baseline is not None:
+        if compare(medians, baseline, tolerance, slack, "baseline"):
+            print(
+                f"Startup regressed by more than {tolerance:.0%} (or {slack} ms) "
+                f"over {args.baseline_ref}"
+            )
+            sys.exit(1)
+        return
+
+    # Absolute budgets depend on the machine they were recorded on: report only
+    if compare(medians, budget.get("budgets_ms", {}), tolerance, slack, "budget"):
+        print(
+            f"Some medians exceed the recorded budget by more than {tolerance:.0%} "
+            f"(or {slack} ms); use --baseline-ref to gate on this machine"
+        )
+
+
+if __name__ == "__main__":
+    main()
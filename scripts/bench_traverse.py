@@ -0,0 +1,92 @@
+"""
+Benchmarks the tree traversal functions on synthetic deep and wide trees.
+
+    uv run python scripts/bench_traverse.py
+    uv run python scripts/bench_traverse.py --depth 10000 --width 200000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import convert_to_graph, enlist, filter as filter_module  # noqa: E402
+
+
+def make_node(i):
+    module = f"com.example.lib{i % 997}:artifact{i}"
+    return {
+        "module": module,
+        "version": "1.0",
+        "resolution": "",
+        "full": f"{module}:1.0",
+        "children": [],
+    }
+
+
+def make_chain(depth):
+    """A single chain of depth nodes, like long transitive Kotlin/Android paths."""
+    root = make_node(0)
+    current = root
+    for i in range(1, depth):
+        child = make_node(i)
+        current["children"].append(child)
+        current = child
+    return [root]
+
+
+def make_wide(count, fanout=8):
+    """A breadth-heavy tree of count nodes where every node has up to fanout children."""
+    nodes = [make_node(i) for i in range(count)]
+    for i in range(1, count):
+        nodes[(i - 1) // fanout]["children"].append(nodes[i])
+    return [nodes[0]]
+
+
+def bench(label, fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            fn()
+        except RecursionError:
+            print(f"  {label:<32} RecursionError")
+            return
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"  {label:<32} {best * 1000:9.2f} ms")
+
+
+def run(name, roots):
+    print(f"{name}:")
+
+    def find():
+        kept = set()
+        filter_module.find_matches_and_relatives(roots, ["lib7:"], kept, [])
+        return kept
+
+    kept = find()
+    bench("find_matches_and_relatives", find)
+    bench("rebuild_tree", lambda: filter_module.rebuild_tree(roots, kept))
+    bench("filter_project_only", lambda: filter_module.filter_project_only(roots))
+    bench("traverse_tree", lambda: convert_to_graph.traverse_tree(roots))
+    bench(
+        "extract_dependencies_from_json",
+        lambda: enlist.extract_dependencies_from_json({"app": roots}),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tree traversal on synthetic trees")
+    parser.add_argument("--depth", type=int, default=10000, help="Length of the deep chain")
+    parser.add_argument("--width", type=int, default=100000, help="Node count of the wide tree")
+    args = parser.parse_args()
+
+    print(f"Python recursion limit: {sys.getrecursionlimit()}")
+    run(f"Chain of depth {args.depth}", make_chain(args.depth))
+    run(f"Wide tree of {args.width} nodes", make_wide(args.width))
+
+
+if __name__ == "__main__":
+    main()
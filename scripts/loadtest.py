@@ -0,0 +1,323 @@
+"""
+Load test for app.main:app: launches uvicorn on a free port with a temporary
+DATA_DIR, replays a weighted mix of viewer and API requests from concurrent
+simulated users, and reports throughput and p50/p95/p99 latency per endpoint.
+
+    uv run python scripts/loadtest.py --users 20 --duration 30
+    uv run python scripts/loadtest.py --save results/main.json
+    uv run python scripts/loadtest.py --compare results/main.json --max-regression 0.25
+    uv run python scripts/loadtest.py --url http://127.0.0.1:8000   # an already running server
+
+The files under test are the bundled samples plus a synthetic dump of
+--synthetic-lines dependency lines, uploaded during setup. Uploads in the mix
+delete their file again, so history cleanup never evicts the files under test.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SAMPLE_DIR = REPO_ROOT / "app" / "static" / "sample"
+FILTERS = [None, None, "androidx", "kotlin, okhttp", "group:androidx.* AND version<2.0"]
+ENLIST_FORMATS = ["yaml", "jsonl", "csv"]
+PERCENTILES = (50, 95, 99)
+
+
+def synthetic_dump(line_count, seed=0):
+    """A Gradle dependency dump with line_count lines over a few thousand modules."""
+    rng = random.Random(seed)
+    lines = ["", "> Task :app:dependencies", "", "releaseRuntimeClasspath - Runtime classpath of /release."]
+    depth = 0
+    for i in range(line_count):
+        # Random walk over the depth, like real transitive trees
+        depth = max(0, min(depth + rng.choice((-2, -1, 0, 1, 1)), 12))
+        group = f"com.example.group{rng.randrange(200)}"
+        artifact = f"lib-{rng.randrange(3000)}"
+        requested = f"1.{rng.randrange(10)}.{rng.randrange(5)}"
+        resolved = f" -> 1.{rng.randrange(10)}.{rng.randrange(5)}" if rng.random() < 0.2 else ""
+        marker = " (*)" if rng.random() < 0.3 else ""
+        branch = "\\--- " if i % 7 == 6 else "+--- "
+        lines.append(f"{'|    ' * depth}{branch}{group}:{artifact}:{requested}{resolved}{marker}")
+    return "\n".join(lines) + "\n"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, workers, data_dir):
+    env = {**os.environ, "DATA_DIR": str(data_dir)}
+    command = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ]
+    return subprocess.Popen(command, cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL)
+
+
+async def wait_until_up(client, timeout=30.0):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            if (await client.get("/api/files")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        if time.perf_counter() > deadline:
+            raise RuntimeError("Server did not start")
+        await asyncio.sleep(0.2)
+
+
+async def setup_files(client, synthetic_lines):
+    """Processes the samples and uploads the synthetic dump; returns the filenames."""
+    files = []
+    for sample in sorted(SAMPLE_DIR.glob("*.json")):
+        response = await client.post(f"/api/samples/{sample.name}/process")
+        response.raise_for_status()
+        files.append(response.json()["filename"])
+    if synthetic_lines:
+        dump = synthetic_dump(synthetic_lines).encode()
+        response = await client.post(
+            "/api/upload", files={"file": ("synthetic.txt", dump, "text/plain")}
+        )
+        response.raise_for_status()
+        files.append(response.json()["filename"])
+    return files
+
+
+def scenario(files, upload_body):
+    """Returns [(weight, endpoint, request function)] for the request mix."""
+
+    async def list_files(client, rng):
+        return await client.get("/api/files")
+
+    async def graph_viewer(client, rng):
+        params = {"file": rng.choice(files)}
+        query = rng.choice(FILTERS)
+        if query:
+            params["filter"] = query
+        return await client.get("/viz/graph_viewer.html", params=params)
+
+    async def tree_viewer(client, rng):
+        return await client.get("/viz/tree_viewer.html", params={"file": rng.choice(files)})
+
+    async def enlist(client, rng):
+        return await client.get(
+            f"/api/enlist/{rng.choice(files)}", params={"format": rng.choice(ENLIST_FORMATS)}
+        )
+
+    async def upload(client, rng):
+        # Stored names only carry a minute timestamp, so keep concurrent uploads apart
+        name = f"loadtest{rng.randrange(10**9)}.txt"
+        response = await client.post(
+            "/api/upload", files={"file": (name, upload_body, "text/plain")}
+        )
+        if response.status_code == 200:
+            await client.delete(f"/api/files/{response.json()['filename']}")
+        return response
+
+    return [
+        (3, "files", list_files),
+        (4, "graph_viewer", graph_viewer),
+        (3, "tree_viewer", tree_viewer),
+        (2, "enlist", enlist),
+        (1, "upload", upload),
+    ]
+
+
+async def user(client, mix, deadline, samples, seed, think):
+    rng = random.Random(seed)
+    weights = [weight for weight, _, _ in mix]
+    while time.perf_counter() < deadline:
+        _, endpoint, request = rng.choices(mix, weights)[0]
+        start = time.perf_counter()
+        try:
+            status = (await request(client, rng)).status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        samples.append((endpoint, time.perf_counter() - start, status))
+        if think:
+            await asyncio.sleep(rng.expovariate(1 / think))
+
+
+def percentile(ordered, p):
+    # Nearest rank
+    if not ordered:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(samples, elapsed):
+    endpoints = {}
+    for endpoint in sorted({s[0] for s in samples}):
+        latencies = sorted(s[1] for s in samples if s[0] == endpoint)
+        statuses = {}
+        for s in samples:
+            if s[0] == endpoint:
+                statuses[str(s[2])] = statuses.get(str(s[2]), 0) + 1
+        endpoints[endpoint] = {
+            "requests": len(latencies),
+            "rps": round(len(latencies) / elapsed, 2),
+            "statuses": statuses,
+            **{f"p{p}_ms": round(percentile(latencies, p) * 1000, 2) for p in PERCENTILES},
+            "max_ms": round(latencies[-1] * 1000, 2),
+        }
+    return {
+        "requests": len(samples),
+        "rps": round(len(samples) / elapsed, 2),
+        "errors": sum(1 for s in samples if not (isinstance(s[2], int) and s[2] < 400)),
+        "endpoints": endpoints,
+    }
+
+
+def print_summary(summary, baseline=None):
+    header = f"{'endpoint':<14} {'reqs':>6} {'rps':>8} " + " ".join(
+        f"{f'p{p}':>9}" for p in PERCENTILES
+    ) + f" {'max':>9}  statuses"
+    print(header)
+    for endpoint, stats in summary["endpoints"].items():
+        cells = " ".join(f"{stats[f'p{p}_ms']:7.1f}ms" for p in PERCENTILES)
+        statuses = ",".join(f"{k}:{v}" for k, v in sorted(stats["statuses"].items()))
+        print(
+            f"{endpoint:<14} {stats['requests']:>6} {stats['rps']:>8.1f} {cells} "
+            f"{stats['max_ms']:7.1f}ms  {statuses}"
+        )
+        previous = baseline and baseline["summary"]["endpoints"].get(endpoint)
+        if previous:
+            deltas = " ".join(
+                f"{_delta(stats[f'p{p}_ms'], previous[f'p{p}_ms']):>9}" for p in PERCENTILES
+            )
+            print(f"{'  vs baseline':<14} {'':>6} {_delta(stats['rps'], previous['rps']):>8} {deltas}")
+    print(f"total: {summary['requests']} requests, {summary['rps']:.1f} rps, {summary['errors']} errors")
+
+
+def _delta(value, previous):
+    if not previous:
+        return "-"
+    return f"{(value - previous) / previous:+.0%}"
+
+
+def regressions(summary, baseline, limit):
+    """Endpoints whose p95 latency grew by more than limit (relative) over the baseline."""
+    found = []
+    for endpoint, stats in summary["endpoints"].items():
+        previous = baseline["summary"]["endpoints"].get(endpoint)
+        if previous and previous["p95_ms"] and stats["p95_ms"] > previous["p95_ms"] * (1 + limit):
+            found.append(endpoint)
+    return found
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args):
+    server = None
+    data_dir = None
+    base_url = args.url
+    if base_url is None:
+        data_dir = tempfile.TemporaryDirectory(prefix="gdv-loadtest-")
+        port = free_port()
+        server = start_server(port, args.workers, data_dir.name)
+        base_url = f"http://127.0.0.1:{port}"
+
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            await wait_until_up(client)
+            print(f"Setting up files on {base_url}...")
+            files = await setup_files(client, args.synthetic_lines)
+            upload_body = json.loads(
+                (SAMPLE_DIR / "homeassistant_181149.json").read_text(encoding="utf-8")
+            )["raw_txt"].encode()
+            mix = scenario(files, upload_body)
+
+            print(f"Running {args.users} users for {args.duration:.0f}s over {len(files)} files...")
+            samples = []
+            start = time.perf_counter()
+            deadline = start + args.duration
+            await asyncio.gather(*(
+                user(client, mix, deadline, samples, args.seed + i, args.think)
+                for i in range(args.users)
+            ))
+            elapsed = time.perf_counter() - start
+
+            if args.url is not None:
+                for filename in files:
+                    await client.delete(f"/api/files/{filename}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+            data_dir.cleanup()
+
+    return {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "users": args.users,
+            "duration_s": args.duration,
+            "workers": args.workers,
+            "synthetic_lines": args.synthetic_lines,
+            "think_s": args.think,
+        },
+        "summary": summarize(samples, elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the viewer and API endpoints")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of load")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--synthetic-lines", type=int, default=20000, help="Lines in the synthetic dump (0 to skip)")
+    parser.add_argument("--think", type=float, default=0.0, help="Mean think time between a user's requests (s)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Request timeout (s)")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed of the request mix")
+    parser.add_argument("--url", help="Test a running server instead of launching one")
+    parser.add_argument("--save", type=Path, help="Write the results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="Results JSON of a previous run to compare with")
+    parser.add_argument("--max-regression", type=float, help="Exit 1 when a p95 grows by more than this fraction over --compare")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    print_summary(results["summary"], baseline)
+
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Results written to {args.save}")
+
+    if baseline is not None and args.max_regression is not None:
+        regressed = regressions(results["summary"], baseline, args.max_regression)
+        if regressed:
+            print(f"p95 regressed by more than {args.max_regression:.0%}: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
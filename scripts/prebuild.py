@@ -0,0 +1,43 @@
+"""
+Prepares artifacts that would otherwise be built on the first request.
+Run it at image build time so cold starts skip template compilation and
+sample indexing:
+
+    uv run python scripts/prebuild.py
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import graph_store, precompress  # noqa: E402
+from app.main import SAMPLE_DIR, TEMPLATE_CACHE_DIR, get_templates  # noqa: E402
+
+
+def compile_templates():
+    env = get_templates().env
+    if env.bytecode_cache is None:
+        print(f"Template cache directory {TEMPLATE_CACHE_DIR} is not writable, skipping")
+        return
+    for name in env.list_templates(extensions=["html"]):
+        env.get_template(name)
+        print(f"Compiled template {name}")
+
+
+def build_sample_stores():
+    for sample_path in sorted(SAMPLE_DIR.glob("*.json")):
+        start = time.perf_counter()
+        graph_store.build_store(sample_path)
+        precompress.write_variants(sample_path)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"Indexed sample {sample_path.name} in {elapsed:.0f} ms")
+
+
+def main():
+    compile_templates()
+    build_sample_stores()
+
+
+if __name__ == "__main__":
+    main()
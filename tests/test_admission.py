@@ -0,0 +1,112 @@
+import asyncio
+import json
+import threading
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import admission
+from app.main import app
+from app.telemetry import UPLOADS_REJECTED
+
+SAMPLE = Path(__file__).resolve().parent.parent / "app" / "static" / "sample" / "homeassistant_181149.json"
+
+client = TestClient(app)
+
+
+def test_pool_sheds_when_queue_is_full():
+    pool = admission.ParsePool(concurrency=1, queue_size=1, memory_budget=10**12)
+    release = threading.Event()
+
+    def parse(value):
+        release.wait(5)
+        return value
+
+    async def main():
+        first = asyncio.create_task(pool.run(100, parse, 1))
+        second = asyncio.create_task(pool.run(100, parse, 2))
+        await asyncio.sleep(0.05)
+        assert (pool.pending, pool.running) == (2, 1)
+        before = UPLOADS_REJECTED.value("queue_full")
+        with pytest.raises(admission.Overloaded) as excinfo:
+            await pool.run(100, parse, 3)
+        assert excinfo.value.retry_after >= 1
+        assert UPLOADS_REJECTED.value("queue_full") == before + 1
+        release.set()
+        return await asyncio.gather(first, second)
+
+    assert asyncio.run(main()) == [1, 2]
+    assert (pool.pending, pool.running, pool.pending_cost) == (0, 0, 0)
+
+
+def test_pool_sheds_over_memory_budget():
+    cost = admission.estimate_cost(1000)
+    pool = admission.ParsePool(concurrency=2, queue_size=4, memory_budget=cost * 3 // 2)
+    release = threading.Event()
+
+    async def main():
+        first = asyncio.create_task(pool.run(1000, release.wait, 5))
+        await asyncio.sleep(0.02)
+        with pytest.raises(admission.Overloaded):
+            await pool.run(1000, lambda: None)
+        # Small uploads still fit next to it
+        assert await pool.run(10, lambda: "small") == "small"
+        release.set()
+        await first
+
+    asyncio.run(main())
+    # An upload above the whole budget is admitted on an idle pool
+    assert asyncio.run(pool.run(10**6, lambda: "alone")) == "alone"
+
+
+def test_body_limit_rejects_declared_size(monkeypatch):
+    monkeypatch.setattr(admission, "MAX_UPLOAD_BYTES", 1000)
+    response = client.post("/api/upload", files={"file": ("big.txt", b"x" * 5000, "text/plain")})
+    assert response.status_code == 413
+    assert "1000 bytes" in response.json()["detail"]
+
+
+def test_body_limit_cuts_off_streamed_body(monkeypatch):
+    monkeypatch.setattr(admission, "MAX_UPLOAD_BYTES", 1000)
+    chunks = [{"type": "http.request", "body": b"x" * 600, "more_body": True}] * 3
+    sent = []
+
+    async def downstream(scope, receive, send):
+        while (await receive())["more_body"]:
+            pass
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def receive():
+        return chunks.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": []}
+    asyncio.run(admission.BodyLimitMiddleware(downstream)(scope, receive, send))
+    assert sent[0]["status"] == 413
+    assert len(sent) == 2 and len(chunks) == 1
+
+
+def test_upload_sheds_with_retry_after(monkeypatch):
+    pool = admission.ParsePool(concurrency=1, queue_size=0)
+    pool.pending = 1
+    monkeypatch.setattr(admission, "_pool", pool)
+    response = client.post("/api/upload", files={"file": ("deps.txt", b"+--- a:b:1.0\n", "text/plain")})
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+
+
+def test_upload_runs_on_parse_pool():
+    raw_txt = json.loads(SAMPLE.read_text(encoding="utf-8"))["raw_txt"]
+    response = client.post("/api/upload", files={"file": ("deps.txt", raw_txt.encode(), "text/plain")})
+    assert response.status_code == 200
+    try:
+        assert response.json()["json"]["app"]
+        assert "queue;dur=" in response.headers["server-timing"]
+        metrics = client.get("/metrics").text
+        assert "gdv_parse_queue_depth 0" in metrics
+        assert "gdv_parse_running 0" in metrics
+    finally:
+        client.delete(f"/api/files/{response.json()['filename']}")
@@ -1,3 +1,6 @@
+import json
+import os
+
 from fastapi.testclient import TestClient
 from app.main import app
 
@@ -12,3 +15,340 @@ def test_list_files():
     response = client.get("/api/files")
     assert response.status_code == 200
     assert isinstance(response.json(), list)
+
+def test_server_timing_header():
+    response = client.get("/viz/graph_viewer.html?file=does-not-exist.json")
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    assert "serialize;dur=" in timing
+    assert "render;dur=" in timing
+    assert "total;dur=" in timing
+
+def test_metrics():
+    client.get("/api/files")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'gdv_request_duration_seconds_count{endpoint="list_files"}' in response.text
+
+def test_graph_api_distance_and_exclude():
+    response = client.post("/api/samples/homeassistant_181149.json/process")
+    filename = response.json()["filename"]
+    try:
+        full = client.get(f"/api/graph/{filename}").json()
+        shallow = client.get(f"/api/graph/{filename}?distance=1").json()
+        assert 0 < shallow["metadata"]["total_nodes"] < full["metadata"]["total_nodes"]
+        ids = {n["id"] for n in shallow["nodes"]}
+        assert all(e["source"] in ids and e["target"] in ids for e in shallow["edges"])
+
+        excluded = client.get(f"/api/graph/{filename}?exclude=androidx").json()
+        assert all("androidx" not in n["id"] for n in excluded["nodes"])
+
+        response = client.get(f"/viz/graph_viewer.html?file={filename}&distance=1")
+        assert response.status_code == 200
+    finally:
+        client.delete(f"/api/files/{filename}")
+
+def test_graph_api_missing_file():
+    response = client.get("/api/graph/does-not-exist.json")
+    assert response.status_code == 404
+
+def test_enlist_formats_and_set_operations():
+    first = client.post("/api/samples/homeassistant_181149.json/process").json()["filename"]
+    second = client.post("/api/samples/signal-android_181249.json/process").json()["filename"]
+    try:
+        response = client.get(f"/api/enlist/{first}?format=csv")
+        assert response.status_code == 200
+        assert response.text.startswith("module,version\n")
+
+        union = client.get(f"/api/enlist?files={first}&files={second}&op=union&format=jsonl")
+        both = client.get(f"/api/enlist?files={first}&files={second}&op=intersection&format=jsonl")
+        assert len(both.text.splitlines()) < len(union.text.splitlines())
+
+        response = client.get(f"/api/enlist?files={first}&files=missing.json")
+        assert response.status_code == 404
+
+        response = client.get(f"/api/graph/{first}/export?format=dot&distance=1")
+        assert response.status_code == 200
+        assert response.text.startswith("digraph")
+    finally:
+        client.delete(f"/api/files/{first}")
+        client.delete(f"/api/files/{second}")
+
+def test_process_sample_clones_prebuilt_store():
+    from app import graph_store, precompress
+    from app.main import DATA_DIR, SAMPLE_DIR
+
+    sample = SAMPLE_DIR / "homeassistant_181149.json"
+    graph_store.build_store(sample)
+    precompress.write_variants(sample)
+    before = {
+        path: os.stat(path).st_mtime_ns
+        for path in [sample, *(p for p, _ in graph_store.iter_derived(sample))]
+    }
+    filename = client.post(f"/api/samples/{sample.name}/process").json()["filename"]
+    dest = DATA_DIR / filename
+    try:
+        assert not os.path.samefile(dest, sample)
+        assert graph_store.is_current(dest)
+        # The store is cloned and the variants reused, not rebuilt or recompressed
+        header = graph_store._HEADER.size
+        assert (
+            graph_store.store_path_for(dest).read_bytes()[header:]
+            == graph_store.store_path_for(sample).read_bytes()[header:]
+        )
+        variant = precompress.variant_path(dest, "gzip")
+        assert variant.read_bytes() == precompress.variant_path(sample, "gzip").read_bytes()
+        assert client.get(f"/api/graph/{filename}").status_code == 200
+    finally:
+        client.delete(f"/api/files/{filename}")
+    # The sample directory is only read
+    after = {
+        path: os.stat(path).st_mtime_ns
+        for path in [sample, *(p for p, _ in graph_store.iter_derived(sample))]
+    }
+    assert after == before and graph_store.is_current(sample)
+
+def test_search_typeahead():
+    filename = client.post("/api/samples/homeassistant_181149.json/process").json()["filename"]
+    try:
+        results = client.get(f"/api/search/{filename}?q=okhttp&limit=3").json()["results"]
+        assert 0 < len(results) <= 3
+        assert results[0]["module"].endswith(":okhttp")
+        assert results[0]["count"] > 0 and results[0]["versions"]
+
+        fuzzy = client.get(f"/api/search/{filename}?q=corutines").json()["results"]
+        assert fuzzy and all("coroutines" in r["module"] for r in fuzzy)
+        assert client.get(f"/api/search/{filename}?q=").json()["results"] == []
+        assert client.get(f"/api/search/{filename}?q=a&limit=0").status_code == 422
+    finally:
+        client.delete(f"/api/files/{filename}")
+
+def test_footprint_api():
+    filename = client.post("/api/samples/homeassistant_181149.json/process").json()["filename"]
+    try:
+        report = client.get(f"/api/footprint/{filename}?sort=fan_in&limit=5").json()
+        assert len(report["nodes"]) == 5
+        assert report["nodes"][0]["fan_in"] >= report["nodes"][-1]["fan_in"]
+        assert client.get(f"/api/footprint/{filename}?sort=bogus").status_code == 400
+    finally:
+        client.delete(f"/api/files/{filename}")
+
+def test_dominators_api():
+    filename = client.post("/api/samples/homeassistant_181149.json/process").json()["filename"]
+    try:
+        top = client.get(f"/api/dominators/{filename}?limit=3").json()["nodes"]
+        assert len(top) == 3 and top[0]["exclusive"] >= top[-1]["exclusive"]
+        dropped = client.get(f"/api/dominators/{filename}", params={"node": top[0]["id"]}).json()
+        assert dropped["exclusive"] == top[0]["exclusive"] == len(dropped["dominated"])
+        assert client.get(f"/api/dominators/{filename}?node=missing").status_code == 404
+    finally:
+        client.delete(f"/api/files/{filename}")
+
+def test_fleet_query():
+    filename = client.post("/api/samples/homeassistant_181149.json/process").json()["filename"]
+    try:
+        response = client.get("/api/fleet", params={"module": "com.squareup.okhttp3:*", "versions": "[5.0,6.0)"})
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert any(filename in [f["filename"] for f in r["files"]] for r in results)
+        assert all(r["version"].startswith("5.") for r in results)
+        assert client.get("/api/fleet", params={"module": "x", "versions": "[1.0"}).status_code == 400
+    finally:
+        client.delete(f"/api/files/{filename}")
+    results = client.get("/api/fleet", params={"module": "com.squareup.okhttp3:*"}).json()["results"]
+    assert all(filename not in [f["filename"] for f in r["files"]] for r in results)
+
+def test_data_files_are_precompressed_with_etags():
+    from app.main import DATA_DIR
+
+    filename = client.post("/api/samples/homeassistant_181149.json/process").json()["filename"]
+    try:
+        response = client.get(f"/static/data/{filename}", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["cache-control"] == "no-cache"
+        assert int(response.headers["content-length"]) * 10 < (DATA_DIR / filename).stat().st_size
+        assert response.json() == json.loads((DATA_DIR / filename).read_text(encoding="utf-8"))
+
+        etag = response.headers["etag"]
+        repeat = client.get(f"/static/data/{filename}", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        assert repeat.status_code == 304
+        assert repeat.headers["etag"] == etag
+
+        plain = client.get(f"/static/data/{filename}", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in plain.headers
+        assert plain.headers["etag"] != etag
+        assert client.get("/static/data/missing.json").status_code == 404
+    finally:
+        client.delete(f"/api/files/{filename}")
+
+def test_graph_api_filter_query():
+    filename = client.post("/api/samples/homeassistant_181149.json/process").json()["filename"]
+    try:
+        response = client.get(f"/api/graph/{filename}", params={"filter": "group:androidx.* AND NOT version<1.0"})
+        assert response.status_code == 200
+        assert response.json()["metadata"]["total_nodes"] > 0
+
+        response = client.get(f"/api/graph/{filename}", params={"filter": "(androidx"})
+        assert response.status_code == 400
+        assert "Invalid filter" in response.json()["detail"]
+    finally:
+        client.delete(f"/api/files/{filename}")
+
+def _sse_events(text):
+    events = []
+    for message in text.strip().split("\n\n"):
+        event, data = message.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+def test_graph_stream():
+    filename = client.post("/api/samples/homeassistant_181149.json/process").json()["filename"]
+    try:
+        full = client.get(f"/api/graph/{filename}").json()
+        response = client.get(f"/api/graph/{filename}/stream?batch=200")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = _sse_events(response.text)
+        assert events[0] == ("meta", {"total_nodes": full["metadata"]["total_nodes"]})
+        assert events[-1] == ("done", full["metadata"])
+        assert {e for e, _ in events[1:-1]} == {"batch"}
+
+        filtered = _sse_events(client.get(f"/api/graph/{filename}/stream", params={"filter": "okhttp"}).text)
+        assert 0 < filtered[-1][1]["total_nodes"] < full["metadata"]["total_nodes"]
+
+        response = client.get(f"/viz/graph_viewer.html?file={filename}&stream=true&distance=2")
+        assert f'"/api/graph/{filename}/stream?distance=2"' in response.text
+        response = client.get(f"/viz/graph_viewer.html?file={filename}&stream=false")
+        assert "const streamUrl = null;" in response.text
+    finally:
+        client.delete(f"/api/files/{filename}")
+
+
+def test_graph_ego():
+    filename = client.post("/api/samples/homeassistant_181149.json/process").json()["filename"]
+    try:
+        response = client.get(f"/api/graph/{filename}/ego", params={"node": "root:", "direction": "down"})
+        assert response.status_code == 200
+        ego = response.json()
+        assert ego["center"] == "root:"
+        assert {n["distance"] for n in ego["nodes"]} == {0, 1}
+        assert all(e["source"] == "root:" for e in ego["edges"])
+
+        assert client.get(f"/api/graph/{filename}/ego", params={"node": "nope"}).status_code == 404
+        assert client.get(
+            f"/api/graph/{filename}/ego", params={"node": "root:", "direction": "sideways"}
+        ).status_code == 400
+
+        response = client.get(f"/viz/graph_viewer.html?file={filename}&node=root:&hops=2")
+        assert f'"/api/graph/{filename}/ego?node=root%3A\\u0026hops=2\\u0026direction=both"' in response.text
+        assert "const serverGraphData = null;" in response.text
+    finally:
+        client.delete(f"/api/files/{filename}")
+
+
+def test_timeline(tmp_path, monkeypatch):
+    from app import main
+
+    monkeypatch.setattr(main, "DATA_DIR", tmp_path)
+    first = client.post("/api/samples/homeassistant_181149.json/process").json()["filename"]
+    client.delete(f"/api/files/{first}")
+    client.post("/api/samples/homeassistant_181149.json/process")
+
+    projects = client.get("/api/timeline").json()["projects"]
+    assert [(p["project"], p["snapshots"]) for p in projects] == [("app", 2)]
+
+    history = client.get("/api/timeline/app", params={"module": "com.squareup.okhttp3:*"}).json()
+    assert history["snapshots"][1]["added_nodes"] == 0
+    assert history["versions"] and all(
+        v["present"] == [{"entered": {"seq": 0, "at": history["snapshots"][0]["at"]}, "left": None}]
+        for v in history["versions"]
+    )
+
+    # The deleted file's snapshot is still in the timeline
+    snapshot = client.get("/api/timeline/app/0").json()
+    assert snapshot["metadata"]["source"] == first
+    assert client.get("/api/timeline/app/5").status_code == 404
+    assert client.get("/api/timeline/other").status_code == 404
+
+
+def test_skew_report(tmp_path, monkeypatch):
+    from app import main
+
+    monkeypatch.setattr(main, "DATA_DIR", tmp_path)
+    client.post("/api/samples/homeassistant_181149.json/process")
+    report = client.get("/api/skew", params={"min_versions": 1, "module": "com.squareup.okhttp3:*"}).json()
+    assert report["scope"] == "projects"
+    assert [s["project"] for s in report["snapshots"]] == ["app"]
+    assert report["modules"] and all(m["spread"] == 1 for m in report["modules"])
+    assert client.get("/api/skew").json()["skewed_modules"] == 0
+    assert client.get("/api/skew", params={"scope": "teams"}).status_code == 400
+
+
+def test_overlay():
+    first = client.post("/api/samples/homeassistant_181149.json/process").json()["filename"]
+    try:
+        full = client.get(f"/api/graph/{first}").json()
+        response = client.get("/api/overlay", params=[("files", first), ("files", first)])
+        assert response.status_code == 200
+        overlay = response.json()
+        assert overlay["snapshots"] == [first, first]
+        assert overlay["metadata"]["total_nodes"] == full["metadata"]["total_nodes"]
+        assert {n["mask"] for n in overlay["nodes"]} == {0b11}
+
+        subset = client.get("/api/overlay", params=[("files", first), ("files", first), ("subset", "1")]).json()
+        assert subset["metadata"]["total_edges"] == full["metadata"]["total_edges"]
+        assert client.get("/api/overlay", params=[("files", first), ("subset", "3")]).status_code == 400
+        assert client.get("/api/overlay", params=[("files", first), ("match", "most")]).status_code == 400
+        assert client.get("/api/overlay", params=[("files", "missing.json")]).status_code == 404
+
+        response = client.get("/viz/graph_viewer.html", params=[("overlay", first), ("overlay", first)])
+        assert f'"/api/overlay?files={first}\\u0026files={first}"' in response.text
+    finally:
+        client.delete(f"/api/files/{first}")
+
+
+def test_upload_maven_dump(tmp_path, monkeypatch):
+    from app import main
+    from tests.test_dialects import MAVEN_DUMP
+
+    monkeypatch.setattr(main, "DATA_DIR", tmp_path)
+    response = client.post(
+        "/api/upload", files={"file": ("service.txt", "".join(MAVEN_DUMP).encode(), "text/plain")}
+    )
+    assert response.status_code == 200
+    filename = response.json()["filename"]
+    graph = client.get(f"/api/graph/{filename}").json()
+    ids = {node["id"] for node in graph["nodes"]}
+    assert "junit:junit:4.13.2" in ids and "org.yaml:snakeyaml:2.0" in ids
+
+
+def test_upload_chain_deeper_than_the_recursion_limit(tmp_path, monkeypatch):
+    import sys
+
+    from app import main
+    from app.traverse import loads
+
+    monkeypatch.setattr(main, "DATA_DIR", tmp_path)
+    depth = sys.getrecursionlimit() * 2
+    lines = ["com.example:deep:jar:1.0\n"]
+    lines += ["|  " * i + f"\\- com.example:m{i}:jar:1.0:compile\n" for i in range(depth)]
+    response = client.post(
+        "/api/upload", files={"file": ("deep.txt", "".join(lines).encode(), "text/plain")}
+    )
+    assert response.status_code == 200
+    body = loads(response.text)
+    node = body["json"]["deep"][0]
+    levels = 1
+    while node["children"]:
+        node = node["children"][0]
+        levels += 1
+    assert levels == depth
+
+    filename = body["filename"]
+    graph = client.get(f"/api/graph/{filename}").json()
+    assert graph["metadata"]["total_nodes"] == depth + 1
+    tree_page = client.get(f"/viz/tree_viewer.html?file={filename}")
+    assert tree_page.status_code == 200
+    assert f"com.example:m{depth - 1}" in tree_page.text
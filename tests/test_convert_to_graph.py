@@ -0,0 +1,97 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from app import convert_to_graph
+
+SAMPLE = Path(__file__).resolve().parent.parent / "app" / "static" / "sample" / "homeassistant_181149.json"
+
+
+def _legacy(dependency_data, distance=None, exclude=None):
+    graph_nodes, edges = convert_to_graph.build_graph(dependency_data)
+    if exclude:
+        graph_nodes, edges = convert_to_graph.filter_graph_by_exclude(graph_nodes, edges, exclude)
+    if distance is not None:
+        graph_nodes, edges = convert_to_graph.filter_graph_by_distance(graph_nodes, edges, distance)
+    return convert_to_graph.convert_to_graph_format(graph_nodes, edges)
+
+
+def _normalize(graph_data):
+    edges = sorted((e["source"], e["target"]) for e in graph_data["edges"])
+    return graph_data["nodes"], edges, graph_data["metadata"]
+
+
+@pytest.mark.parametrize("distance", [None, 0, 1, 2, 4])
+@pytest.mark.parametrize("exclude", [None, "androidx", "kotlin"])
+def test_process_data_matches_legacy_filters(distance, exclude):
+    dependency_data = json.loads(SAMPLE.read_text(encoding="utf-8"))
+    expected = _legacy(dependency_data, distance, exclude)
+    actual = convert_to_graph.process_data(dependency_data, distance=distance, exclude=exclude)
+    assert _normalize(actual) == _normalize(expected)
+
+
+def test_compute_levels():
+    dependency_data = {"app": [
+        {"module": "a", "version": "1", "children": [
+            {"module": "b", "version": "1", "children": []},
+        ]},
+        {"module": "b", "version": "1", "children": []},
+    ]}
+    graph_nodes, _ = convert_to_graph.build_graph(dependency_data)
+    levels = convert_to_graph.compute_levels(graph_nodes)
+    assert levels == {"root:": 0, "a:1": 1, "b:1": 2}
+
+
+def _ids(graph_data):
+    return (
+        sorted(n["id"] for n in graph_data["nodes"]),
+        sorted((e["source"], e["target"]) for e in graph_data["edges"]),
+    )
+
+
+def test_overlay_masks_and_subsets(tmp_path):
+    from app import graph_store
+
+    first = json.loads(SAMPLE.read_text(encoding="utf-8"))
+    second = {"lib": [
+        {"module": "androidx.core:core-ktx", "version": "1.10.1", "children": [
+            {"module": "only:lib", "version": "1", "children": []},
+        ]},
+    ]}
+    overlay = convert_to_graph.new_overlay()
+    convert_to_graph.overlay_add_tree(overlay, "app", first)
+    convert_to_graph.overlay_add_tree(overlay, "lib", second)
+
+    # Each snapshot on its own is exactly its process_data graph
+    for position, data in enumerate([first, second]):
+        subset = convert_to_graph.overlay_format(overlay, [position])
+        assert _ids(subset) == _ids(convert_to_graph.process_data(data))
+
+    merged = convert_to_graph.overlay_format(overlay)
+    masks = {n["id"]: n["mask"] for n in merged["nodes"]}
+    assert masks["only:lib:1"] == 0b10
+    assert masks["root:"] == 0b11
+    shared = convert_to_graph.overlay_format(overlay, [0, 1], match="all")
+    assert {n["id"] for n in shared["nodes"]} == {n for n, m in masks.items() if m == 0b11}
+    assert all(e["mask"] == 0b11 for e in shared["edges"])
+    assert merged["snapshots"] == ["app", "lib"]
+
+    # Merging from mapped stores gives the same overlay
+    path = tmp_path / "app.json"
+    path.write_text(json.dumps(first), encoding="utf-8")
+    graph_store.build_store(path)
+    from_store = convert_to_graph.new_overlay()
+    convert_to_graph.overlay_add_store(from_store, "app", graph_store.MappedStore(graph_store.store_path_for(path)))
+    assert _ids(convert_to_graph.overlay_format(from_store)) == _ids(convert_to_graph.overlay_format(overlay, [0]))
+
+    with pytest.raises(ValueError):
+        convert_to_graph.overlay_format(overlay, [2])
+
+
+def test_overlay_snapshot_limit():
+    overlay = convert_to_graph.new_overlay()
+    for i in range(convert_to_graph.MAX_OVERLAY_SNAPSHOTS):
+        convert_to_graph.overlay_add_tree(overlay, str(i), {"app": []})
+    with pytest.raises(ValueError):
+        convert_to_graph.overlay_add_tree(overlay, "one too many", {"app": []})
@@ -0,0 +1,92 @@
+import pytest
+
+from app import dialects, parse
+
+MAVEN_DUMP = """[INFO] Scanning for projects...
+[INFO]
+[INFO] --- maven-dependency-plugin:3.6.0:tree (default-cli) @ my-app ---
+[INFO] com.example:my-app:jar:1.0-SNAPSHOT
+[INFO] +- org.springframework.boot:spring-boot-starter-web:jar:3.1.0:compile
+[INFO] |  +- org.springframework.boot:spring-boot-starter:jar:3.1.0:compile
+[INFO] |  |  \\- (org.yaml:snakeyaml:jar:1.33:compile - omitted for conflict with 2.0)
+[INFO] |  \\- org.springframework:spring-webmvc:jar:6.0.9:compile
+[INFO] +- io.netty:netty-transport-native-epoll:jar:linux-x86_64:4.1.94.Final:runtime (optional)
+[INFO] \\- junit:junit:jar:4.13.2:test
+[INFO]    \\- org.hamcrest:hamcrest-core:jar:1.3:test
+[INFO] ------------------------------------------------------------------------
+[INFO] BUILD SUCCESS
+""".splitlines(True)
+
+GRADLE_DUMP = """Project ':app'
+debugRuntimeClasspath - Runtime classpath
++--- org.jetbrains.kotlin:kotlin-stdlib:1.9.0
+|    \\--- org.jetbrains:annotations:13.0
+\\--- com.squareup.okhttp3:okhttp:4.11.0
+""".splitlines(True)
+
+
+def test_detect():
+    assert dialects.detect(MAVEN_DUMP).name == "maven"
+    assert dialects.detect(GRADLE_DUMP).name == "gradle"
+    assert dialects.detect(["nothing here\n"]).name == "gradle"
+
+
+def test_maven_tree():
+    roots = parse.parse_dependencies(MAVEN_DUMP, "maven")
+    assert parse.extract_project_name(MAVEN_DUMP, "maven") == "my-app"
+    assert [(n["module"], n["version"]) for n in roots] == [
+        ("org.springframework.boot:spring-boot-starter-web", "3.1.0"),
+        ("io.netty:netty-transport-native-epoll", "4.1.94.Final"),
+        ("junit:junit", "4.13.2"),
+    ]
+    web = roots[0]["children"]
+    assert [n["module"] for n in web] == [
+        "org.springframework.boot:spring-boot-starter", "org.springframework:spring-webmvc",
+    ]
+    omitted = web[0]["children"][0]
+    # Conflict losers resolve to the winning version, like Gradle's '->'
+    assert (omitted["version"], omitted["resolution"]) == ("2.0", "*")
+    assert omitted["full"] == "org.yaml:snakeyaml:jar:1.33:compile - omitted for conflict with 2.0"
+    assert roots[2]["children"][0]["module"] == "org.hamcrest:hamcrest-core"
+
+
+def test_maven_output_file_without_prefix():
+    lines = [line.replace("[INFO] ", "", 1) for line in MAVEN_DUMP[3:]]
+    assert parse.extract_project_name(lines, "maven") == "my-app"
+    assert len(parse.parse_dependencies(lines, "maven")) == 3
+
+
+def test_gradle_unchanged():
+    roots = parse.parse_dependencies(GRADLE_DUMP)
+    assert parse.extract_project_name(GRADLE_DUMP) == "app"
+    assert [n["module"] for n in roots] == ["org.jetbrains.kotlin:kotlin-stdlib", "com.squareup.okhttp3:okhttp"]
+    assert roots[0]["children"][0]["version"] == "13.0"
+
+
+def test_register_rejects_incomplete_dialects():
+    class NoProject(dialects.Dialect):
+        name = "incomplete"
+
+        def starts_tree(self, line):
+            return False
+
+        def parse_line(self, line):
+            return None, -1
+
+        def is_tree_line(self, line):
+            return False
+
+    with pytest.raises(TypeError):
+        dialects.register(NoProject())
+    with pytest.raises(TypeError):
+        dialects.register(NoProject)
+
+    class Unnamed(NoProject):
+        name = None
+
+        def project_name(self, lines):
+            return "root"
+
+    with pytest.raises(TypeError):
+        dialects.register(Unnamed())
+    assert "incomplete" not in dialects.DIALECTS
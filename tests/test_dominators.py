@@ -0,0 +1,60 @@
+import json
+from array import array
+from pathlib import Path
+
+import pytest
+
+from app import convert_to_graph, graph_store
+from app.dominators import Dominators, dominator_report, graph_dominators, store_dominators
+
+SAMPLE_DIR = Path(__file__).resolve().parent.parent / "app" / "static" / "sample"
+
+
+def _csr(adjacency):
+    offsets = array("I", [0])
+    targets = array("I")
+    for children in adjacency:
+        targets.extend(children)
+        offsets.append(len(targets))
+    return offsets, targets
+
+
+def test_diamond():
+    # 0 -> 1 -> {2, 3} -> 4 -> 5, and 0 -> 3
+    successors = [[1, 3], [2, 3], [4], [4], [5], []]
+    predecessors = [[], [0], [1], [0, 1], [2, 3], [4]]
+    dominators = Dominators(6, *_csr(successors), *_csr(predecessors), 0)
+    assert list(dominators.idom) == [0, 0, 1, 0, 0, 4]
+    assert list(dominators.exclusive) == [5, 1, 0, 0, 1, 0]
+    assert dominators.dominated(4) == [5]
+
+
+@pytest.mark.parametrize("name", sorted(p.name for p in SAMPLE_DIR.glob("*.json")))
+def test_dominated_nodes_disappear_when_dropped(tmp_path, name):
+    json_path = tmp_path / name
+    json_path.write_text((SAMPLE_DIR / name).read_text(encoding="utf-8"), encoding="utf-8")
+    graph_store.build_store(json_path)
+    store = graph_store.MappedStore(graph_store.store_path_for(json_path))
+    dominators = store_dominators(store)
+
+    def reachable(dropped):
+        seen = {store.root_node}
+        stack = [store.root_node]
+        while stack:
+            for child in store.children_of(stack.pop()):
+                if child != dropped and child not in seen:
+                    seen.add(child)
+                    stack.append(child)
+        return seen
+
+    everything = reachable(None)
+    for node in list(everything)[::7]:
+        if node != store.root_node:
+            assert set(dominators.dominated(node)) == everything - reachable(node) - {node}
+
+    # The dict-based graph of convert_to_graph gives the same report
+    graph_nodes, _ = convert_to_graph.build_graph(json.loads(json_path.read_text()))
+    node_ids = [store.string(sid) for sid in store.node_id]
+    expected = {n["id"]: n["exclusive"] for n in dominator_report(node_ids, dominators)["nodes"]}
+    actual = {n["id"]: n["exclusive"] for n in dominator_report(*graph_dominators(graph_nodes))["nodes"]}
+    assert actual == expected
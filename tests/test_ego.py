@@ -0,0 +1,69 @@
+from pathlib import Path
+
+import pytest
+
+from app import convert_to_graph, graph_store
+from app.ego import ego_graph, neighborhood
+
+SAMPLE_DIR = Path(__file__).resolve().parent.parent / "app" / "static" / "sample"
+SAMPLE = "homeassistant_181149.json"
+
+
+@pytest.fixture(scope="module")
+def stored(tmp_path_factory):
+    json_path = tmp_path_factory.mktemp("ego") / SAMPLE
+    json_path.write_text((SAMPLE_DIR / SAMPLE).read_text(encoding="utf-8"), encoding="utf-8")
+    graph_store.build_store(json_path)
+    store = graph_store.MappedStore(graph_store.store_path_for(json_path))
+    full = convert_to_graph.process_data(store.tree_data())
+    return store, full
+
+
+def _reference(full, center, hops, direction):
+    # Plain BFS over the process_data edge list
+    neighbours = {}
+    for edge in full["edges"]:
+        if direction in ("down", "both"):
+            neighbours.setdefault(edge["source"], set()).add(edge["target"])
+        if direction in ("up", "both"):
+            neighbours.setdefault(edge["target"], set()).add(edge["source"])
+    distances = {center: 0}
+    frontier = [center]
+    for distance in range(1, hops + 1):
+        next_frontier = []
+        for current in frontier:
+            for n in neighbours.get(current, ()):
+                if n not in distances:
+                    distances[n] = distance
+                    next_frontier.append(n)
+        frontier = next_frontier
+    return distances
+
+
+@pytest.mark.parametrize("direction", ["up", "down", "both"])
+@pytest.mark.parametrize("hops", [0, 1, 2])
+def test_matches_full_graph(stored, direction, hops):
+    store, full = stored
+    center = max(full["nodes"], key=lambda n: sum(e["target"] == n["id"] for e in full["edges"]))["id"]
+    ego = ego_graph(store, center, hops, direction)
+    expected = _reference(full, center, hops, direction)
+    assert {n["id"]: n["distance"] for n in ego["nodes"]} == expected
+    assert {(e["source"], e["target"]) for e in ego["edges"]} == {
+        (e["source"], e["target"]) for e in full["edges"]
+        if e["source"] in expected and e["target"] in expected
+    }
+    assert ego["center"] == center and ego["metadata"]["truncated"] is False
+
+
+def test_counts_and_truncation(stored):
+    store, full = stored
+    ego = ego_graph(store, graph_store.ROOT_ID, 1, "down")
+    root = next(n for n in ego["nodes"] if n["id"] == graph_store.ROOT_ID)
+    assert root["parent_count"] == 0
+    assert root["child_count"] == len(ego["nodes"]) - 1
+
+    distances, truncated = neighborhood(store, store.root_node, 10, "down", max_nodes=5)
+    assert truncated and len(distances) == 5
+    assert ego_graph(store, "no:such:node") is None
+    with pytest.raises(ValueError):
+        neighborhood(store, store.root_node, 1, "sideways")
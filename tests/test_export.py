@@ -0,0 +1,63 @@
+import json
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import yaml
+
+from app import convert_to_graph, enlist, export
+
+SAMPLE_DIR = Path(__file__).resolve().parent.parent / "app" / "static" / "sample"
+
+
+def _sample(name):
+    return json.loads((SAMPLE_DIR / name).read_text(encoding="utf-8"))
+
+
+def test_enlist_yaml_matches_yaml_dump():
+    for sample in SAMPLE_DIR.glob("*.json"):
+        dependencies = enlist.extract_dependencies_from_json(_sample(sample.name))
+        dependencies += ["12:30:1", "odd value: x"]
+        expected = yaml.dump(
+            {"dependencies": dependencies, "total_count": len(dependencies)},
+            default_flow_style=False,
+            sort_keys=False,
+        )
+        assert "".join(export.iter_enlist_yaml(dependencies)) == expected
+
+
+def test_enlist_yaml_empty():
+    expected = yaml.dump({"dependencies": [], "total_count": 0}, sort_keys=False)
+    assert "".join(export.iter_enlist_yaml([])) == expected
+
+
+def test_enlist_csv_and_jsonl():
+    dependencies = ["a:b:1.0", "c:d:2.0"]
+    assert "".join(export.iter_enlist_csv(dependencies)) == "module,version\na:b,1.0\nc:d,2.0\n"
+    records = [json.loads(line) for line in export.iter_enlist_jsonl(dependencies)]
+    assert records == [{"module": "a:b", "version": "1.0"}, {"module": "c:d", "version": "2.0"}]
+
+
+def test_combine_dependencies():
+    lists = [["a", "b", "c"], ["b", "c", "d"], ["c"]]
+    assert enlist.combine_dependencies(lists, "union") == ["a", "b", "c", "d"]
+    assert enlist.combine_dependencies(lists, "intersection") == ["c"]
+    assert enlist.combine_dependencies(lists, "difference") == ["a"]
+
+
+def test_graph_writers_round_trip():
+    graph_data = convert_to_graph.process_data(_sample("homeassistant_181149.json"))
+    edges = [(e["source"], e["target"]) for e in graph_data["edges"]]
+
+    streamed = json.loads("".join(export.iter_graph_json(graph_data["nodes"], edges)))
+    assert streamed == graph_data
+
+    root = ET.fromstring("".join(export.iter_graph_graphml(graph_data["nodes"], edges)))
+    ns = {"g": "http://graphml.graphdrawing.org/xmlns"}
+    assert len(root.findall(".//g:node", ns)) == len(graph_data["nodes"])
+    assert len(root.findall(".//g:edge", ns)) == len(edges)
+
+    dot = "".join(export.iter_graph_dot(graph_data["nodes"], edges))
+    assert dot.startswith("digraph") and dot.count(" -> ") == len(edges)
+
+    lines = list(export.iter_graph_jsonl(graph_data["nodes"], edges))
+    assert len(lines) == len(graph_data["nodes"]) + len(edges)
@@ -0,0 +1,106 @@
+import json
+import multiprocessing
+import os
+
+import pytest
+
+from app import fleet, graph_store
+
+
+def _store_file(data_dir, name, modules):
+    nodes = [
+        {"module": module, "version": version, "resolution": "", "full": f"{module}:{version}", "children": []}
+        for module, version in modules
+    ]
+    path = data_dir / name
+    path.write_text(json.dumps({"app": nodes}), encoding="utf-8")
+    graph_store.build_store(path)
+    return path
+
+
+def _open(path):
+    return graph_store.MappedStore(graph_store.store_path_for(path))
+
+
+@pytest.mark.parametrize("text, inside, outside", [
+    ("[1.0,2.0)", ["1.0", "1.2.17", "1.99"], ["0.9", "2.0", "2.0.1"]),
+    ("(,1.2.17]", ["1.0", "1.2.17"], ["1.2.18", "2.0"]),
+    ("[1.5]", ["1.5", "1.5.0"], ["1.5.1"]),
+    (">=1.0,<2.0", ["1.0", "1.9-rc1"], ["0.9", "2.0"]),
+    ("1.*", ["1.0", "1.2.17"], ["2.0", "10.0"]),
+    ("1.2.17", ["1.2.17"], ["1.2.16"]),
+])
+def test_parse_version_range(text, inside, outside):
+    matches = fleet.parse_version_range(text)
+    assert all(matches(v) for v in inside)
+    assert not any(matches(v) for v in outside)
+
+
+def test_incremental_index_and_query(tmp_path):
+    first = _store_file(tmp_path, "a.json", [("log4j:log4j", "1.2.17"), ("log4j:log4j", "1.2.17"), ("com.google:guava", "31.1")])
+    second = _store_file(tmp_path, "b.json", [("org.apache.logging.log4j:log4j-core", "2.17.1")])
+    fleet.add_file(first, _open(first))
+    fleet.add_file(second, _open(second))
+
+    index = json.loads(fleet.index_path(tmp_path).read_text())
+    results = fleet.query(index, "log4j:log4j", "[1.0,2.0)")
+    assert results == [{
+        "module": "log4j:log4j",
+        "version": "1.2.17",
+        "files": [{"filename": "a.json", "count": 2}],
+        "total_count": 2,
+    }]
+    assert [r["module"] for r in fleet.query(index, "*log4j*")] == ["log4j:log4j", "org.apache.logging.log4j:log4j-core"]
+
+    fleet.remove_file(first)
+    index = json.loads(fleet.index_path(tmp_path).read_text())
+    assert fleet.query(index, "log4j:log4j") == []
+    assert "com.google:guava" not in index["postings"]
+
+
+def test_sync_picks_up_changes(tmp_path):
+    first = _store_file(tmp_path, "a.json", [("log4j:log4j", "1.2.17")])
+    index = fleet.sync(tmp_path, _open)
+    assert set(index["files"]) == {"a.json"}
+
+    os.remove(first)
+    _store_file(tmp_path, "c.json", [("log4j:log4j", "1.2.16")])
+    index = fleet.sync(tmp_path, _open)
+    assert set(index["files"]) == {"c.json"}
+    assert [r["version"] for r in fleet.query(index, "log4j:log4j")] == ["1.2.16"]
+
+
+def _add_files(paths):
+    for path in paths:
+        fleet.add_file(path, _open(path))
+
+
+@pytest.mark.skipif(fleet.fcntl is None, reason="needs fcntl")
+def test_concurrent_processes_keep_every_update(tmp_path):
+    paths = [_store_file(tmp_path, f"f{i}.json", [("a:b", str(i))]) for i in range(40)]
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_add_files, args=(paths[i::4],)) for i in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    index = json.loads(fleet.index_path(tmp_path).read_text())
+    assert set(index["files"]) == {path.name for path in paths}
+    assert len(index["postings"]["a:b"]) == 40
+
+
+def test_remove_from_index_without_keys(tmp_path):
+    first = _store_file(tmp_path, "a.json", [("log4j:log4j", "1.2.17"), ("com.google:guava", "31.1")])
+    second = _store_file(tmp_path, "b.json", [("log4j:log4j", "1.2.17")])
+    _add_files([first, second])
+    path = fleet.index_path(tmp_path)
+    index = json.loads(path.read_text())
+    del index["keys"]
+    path.write_text(json.dumps(index))
+
+    fleet.remove_file(first)
+    index = json.loads(path.read_text())
+    assert index["postings"] == {"log4j:log4j": {"1.2.17": {"b.json": 1}}}
+    assert index["keys"] == {"b.json": [["log4j:log4j", "1.2.17"]]}
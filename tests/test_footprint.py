@@ -0,0 +1,63 @@
+import json
+from array import array
+from pathlib import Path
+
+import pytest
+
+from app import graph_store
+from app.footprint import Footprint, footprint_report, strongly_connected_components
+
+SAMPLE_DIR = Path(__file__).resolve().parent.parent / "app" / "static" / "sample"
+
+
+def _csr(adjacency):
+    offsets = array("I", [0])
+    targets = array("I")
+    for children in adjacency:
+        targets.extend(children)
+        offsets.append(len(targets))
+    return len(adjacency), offsets, targets
+
+
+def _reachable(adjacency, node):
+    seen = set()
+    stack = [node]
+    while stack:
+        for child in adjacency[stack.pop()]:
+            if child not in seen:
+                seen.add(child)
+                stack.append(child)
+    seen.discard(node)
+    return len(seen)
+
+
+def test_cycles_are_condensed():
+    # 0 -> 1 <-> 2 -> 3, 0 -> 3
+    adjacency = [[1, 3], [2], [1, 3], []]
+    component, count = strongly_connected_components(*_csr(adjacency))
+    assert count == 3
+    assert component[1] == component[2]
+    assert component[3] < component[1] < component[0]
+
+    footprint = Footprint(*_csr(adjacency))
+    assert list(footprint.closure) == [3, 2, 2, 0]
+    assert list(footprint.height) == [2, 1, 1, 0]
+    assert list(footprint.fan_in) == [0, 2, 1, 2]
+    assert footprint.cyclic_components == 1
+
+
+@pytest.mark.parametrize("name", sorted(p.name for p in SAMPLE_DIR.glob("*.json")))
+def test_closure_matches_brute_force(tmp_path, name):
+    json_path = tmp_path / name
+    json_path.write_text((SAMPLE_DIR / name).read_text(encoding="utf-8"), encoding="utf-8")
+    graph_store.build_store(json_path)
+    store = graph_store.MappedStore(graph_store.store_path_for(json_path))
+
+    adjacency = [list(store.children_of(i)) for i in range(store.node_count)]
+    footprint = Footprint(store.node_count, store.child_off, store.child_tgt)
+    assert list(footprint.closure) == [_reachable(adjacency, i) for i in range(store.node_count)]
+
+    report = footprint_report(store, limit=5, direct=True)
+    closures = [node["closure"] for node in report["nodes"]]
+    assert closures == sorted(closures, reverse=True)
+    assert all(node["depth"] == 1 for node in report["nodes"])
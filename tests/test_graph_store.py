@@ -0,0 +1,139 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from app import convert_to_graph, enlist, filter as filter_module, graph_store
+from app.query import compile_query
+from app.utils import get_root_key_and_nodes
+
+SAMPLE_DIR = Path(__file__).resolve().parent.parent / "app" / "static" / "sample"
+
+
+def _normalize(graph_data):
+    nodes = sorted(json.dumps(n, sort_keys=True) for n in graph_data["nodes"])
+    edges = sorted((e["source"], e["target"]) for e in graph_data["edges"])
+    return nodes, edges, graph_data["metadata"]
+
+
+@pytest.fixture(params=sorted(p.name for p in SAMPLE_DIR.glob("*.json")))
+def stored(request, tmp_path):
+    dependency_data = json.loads((SAMPLE_DIR / request.param).read_text(encoding="utf-8"))
+    json_path = tmp_path / request.param
+    json_path.write_text(json.dumps(dependency_data), encoding="utf-8")
+    graph_store.build_store(json_path)
+    return dependency_data, graph_store.MappedStore(graph_store.store_path_for(json_path))
+
+
+def test_tree_round_trip(stored):
+    dependency_data, store = stored
+    root_key, root_nodes = get_root_key_and_nodes(dependency_data)
+    assert store.tree_data() == {root_key: root_nodes}
+
+
+@pytest.mark.parametrize("distance", [None, 0, 2])
+@pytest.mark.parametrize("exclude", [None, "androidx"])
+def test_graph_matches_process_data(stored, distance, exclude):
+    dependency_data, store = stored
+    expected = convert_to_graph.process_data(dependency_data, distance=distance, exclude=exclude)
+    assert _normalize(store.graph_data(distance, exclude)) == _normalize(expected)
+
+
+def test_filters_match_tree_filters(stored):
+    dependency_data, store = stored
+    _, root_nodes = get_root_key_and_nodes(dependency_data)
+    assert store.build_tree(store.select_project_only()) == filter_module.filter_project_only(root_nodes)
+    for keywords in (["androidx"], ["okhttp", "kotlin"]):
+        expected = filter_module.filter_dependencies(root_nodes, keywords)
+        assert store.build_tree(store.select_keywords(keywords)) == expected
+    queries = (
+        "androidx, okhttp",
+        "group:androidx.* AND NOT artifact:*-android",
+        "version<1.5 OR resolution:c",
+    )
+    for text in queries:
+        expected = filter_module.filter_dependencies(root_nodes, text)
+        assert store.build_tree(store.select_query(compile_query(text))) == expected
+
+
+def test_dependencies_match_enlist(stored):
+    dependency_data, store = stored
+    assert store.dependencies() == enlist.extract_dependencies_from_json(dependency_data)
+
+
+def test_remove_derived(tmp_path):
+    json_path = tmp_path / "empty.json"
+    json_path.write_text('{"app": []}', encoding="utf-8")
+    graph_store.build_store(json_path)
+    store = graph_store.MappedStore(graph_store.store_path_for(json_path))
+    assert store.graph_data() is None
+    del store
+    graph_store.remove_derived(json_path)
+    assert not graph_store.store_path_for(json_path).exists()
+
+
+def test_clone_store(tmp_path):
+    source = tmp_path / "source" / "sample.json"
+    source.parent.mkdir()
+    source.write_text((SAMPLE_DIR / "homeassistant_181149.json").read_text(encoding="utf-8"))
+    copy = tmp_path / "copy.json"
+    assert not graph_store.clone_store(source, copy)
+
+    graph_store.build_store(source)
+    copy.write_bytes(source.read_bytes())
+    assert graph_store.clone_store(source, copy)
+    cloned = graph_store.MappedStore(graph_store.store_path_for(copy))
+    assert cloned.fingerprint == graph_store.source_fingerprint(copy)
+    original = graph_store.MappedStore(graph_store.store_path_for(source))
+    assert cloned.tree_data() == original.tree_data()
+
+    # A changed source invalidates its store for cloning
+    source.write_text("{}")
+    assert not graph_store.clone_store(source, copy)
+
+
+def test_same_size_rewrite_invalidates_store(tmp_path):
+    path = tmp_path / "sample.json"
+    path.write_text((SAMPLE_DIR / "homeassistant_181149.json").read_text(encoding="utf-8"))
+    graph_store.build_store(path)
+    assert graph_store.is_current(path)
+
+    data = path.read_bytes()
+    with open(path, "r+b") as f:
+        f.write(data.replace(b"androidx", b"ANDROIDX", 1))
+    assert len(path.read_bytes()) == len(data)
+    _touch(path)
+    assert not graph_store.is_current(path)
+
+
+def _touch(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def test_derived_cache_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(graph_store, "DERIVED_CACHE_SIZE", 2)
+    monkeypatch.setattr(graph_store, "_derived", graph_store.OrderedDict())
+    stores = []
+    for i in range(3):
+        path = tmp_path / f"f{i}.json"
+        path.write_text(json.dumps({"app": [{"module": f"m:{i}", "version": "1", "children": []}]}))
+        graph_store.build_store(path)
+        stores.append(graph_store.MappedStore(graph_store.store_path_for(path)))
+
+    builds = []
+
+    def build(store):
+        builds.append(store.root_key)
+        return object()
+
+    first = stores[0].cached("test", build)
+    # Another mapping of the same file shares the object
+    assert graph_store.MappedStore(graph_store.store_path_for(tmp_path / "f0.json")).cached("test", build) is first
+    stores[1].cached("test", build)
+    stores[2].cached("test", build)
+    assert len(graph_store._derived) == 2
+    # The least recently used object was dropped and is rebuilt
+    assert stores[0].cached("test", build) is not first
+    assert len(builds) == 4
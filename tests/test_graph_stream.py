@@ -0,0 +1,64 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from app import convert_to_graph, graph_store, graph_stream
+
+SAMPLE_DIR = Path(__file__).resolve().parent.parent / "app" / "static" / "sample"
+
+
+@pytest.fixture(scope="module")
+def stored(tmp_path_factory):
+    sample = SAMPLE_DIR / "homeassistant_181149.json"
+    json_path = tmp_path_factory.mktemp("data") / sample.name
+    json_path.write_bytes(sample.read_bytes())
+    graph_store.build_store(json_path)
+    dependency_data = json.loads(sample.read_text(encoding="utf-8"))
+    return dependency_data, graph_store.MappedStore(graph_store.store_path_for(json_path))
+
+
+def _check_batches(batches, graph_data, batch_size):
+    sent = []
+    edges = []
+    levels = []
+    for level, nodes, batch_edges in batches:
+        assert 0 < len(nodes) <= batch_size
+        sent += [node["id"] for node in nodes]
+        known = set(sent)
+        # Edges only refer to nodes that have been sent
+        assert all(source in known and target in known for source, target in batch_edges)
+        edges += batch_edges
+        levels.append(level)
+
+    assert sorted(sent) == sorted(node["id"] for node in graph_data["nodes"])
+    assert len(sent) == len(set(sent))
+    assert sorted(edges) == sorted((e["source"], e["target"]) for e in graph_data["edges"])
+    reachable = [level for level in levels if level >= 0]
+    assert reachable == sorted(reachable) and reachable[0] == 0
+    assert levels[len(reachable):] == [-1] * (len(levels) - len(reachable))
+    return sent
+
+
+@pytest.mark.parametrize("distance", [None, 2])
+def test_store_batches_cover_graph_in_bfs_order(stored, distance):
+    _, store = stored
+    kept = store.select_graph_nodes(distance, None)
+    sent = _check_batches(
+        graph_stream.store_batches(store, kept, 100), store.graph_data(distance), 100
+    )
+    assert sent[0] == graph_store.ROOT_ID
+
+
+def test_graph_batches_match_process_data(stored):
+    dependency_data, _ = stored
+    graph_data = convert_to_graph.process_data(dependency_data, exclude="androidx")
+    _check_batches(graph_stream.graph_batches(graph_data, 50), graph_data, 50)
+
+
+def test_sse_messages():
+    batches = [(0, [{"id": "root:"}], []), (1, [{"id": "a"}], [("root:", "a")])]
+    messages = list(graph_stream.sse_graph(iter(batches), 2))
+    assert messages[0] == 'event: meta\ndata: {"total_nodes":2}\n\n'
+    assert json.loads(messages[2].split("data: ", 1)[1])["edges"] == [{"source": "root:", "target": "a"}]
+    assert messages[-1] == 'event: done\ndata: {"total_nodes":2,"total_edges":1}\n\n'
@@ -0,0 +1,77 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import convert_to_graph, filter as filter_module, graph_store, memprof, parse
+from app.main import app
+
+# Peak bytes per dependency line; about twice what each stage needs today
+BUDGETS = {"parse": 1024, "graph": 2048, "filter": 1024, "store": 3072}
+
+
+def synthetic_dump(count):
+    lines = ["debugRuntimeClasspath - Runtime classpath"]
+    for i in range(count):
+        indent = "|    " * (i % 4)
+        lines.append(f"{indent}+--- com.example.g{i % 50}:artifact-{i}:1.{i % 7} -> 1.{i % 7}.{i}")
+    return [line + "\n" for line in lines]
+
+
+def test_stage_peaks_nest():
+    with memprof.profiling() as profile:
+        with memprof.stage("outer"):
+            with memprof.stage("inner"):
+                block = bytearray(1 << 20)
+                del block
+            kept = bytearray(1 << 18)
+    by_stage = {record["stage"]: record for record in profile.stages}
+    assert by_stage["inner"]["peak_bytes"] >= 1 << 20
+    assert by_stage["inner"]["retained_bytes"] < 1 << 16
+    # The outer stage saw the inner peak and retained what it kept
+    assert by_stage["outer"]["peak_bytes"] >= 1 << 20
+    assert by_stage["outer"]["retained_bytes"] >= 1 << 18
+    assert any("test_memprof.py" in site["site"] for site in by_stage["outer"]["top"])
+    assert profile.peak_bytes >= 1 << 20
+    del kept
+    assert "outer" in memprof.format_report(profile)
+
+
+def test_profiles_do_not_overlap():
+    with memprof.profiling() as first:
+        with memprof.profiling() as second:
+            assert second is None
+    assert first is not None
+    with memprof.stage("outside"):
+        pass
+
+
+@pytest.mark.parametrize("count", [2000, 8000])
+def test_stage_memory_budgets(count):
+    lines = synthetic_dump(count)
+    with memprof.profiling(sites=False) as profile:
+        with memprof.stage("parse"):
+            roots = parse.parse_dependencies(lines)
+        data = {"app": roots}
+        with memprof.stage("graph"):
+            convert_to_graph.build_graph(data)
+        with memprof.stage("filter"):
+            filter_module.filter_dependencies(roots, "g1 OR version<1.3")
+        with memprof.stage("store"):
+            graph_store.build_sections(data)
+    for record in profile.stages:
+        per_node = record["peak_bytes"] / count
+        assert per_node <= BUDGETS[record["stage"]], (record["stage"], per_node)
+
+
+def test_request_profile_header(monkeypatch):
+    monkeypatch.setattr(memprof, "MEMORY_PROFILING", True)
+    client = TestClient(app)
+    filename = client.post("/api/samples/homeassistant_181149.json/process").json()["filename"]
+    try:
+        response = client.get(
+            f"/api/graph/{filename}", params={"filter": "androidx"}, headers={"X-Profile-Memory": "1"}
+        )
+        assert response.status_code == 200
+        assert "filter;peak=" in response.headers["x-memory-profile"]
+        assert "x-memory-profile" not in client.get(f"/api/graph/{filename}").headers
+    finally:
+        client.delete(f"/api/files/{filename}")
@@ -0,0 +1,78 @@
+import pytest
+
+from app import precompress
+
+
+def test_negotiate():
+    assert precompress.negotiate("gzip, deflate") == "gzip"
+    assert precompress.negotiate("identity") is None
+    assert precompress.negotiate("gzip;q=0") is None
+    assert precompress.negotiate("*") == next(iter(precompress.ENCODINGS))
+    assert precompress.negotiate(None) is None
+
+
+def test_variants_follow_the_source(tmp_path):
+    source = tmp_path / "deps.json"
+    source.write_text('{"app": []}')
+    precompress.write_variants(source)
+    first = precompress.variant_path(source, "gzip")
+    assert first.exists()
+
+    # A replaced file gets a new inode, so its variants are rewritten and the old ones dropped
+    replacement = tmp_path / "new.json"
+    replacement.write_text('{"app": [], "more": 1}')
+    replacement.replace(source)
+    precompress.write_variants(source)
+    assert not first.exists()
+    assert precompress.variant_path(source, "gzip").exists()
+
+
+@pytest.fixture
+def data_client(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app import main
+
+    monkeypatch.setattr(main, "DATA_DIR", tmp_path)
+    return TestClient(main.app)
+
+
+def test_if_none_match_only_matches_the_negotiated_encoding(tmp_path, data_client):
+    (tmp_path / "deps.json").write_text('{"app": []}')
+    plain = data_client.get("/static/data/deps.json", headers={"Accept-Encoding": "identity"})
+    assert plain.status_code == 200
+
+    # A cached identity body does not validate the gzip representation
+    response = data_client.get(
+        "/static/data/deps.json",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": plain.headers["etag"]},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] != plain.headers["etag"]
+
+    repeat = data_client.get(
+        "/static/data/deps.json",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": f'"x", W/{response.headers["etag"]}'},
+    )
+    assert repeat.status_code == 304
+
+
+def test_changed_file_drops_stale_variants(tmp_path, data_client):
+    source = tmp_path / "deps.json"
+    source.write_text('{"app": []}')
+    first = data_client.get("/static/data/deps.json", headers={"Accept-Encoding": "gzip"})
+    stale = precompress.variant_path(source, "gzip")
+    assert stale.exists()
+
+    replacement = tmp_path / "new.json.tmp"
+    replacement.write_text('{"app": [], "more": 1}')
+    replacement.replace(source)
+    response = data_client.get(
+        "/static/data/deps.json",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"]},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"app": [], "more": 1}
+    assert not stale.exists()
+    assert precompress.variant_path(source, "gzip").exists()
@@ -0,0 +1,79 @@
+import pstats
+from collections import deque
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import profiler
+from app.main import app
+
+client = TestClient(app)
+TOKEN = {"X-Profile-Token": "s3cret"}
+
+
+@pytest.fixture
+def sample_file(monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_TOKEN", "s3cret")
+    monkeypatch.setattr(profiler, "_profiles", deque(maxlen=3))
+    filename = client.post("/api/samples/homeassistant_181149.json/process").json()["filename"]
+    yield filename
+    client.delete(f"/api/files/{filename}")
+
+
+def test_header_profile_downloads(sample_file, tmp_path):
+    response = client.get(
+        "/viz/graph_viewer.html",
+        params={"file": sample_file, "filter": "androidx", "stream": False},
+        headers={**TOKEN, "X-Profile-Mode": "cprofile"},
+    )
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+
+    (record,) = client.get("/api/admin/profiles", headers=TOKEN).json()["profiles"]
+    assert record["id"] == int(profile_id)
+    assert (record["trigger"], record["mode"], record["status"]) == ("header", "cprofile", 200)
+    assert "filter=androidx" in record["query"]
+    assert record["formats"] == ["collapsed", "pstats"]
+
+    raw = client.get(f"/api/admin/profiles/{profile_id}", params={"format": "pstats"}, headers=TOKEN)
+    (tmp_path / "profile.pstats").write_bytes(raw.content)
+    stats = pstats.Stats(str(tmp_path / "profile.pstats"))
+    # The worker thread building the graph was profiled
+    assert any(func[2] == "_build_graph_data" for func in stats.stats)
+
+    collapsed = client.get(f"/api/admin/profiles/{profile_id}", headers=TOKEN).text
+    for line in collapsed.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0 and stack
+
+
+def test_token_required(sample_file, monkeypatch):
+    response = client.get(f"/api/enlist/{sample_file}", headers={"X-Profile-Token": "wrong"})
+    assert response.status_code == 200 and "x-profile-id" not in response.headers
+    assert client.get("/api/admin/profiles").status_code == 403
+    assert client.get("/api/admin/profiles", headers={"X-Profile-Token": "wrong"}).status_code == 403
+    assert client.get("/api/admin/profiles", headers=TOKEN).json() == {"profiles": []}
+    assert client.get("/api/admin/profiles/1", headers=TOKEN).status_code == 404
+
+    monkeypatch.setattr(profiler, "PROFILE_TOKEN", None)
+    assert client.get("/api/admin/profiles", headers=TOKEN).status_code == 404
+
+
+def test_slow_requests_are_kept_in_a_ring_buffer(sample_file, monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_SLOW_MS", 0.001)
+    for _ in range(4):
+        client.get("/viz/tree_viewer.html", params={"file": sample_file})
+    client.get("/api/files")
+
+    records = client.get("/api/admin/profiles", headers=TOKEN).json()["profiles"]
+    assert len(records) == 3
+    assert [r["id"] for r in records] == sorted((r["id"] for r in records), reverse=True)
+    assert {(r["path"], r["trigger"], r["mode"]) for r in records} == {
+        ("/viz/tree_viewer.html", "slow", "sample")
+    }
+    response = client.get(f"/api/admin/profiles/{records[0]['id']}", params={"format": "pstats"}, headers=TOKEN)
+    assert response.status_code == 404
+
+    monkeypatch.setattr(profiler, "PROFILE_SLOW_MS", 60000)
+    client.get("/viz/tree_viewer.html", params={"file": sample_file})
+    assert client.get("/api/admin/profiles", headers=TOKEN).json()["profiles"] == records
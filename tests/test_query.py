@@ -0,0 +1,116 @@
+import pytest
+
+from app import filter as filter_module
+from app.query import QueryError, compile_query, tokenize
+
+
+def _node(full, resolution="", children=()):
+    # "group:artifact:requested -> resolved" like parse.py produces
+    coordinates, _, resolved = full.partition(" -> ")
+    module, _, version = coordinates.rpartition(":")
+    return {
+        "module": module,
+        "version": resolved or version,
+        "resolution": resolution,
+        "full": full,
+        "children": list(children),
+    }
+
+
+NODES = {
+    "okhttp": _node("com.squareup.okhttp3:okhttp:4.12.0"),
+    "retrofit": _node("com.squareup.retrofit2:retrofit:2.9.0"),
+    "core": _node("androidx.core:core:1.9.0 -> 1.13.1", resolution="c"),
+    "core_android": _node("androidx.core:core-android:1.13.1"),
+    "guava": _node("com.google.guava:guava:31.1-jre"),
+    "project": {"module": "project :lib", "version": "", "resolution": "", "full": "project :lib", "children": []},
+}
+
+
+def _matching(text):
+    query = compile_query(text)
+    return sorted(name for name, node in NODES.items() if query.matches(node))
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("okhttp", ["okhttp"]),
+    ("OKHTTP, guava", ["guava", "okhttp"]),
+    ("project :lib", ["project"]),
+    ("group:com.squareup*", ["okhttp", "retrofit"]),
+    ("artifact=core", ["core"]),
+    ("artifact!=core AND group:androidx", ["core_android"]),
+    ("androidx AND NOT core-android", ["core"]),
+    ("androidx NOT core-android", ["core"]),
+    ("module:/^com\\.squareup\\.(okhttp3|retrofit2):/", ["okhttp", "retrofit"]),
+    ("/GUAVA$/", ["guava"]),
+    ('full:"-> 1.13"', ["core"]),
+    ("version<2.0", ["core", "core_android"]),
+    ("version>=4 OR version<1.2", ["guava", "okhttp"]),
+    ("version:[2.0,5.0)", ["okhttp", "retrofit"]),
+    ('version:"1.*"', ["core", "core_android"]),
+    ("resolution:c", ["core"]),
+    ("(squareup OR google) AND version>3", ["guava", "okhttp"]),
+    ("NOT (squareup OR androidx OR project)", ["guava"]),
+])
+def test_query_matches(text, expected):
+    assert _matching(text) == expected
+
+
+def test_legacy_keyword_lists_keep_their_meaning():
+    query = compile_query(" androidx.core , project :lib")
+    assert query.legacy
+    assert query.keywords == ["androidx.core", "project :lib"]
+    assert not compile_query("okhttp AND retrofit").legacy
+    # An empty keyword matched everything before and still does
+    assert _matching("okhttp,") == sorted(NODES)
+
+
+@pytest.mark.parametrize("text, version, expected", [
+    ("version:1.0.*", "1.5", False),
+    ("version:1.0.*", "1.0.3", True),
+    ("version:1.0.*", "1.0.0", True),
+    ("version:2.0.*", "2.17", False),
+    ("version:1.*", "1.5", True),
+    ("version:1.+", "2.0", False),
+])
+def test_version_prefix_keeps_zeros(text, version, expected):
+    assert compile_query(text).matches({"module": "a:b", "version": version}) is expected
+
+
+def test_tokenize_version_interval():
+    assert tokenize("version:(,1.5] OR x") == [
+        ("term", "version", ":", "text", "(,1.5]"), ("OR",), ("word", "x"),
+    ]
+
+
+@pytest.mark.parametrize("text", [
+    "(okhttp",
+    "okhttp)",
+    "okhttp AND",
+    "module:",
+    "module:/(/",
+    '"unterminated',
+    "group<2",
+    "version:[1.0,2.0",
+])
+def test_invalid_queries(text):
+    with pytest.raises(QueryError):
+        compile_query(text)
+
+
+def test_filter_dependencies_with_query():
+    tree = [
+        _node("com.squareup.retrofit2:retrofit:2.9.0", children=[
+            _node("com.squareup.okhttp3:okhttp:4.12.0", children=[
+                _node("com.squareup.okio:okio:3.6.0"),
+            ]),
+        ]),
+        _node("com.google.guava:guava:31.1-jre"),
+    ]
+    result = filter_module.filter_dependencies(tree, "artifact=okhttp version>=4")
+    assert [n["full"] for n in result] == ["com.squareup.retrofit2:retrofit:2.9.0"]
+    okhttp = result[0]["children"][0]
+    assert okhttp["module"] == "com.squareup.okhttp3:okhttp"
+    assert [n["module"] for n in okhttp["children"]] == ["com.squareup.okio:okio"]
+    # Keyword lists keep working
+    assert filter_module.filter_dependencies(tree, ["guava"])[0]["module"] == "com.google.guava:guava"
@@ -0,0 +1,30 @@
+import json
+
+from app import graph_store, search
+
+
+def _index(tmp_path, modules):
+    nodes = [
+        {"module": module, "version": "1.0", "resolution": "", "full": f"{module}:1.0", "children": []}
+        for module in modules
+    ]
+    json_path = tmp_path / "deps.json"
+    json_path.write_text(json.dumps({"app": nodes}), encoding="utf-8")
+    graph_store.build_store(json_path)
+    return search.SearchIndex(graph_store.MappedStore(graph_store.store_path_for(json_path)))
+
+
+def test_ranking(tmp_path):
+    index = _index(tmp_path, ["com.example:json", "com.example:json-api", "org.json:json", "org.json:json", "com.other:gson"])
+    results = index.search("org.json:json")
+    assert results[0] == {"module": "org.json:json", "count": 2, "versions": ["1.0"], "match": "exact"}
+
+    kinds = [(r["module"], r["match"]) for r in index.search("json")]
+    assert kinds[0] == ("org.json:json", "segment")
+    assert kinds[-1] == ("com.other:gson", "fuzzy")
+
+
+def test_short_queries_use_prefixes(tmp_path):
+    index = _index(tmp_path, ["androidx.core:core", "com.google:guava"])
+    assert [r["module"] for r in index.search("gu")] == ["com.google:guava"]
+    assert index.search("x") == []
@@ -0,0 +1,69 @@
+import json
+import os
+
+from app import fleet, graph_store, skew
+
+
+def _store_file(data_dir, name, project, modules, mtime):
+    nodes = [
+        {"module": module, "version": version, "resolution": "", "full": f"{module}:{version}", "children": []}
+        for module, version in modules
+    ]
+    path = data_dir / name
+    path.write_text(json.dumps({project: nodes}), encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def _open(path):
+    graph_store.build_store(path)
+    return graph_store.MappedStore(graph_store.store_path_for(path))
+
+
+def test_encode_versions_sorts_like_version_key():
+    ordered, rank_of = skew.encode_versions(["1.10", "1.9", "1.10-rc1", "2.0", "1.9"])
+    assert ordered == ["1.9", "1.10-rc1", "1.10", "2.0"]
+    assert rank_of["2.0"] == 3
+
+
+def test_skew_report(tmp_path):
+    _store_file(tmp_path, "app_old.json", "app", [("com.squareup:okio", "1.0")], 100)
+    _store_file(tmp_path, "app_new.json", "app", [("com.squareup:okio", "3.2"), ("a:b", "1")], 200)
+    _store_file(tmp_path, "lib.json", "lib", [("com.squareup:okio", "2.10"), ("a:b", "1")], 150)
+    _store_file(tmp_path, "tool.json", "tool", [("com.squareup:okio", "3.2"), ("com.squareup:okio", "2.9")], 150)
+
+    report = skew.report(tmp_path, _open)
+    assert [s["filename"] for s in report["snapshots"]] == ["app_new.json", "lib.json", "tool.json"]
+    assert report["total_modules"] == 2
+    assert report["skewed_modules"] == 1
+    (row,) = report["modules"]
+    assert (row["module"], row["oldest"], row["latest"], row["spread"], row["major_gap"]) == (
+        "com.squareup:okio", "2.10", "3.2", 2, 1
+    )
+    # tool.json counts with the newest version it resolves
+    assert [(v["version"], v["behind"], len(v["snapshots"])) for v in row["versions"]] == [("2.10", 1, 1), ("3.2", 0, 2)]
+    assert row["outliers"] == [{"filename": "lib.json", "project": "lib", "version": "2.10", "behind": 1}]
+
+    every_file = skew.report(tmp_path, _open, scope="files", module="com.squareup:*")
+    assert every_file["modules"][0]["oldest"] == "1.0"
+    assert every_file["modules"][0]["spread"] == 3
+    assert skew.report(tmp_path, _open, min_versions=1, module="a:b")["modules"][0]["latest"] == "1"
+
+    # The report follows the fleet index as files come and go
+    (tmp_path / "lib.json").unlink()
+    fleet.remove_file(tmp_path / "lib.json")
+    assert skew.report(tmp_path, _open)["skewed_modules"] == 0
+
+
+def test_filters_reuse_the_cached_rows(tmp_path):
+    for i, version in enumerate(["1.0", "1.1", "2.0"]):
+        _store_file(tmp_path, f"p{i}.json", f"p{i}", [("x:lib", version), ("y:lib", f"{i % 2}.0")], 100 + i)
+
+    report = skew.report(tmp_path, _open)
+    assert [r["module"] for r in report["modules"]] == ["x:lib", "y:lib"]
+    cached = skew._cache["rows"]
+    assert [r["module"] for r in skew.report(tmp_path, _open, min_versions=3)["modules"]] == ["x:lib"]
+    assert [r["module"] for r in skew.report(tmp_path, _open, module="Y:*")["modules"]] == ["y:lib"]
+    assert skew.report(tmp_path, _open, module="z:lib")["modules"] == []
+    # Filtering does not add cache entries
+    assert skew._cache["rows"] is cached
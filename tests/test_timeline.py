@@ -0,0 +1,140 @@
+import json
+import multiprocessing
+
+import pytest
+
+from app import graph_store, timeline
+
+
+def _store(tmp_path, name, modules, project="app"):
+    # modules: [(module, version, [child indices])]
+    nodes = [
+        {"module": m, "version": v, "resolution": "", "full": f"{m}:{v}", "children": []}
+        for m, v, _ in modules
+    ]
+    for node, (_, _, children) in zip(nodes, modules):
+        node["children"] = [dict(nodes[i]) for i in children]
+    path = tmp_path / name
+    path.write_text(json.dumps({project: nodes}), encoding="utf-8")
+    graph_store.build_store(path)
+    return graph_store.MappedStore(graph_store.store_path_for(path))
+
+
+def _graph(store):
+    data = store.graph_data()
+    return (
+        sorted(n["id"] for n in data["nodes"]),
+        sorted((e["source"], e["target"]) for e in data["edges"]),
+    )
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(timeline, "CHECKPOINT_INTERVAL", 3)
+    directory = tmp_path / "data"
+    directory.mkdir()
+    return directory
+
+
+def test_snapshots_round_trip(tmp_path, data_dir):
+    versions = ["1.0", "1.0", "1.1", "1.1", "2.0", "1.1", "2.0", "2.0"]
+    stores = []
+    for day, version in enumerate(versions):
+        modules = [("com.example:lib", version, [1]), ("org.dep:core", "3.0", [])]
+        if day % 2:
+            modules.append(("org.extra:tool", "0.1", []))
+        store = _store(tmp_path, f"app_{day}.json", modules)
+        stores.append(store)
+        timeline.record(data_dir, store, f"app_{day}.json", at=f"2026-01-0{day + 1}")
+
+    directory = timeline.project_dir(data_dir, "app")
+    assert sorted(p.name for p in directory.glob("checkpoint-*")) == ["checkpoint-000003.json", "checkpoint-000006.json"]
+    deltas = [json.loads(line) for line in timeline._log_lines(directory)]
+    # Snapshot 1 only adds the extra module
+    assert deltas[1]["added_nodes"] == [["org.extra:tool:0.1", "org.extra:tool", "0.1", "", "org.extra:tool:0.1"]]
+    assert deltas[1]["added_edges"] == [["root:", "org.extra:tool:0.1"]]
+    assert deltas[1]["removed_nodes"] == deltas[1]["removed_edges"] == []
+
+    for seq, store in enumerate(stores):
+        data = timeline.snapshot(data_dir, "app", seq)
+        assert data["metadata"]["source"] == f"app_{seq}.json"
+        assert (
+            sorted(n["id"] for n in data["nodes"]),
+            sorted((e["source"], e["target"]) for e in data["edges"]),
+        ) == _graph(store)
+    assert timeline.snapshot(data_dir, "app", len(stores)) is None
+
+
+def test_history_spans(tmp_path, data_dir):
+    for day, version in enumerate(["1.0", "1.1", "1.1", "1.0"]):
+        store = _store(tmp_path, f"app_{day}.json", [("com.example:lib", version, [])])
+        timeline.record(data_dir, store, f"app_{day}.json", at=f"day{day}")
+
+    result = timeline.history(data_dir, "app", module="com.example:*")
+    assert [s["added_nodes"] for s in result["snapshots"]] == [2, 1, 0, 1]
+    spans = {v["version"]: [(p["entered"]["at"], p["left"] and p["left"]["at"]) for p in v["present"]]
+             for v in result["versions"]}
+    assert spans == {"1.0": [("day0", "day1"), ("day3", None)], "1.1": [("day1", "day3")]}
+    assert timeline.history(data_dir, "app", module="nothing")["versions"] == []
+    assert timeline.history(data_dir, "missing") is None
+    assert timeline.projects(data_dir) == [{"project": "app", "snapshots": 4, "first": "day0", "last": "day3"}]
+
+
+def test_project_names_are_single_segments(tmp_path, data_dir):
+    store = _store(tmp_path, "lib.json", [("a:b", "1", [])], project="feature:../login")
+    timeline.record(data_dir, store, "lib.json")
+    assert [p.name for p in timeline.timeline_dir(data_dir).iterdir()] == ["feature%3A..%2Flogin"]
+    assert timeline.projects(data_dir)[0]["project"] == "feature:../login"
+    assert timeline.snapshot(data_dir, "feature:../login", 0)["metadata"]["total_nodes"] == 2
+
+
+def _record_many(data_dir, store_path, count):
+    store = graph_store.MappedStore(store_path)
+    for _ in range(count):
+        timeline.record(data_dir, store, "shared.json")
+
+
+@pytest.mark.skipif(timeline.fcntl is None, reason="needs fcntl")
+def test_concurrent_processes_append_in_sequence(tmp_path, data_dir):
+    _store(tmp_path, "shared.json", [("a:b", "1", [])])
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(target=_record_many, args=(data_dir, graph_store.store_path_for(tmp_path / "shared.json"), 20))
+        for _ in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    lines = timeline._log_lines(timeline.project_dir(data_dir, "app"))
+    assert [json.loads(line)["seq"] for line in lines] == list(range(80))
+
+
+def test_unnamed_projects_fall_back_to_the_upload_name(tmp_path, data_dir):
+    for name in ["billing_191201.json", "billing_201530.json", "search_191201.json"]:
+        store = _store(tmp_path, name, [("a:b", "1", [])], project="root")
+        timeline.record(data_dir, store, name)
+    assert [(p["project"], p["snapshots"]) for p in timeline.projects(data_dir)] == [("billing", 2), ("search", 1)]
+    assert timeline.project_of(_store(tmp_path, "named.json", [], project="app"), "other_1.json") == "app"
+
+
+def test_history_reads_only_appended_snapshots(tmp_path, data_dir):
+    first = _store(tmp_path, "app_0.json", [("com.example:lib", "1.0", [])])
+    timeline.record(data_dir, first, "app_0.json", at="day0")
+    before = timeline.history(data_dir, "app")
+    assert [v["present"][0]["left"] for v in before["versions"]] == [None]
+
+    second = _store(tmp_path, "app_1.json", [("com.example:lib", "2.0", [])])
+    timeline.record(data_dir, second, "app_1.json", at="day1")
+    after = timeline.history(data_dir, "app", module="com.example:*")
+    assert [(v["version"], v["present"][0]["left"]) for v in after["versions"]] == [
+        ("1.0", {"seq": 1, "at": "day1"}), ("2.0", None),
+    ]
+    # Results already returned are not changed by later reads
+    assert before["versions"][0]["present"][0]["left"] is None
+    assert len(before["snapshots"]) == 1
+    assert timeline._history[timeline.project_dir(data_dir, "app")]["size"] == (
+        timeline.project_dir(data_dir, "app") / timeline.LOG_FILENAME
+    ).stat().st_size
@@ -0,0 +1,100 @@
+import json
+import sys
+
+import pytest
+
+from app import convert_to_graph, enlist, filter as filter_module
+from app.traverse import dumps, flatten, iter_children, iter_json, iter_preorder, loads, parse_json, prune
+
+
+def _node(module, children=None, version="1.0"):
+    return {
+        "module": module,
+        "version": version,
+        "resolution": "",
+        "full": f"{module}:{version}",
+        "children": children or [],
+    }
+
+
+def _chain(depth):
+    root = _node("lib:0")
+    current = root
+    for i in range(1, depth):
+        child = _node(f"lib:{i}")
+        current["children"].append(child)
+        current = child
+    return [root]
+
+
+TREE = [
+    _node("project :app", [
+        _node("a:x", [_node("b:y"), _node("c:z")]),
+        _node("project :core", [_node("d:w")]),
+    ]),
+    _node("e:v"),
+]
+
+
+def test_iter_preorder_and_flatten():
+    order = [(node["module"], depth) for node, depth in iter_preorder(TREE)]
+    assert order == [
+        ("project :app", 0), ("a:x", 1), ("b:y", 2), ("c:z", 2),
+        ("project :core", 1), ("d:w", 2), ("e:v", 0),
+    ]
+    items, depths, sizes = flatten(TREE)
+    assert [n["module"] for n in items] == [m for m, _ in order]
+    assert depths == [d for _, d in order]
+    assert sizes == [6, 3, 1, 1, 2, 1, 1]
+    assert list(iter_children(0, sizes)) == [1, 4]
+
+
+def test_prune_does_not_modify_input():
+    pruned = prune(TREE, lambda node: node["module"] != "a:x")
+    assert [n["module"] for n, _ in iter_preorder(pruned)] == [
+        "project :app", "project :core", "d:w", "e:v",
+    ]
+    assert len(TREE[0]["children"]) == 2
+
+
+def test_deep_chain_beyond_recursion_limit():
+    depth = sys.getrecursionlimit() * 10
+    roots = _chain(depth)
+
+    kept = set()
+    filter_module.find_matches_and_relatives(roots, [f"lib:{depth - 1}"], kept, [])
+    assert len(kept) == depth
+
+    rebuilt = filter_module.rebuild_tree(roots, kept)
+    assert sum(1 for _ in iter_preorder(rebuilt)) == depth
+
+    assert filter_module.filter_project_only(roots) == []
+
+    graph_nodes, edges = convert_to_graph.traverse_tree(roots)
+    assert len(graph_nodes) == depth
+    assert sum(len(children) for children in edges.values()) == depth - 1
+
+    assert len(enlist.extract_dependencies_from_json({"app": roots})) == depth
+
+
+@pytest.mark.parametrize("indent, separators", [(None, None), (2, None), (None, (",", ":"))])
+def test_iter_json_matches_json_dumps(indent, separators):
+    value = {"app": TREE, "empty": [{}, []], "text": 'quote " and \u00e9', "n": [1, -2.5e3, True, None]}
+    text = "".join(iter_json(value, indent, separators))
+    assert text == json.dumps(value, indent=indent, separators=separators)
+    assert parse_json(text) == value
+
+
+@pytest.mark.parametrize("text", ["[1,]", '{"a" 1}', "[1 2]", "tru", "[1] x", ""])
+def test_parse_json_rejects_invalid_documents(text):
+    with pytest.raises(json.JSONDecodeError):
+        parse_json(text)
+
+
+def test_json_of_deep_chain_beyond_recursion_limit():
+    depth = sys.getrecursionlimit() * 10
+    value = {"app": _chain(depth)}
+    text = dumps(value, indent=2)
+    # Too deep to indent: written compact instead
+    assert "\n" not in text
+    assert sum(1 for _ in iter_preorder(loads(text)["app"])) == depth
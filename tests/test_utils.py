@@ -1,5 +1,5 @@
 import unittest
-from app.utils import parse_dependency_line
+from app.utils import parse_dependency_line, version_key
 
 class TestUtils(unittest.TestCase):
 
@@ -29,5 +29,14 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(node['resolution'], "*")
         self.assertEqual(node['full'], "org.springframework:spring-core:5.3.9 -> 6.0.0 (*)")
 
+    def test_version_key_ordering(self):
+        versions = ['2.0', '1.0.1', '1.0', '1.0-rc1', '1.0-alpha.16', '1.0-alpha.2', '1.0-SNAPSHOT', '1.2.17']
+        self.assertEqual(
+            sorted(versions, key=version_key),
+            ['1.0-alpha.2', '1.0-alpha.16', '1.0-rc1', '1.0-SNAPSHOT', '1.0', '1.0.1', '1.2.17', '2.0'],
+        )
+        self.assertEqual(version_key('1.0'), version_key('1.0.0'))
+        self.assertEqual(version_key('5.0.Final'), version_key('5.0'))
+
 if __name__ == '__main__':
     unittest.main()
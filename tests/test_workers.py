@@ -0,0 +1,54 @@
+import asyncio
+import threading
+import time
+
+from app import workers
+
+
+def test_run_shared_coalesces_identical_calls():
+    calls = []
+    release = threading.Event()
+
+    def compute(value):
+        calls.append(value)
+        release.wait(5)
+        return {"value": value}
+
+    async def main():
+        tasks = [asyncio.create_task(workers.run_shared(("k", 1), compute, 1)) for _ in range(5)]
+        other = asyncio.create_task(workers.run_shared(("k", 2), compute, 2))
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*tasks), await other
+
+    shared, other = asyncio.run(main())
+    assert sorted(calls) == [1, 2]
+    assert all(result is shared[0] for result in shared)
+    assert other == {"value": 2}
+    assert not workers._inflight
+
+
+def test_errors_reach_every_caller():
+    def fail():
+        time.sleep(0.02)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(
+            *(workers.run_shared("fail", fail) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_event_loop_stays_responsive():
+    async def main():
+        work = asyncio.create_task(workers.run(time.sleep, 0.2))
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        waited = time.perf_counter() - start
+        await work
+        return waited
+
+    assert asyncio.run(main()) < 0.1